@@ -1,16 +1,22 @@
+import functools
 import logging
 import os
 import random
 
-import numpy
-
-from nba_mvp_predictor import utils
-
 SEED = 0
+_CONF_PATH = os.path.join(os.path.dirname(__file__), "conf.yaml")
 
 
+@functools.cache
 def get_conf():
-    return utils.get_dict_from_yaml("nba_mvp_predictor/conf.yaml")
+    """Read the project configuration (once).
+
+    Returns:
+        box.Box: Configuration
+    """
+    from nba_mvp_predictor import utils
+
+    return utils.get_dict_from_yaml(_CONF_PATH)
 
 
 def seed_packages(seed: int = SEED):
@@ -22,6 +28,8 @@ def seed_packages(seed: int = SEED):
     Returns:
         int: Seed number used.
     """
+    import numpy
+
     random.seed(seed)
     numpy.random.seed(seed)
     return seed
@@ -56,6 +64,16 @@ def build_logger() -> logging.Logger:
     return logger
 
 
+def __getattr__(name):
+    # Configuration is loaded and packages are seeded on first use, not at import
+    if name == "conf":
+        value = get_conf()
+    elif name == "seed":
+        value = seed_packages()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
 logger = build_logger()
-conf = get_conf()
-seed = seed_packages()
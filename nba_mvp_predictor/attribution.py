@@ -0,0 +1,310 @@
+import numpy
+from scipy import special
+
+from nba_mvp_predictor import logger, mlp
+
+SHAPLEY = "shapley"
+DEEPLIFT = "deeplift"
+INTEGRATED_GRADIENTS = "integrated-gradients"
+# Rows times baselines (or steps) times features of the arrays of one batch
+_MAX_BATCH_VALUES = 2**22
+# Changes of pre-activations too small to divide by: the gradient is used instead
+_EPSILON = 1e-9
+_DERIVATIVES = {
+    "identity": lambda z: numpy.ones_like(z),
+    "relu": lambda z: (z > 0).astype(z.dtype),
+    "tanh": lambda z: 1.0 - numpy.tanh(z) ** 2,
+    "logistic": lambda z: mlp.ACTIVATIONS["logistic"](z)
+    * (1.0 - mlp.ACTIVATIONS["logistic"](z)),
+}
+
+
+def explain(
+    scorer: mlp.MLPScorer,
+    X: numpy.ndarray,
+    background: numpy.ndarray,
+    method: str = SHAPLEY,
+    nodes: int = 16,
+    steps: int = 64,
+    background_weights: numpy.ndarray | None = None,
+):
+    """Attribute the predictions of a multi-layer perceptron to its features.
+
+    Attributions are computed from the weights of the model, for all rows at once,
+    instead of from calls to its predict method. They add up to the prediction
+    minus the base value.
+
+    Args:
+        scorer (mlp.MLPScorer): Weights of the model
+        X (numpy.ndarray): Model input to explain, features in the order of the scorer
+        background (numpy.ndarray): Model input the predictions are compared with
+        method (str, optional): "shapley" (approximate SHAP values, for a single
+            hidden layer of ReLU units, else deeplift), "deeplift" (rescale rule,
+            averaged over the background rows like DeepSHAP) or
+            "integrated-gradients" (from the mean of the background). Defaults to "shapley".
+        nodes (int, optional): Coalition sizes of the Shapley values integral. Defaults to 16.
+        steps (int, optional): Steps of the integral of integrated gradients. Defaults to 64.
+        background_weights (numpy.ndarray, optional): Weight of each background row
+            (e.g. size of a k-means cluster). Defaults to equal weights.
+
+    Returns:
+        tuple[numpy.ndarray, float]: Attributions of shape (rows, features) and base value
+    """
+    X = numpy.asarray(X, dtype="float64")
+    background = numpy.asarray(background, dtype="float64")
+    if background_weights is None:
+        background_weights = numpy.ones(len(background))
+    weights = numpy.asarray(background_weights, dtype="float64")
+    weights = weights / weights.sum()
+    if method == SHAPLEY and not is_shapley_supported(scorer):
+        logger.warning(
+            f"Shapley values need a single hidden layer of ReLU units, using {DEEPLIFT}"
+        )
+        method = DEEPLIFT
+    if method == SHAPLEY:
+        attributions = _batched(
+            lambda rows: get_shapley_values(scorer, rows, background, nodes, weights),
+            X,
+            len(background) * scorer.coefs[0].shape[1],
+        )
+        base_value = float(scorer.predict(background) @ weights)
+    elif method == DEEPLIFT:
+        attributions = _batched(
+            lambda rows: get_deeplift_attributions(scorer, rows, background, weights),
+            X,
+            len(background),
+        )
+        base_value = float(scorer.predict(background) @ weights)
+    elif method == INTEGRATED_GRADIENTS:
+        baseline = weights @ background
+        attributions = _batched(
+            lambda rows: get_integrated_gradients(scorer, rows, baseline, steps),
+            X,
+            steps,
+        )
+        base_value = float(scorer.predict(baseline[None, :])[0])
+    else:
+        raise ValueError(
+            f"Unknown attribution method {method}, use {SHAPLEY}, {DEEPLIFT} or "
+            f"{INTEGRATED_GRADIENTS}"
+        )
+    return attributions, base_value
+
+
+def is_shapley_supported(scorer: mlp.MLPScorer) -> bool:
+    return len(scorer.coefs) == 2 and scorer.activation == "relu"
+
+
+def get_shapley_values(
+    scorer: mlp.MLPScorer,
+    X: numpy.ndarray,
+    background: numpy.ndarray,
+    nodes: int = 16,
+    weights: numpy.ndarray | None = None,
+) -> numpy.ndarray:
+    """Approximate SHAP values of a single hidden layer of ReLU units, averaged over baselines.
+
+    Between a row and a baseline, each hidden unit is the ReLU of its baseline
+    input plus the sum of the changes brought by each feature. The Shapley value
+    of a feature is its average gain over the coalitions of features added before
+    it. For coalitions of a given size, the sum of their changes is approximated
+    by a normal distribution (sampling without replacement), whose expected ReLU
+    is known. Coalition sizes are integrated over a few nodes, and the remaining
+    error is spread over features so that values add up to the change of the unit.
+    A ReLU output rescales the contributions like DeepLIFT.
+
+    Args:
+        scorer (mlp.MLPScorer): Weights of the model
+        X (numpy.ndarray): Rows to explain
+        background (numpy.ndarray): Baselines
+        nodes (int, optional): Coalition sizes the average is computed on. Defaults to 16.
+        weights (numpy.ndarray, optional): Weights of the baselines, adding up to 1. Defaults to equal weights.
+
+    Returns:
+        numpy.ndarray: Attributions of shape (rows, features)
+    """
+    coef, intercept = scorer.coefs[0].astype("float64"), scorer.intercepts[0]
+    n_features = coef.shape[0]
+    others = max(n_features - 1, 1)
+    # Change of the input of each hidden unit brought by each feature, for each
+    # row and baseline: shape (rows, baselines, features, units)
+    changes = (X[:, None, :] - background[None, :, :])[..., None] * coef
+    baseline_z = (background @ coef + intercept)[None, :, None, :]
+    total = changes.sum(axis=2, keepdims=True)
+    others_mean = (total - changes) / others
+    others_variance = numpy.maximum(
+        ((changes**2).sum(axis=2, keepdims=True) - changes**2) / others
+        - others_mean**2,
+        0.0,
+    )
+    gains = numpy.zeros(changes.shape)
+    for size in (numpy.arange(nodes) + 0.5) / nodes * n_features - 0.5:
+        mean = baseline_z + size * others_mean
+        variance = size * (others - size) / max(others - 1, 1) * others_variance
+        gains += _expected_relu(mean + changes, variance)
+        gains -= _expected_relu(mean, variance)
+    gains /= nodes
+    exact = numpy.maximum(baseline_z + total, 0.0) - numpy.maximum(baseline_z, 0.0)
+    magnitudes = numpy.abs(gains)
+    magnitudes_total = magnitudes.sum(axis=2, keepdims=True)
+    shares = numpy.where(
+        magnitudes_total > 0,
+        magnitudes / numpy.where(magnitudes_total > 0, magnitudes_total, 1.0),
+        1.0 / n_features,
+    )
+    gains += (exact - gains.sum(axis=2, keepdims=True)) * shares
+    values = gains @ scorer.coefs[1][:, 0].astype("float64")
+    if scorer.output_activation != "identity":
+        row_output = _forward(scorer, X)[-1]
+        baseline_output = _forward(scorer, background)[-1]
+        values = values * _get_multipliers(
+            scorer.output_activation,
+            row_output[:, None, :],
+            baseline_output[None, :, :],
+        )
+    return numpy.average(values, axis=1, weights=weights)
+
+
+def get_deeplift_attributions(
+    scorer: mlp.MLPScorer,
+    X: numpy.ndarray,
+    background: numpy.ndarray,
+    weights: numpy.ndarray | None = None,
+) -> numpy.ndarray:
+    """Compute DeepLIFT attributions with the rescale rule, averaged over baselines.
+
+    Each unit passes on the change of its output over the change of its input
+    between the row and the baseline, instead of its gradient. Attributions to a
+    baseline add up exactly to the difference of predictions.
+
+    Args:
+        scorer (mlp.MLPScorer): Weights of the model
+        X (numpy.ndarray): Rows to explain
+        background (numpy.ndarray): Baselines
+        weights (numpy.ndarray, optional): Weights of the baselines, adding up to 1. Defaults to equal weights.
+
+    Returns:
+        numpy.ndarray: Attributions of shape (rows, features)
+    """
+    rows_z = _forward(scorer, X)
+    baselines_z = _forward(scorer, background)
+    # Multipliers of the hidden layers then of the output, for each row and baseline
+    multipliers = []
+    for layer, (row_z, baseline_z) in enumerate(zip(rows_z, baselines_z)):
+        activation = (
+            scorer.activation if layer < len(rows_z) - 1 else scorer.output_activation
+        )
+        multipliers.append(
+            _get_multipliers(activation, row_z[:, None, :], baseline_z[None, :, :])
+        )
+    gradient = multipliers[-1]
+    for layer in range(len(scorer.coefs) - 1, -1, -1):
+        gradient = gradient @ scorer.coefs[layer].T.astype("float64")
+        if layer > 0:
+            gradient = gradient * multipliers[layer - 1]
+    differences = X[:, None, :] - background[None, :, :]
+    return numpy.average(differences * gradient, axis=1, weights=weights)
+
+
+def get_integrated_gradients(
+    scorer: mlp.MLPScorer, X: numpy.ndarray, baseline: numpy.ndarray, steps: int = 64
+) -> numpy.ndarray:
+    """Compute integrated gradients from a baseline, with exact gradients of the model.
+
+    Args:
+        scorer (mlp.MLPScorer): Weights of the model
+        X (numpy.ndarray): Rows to explain
+        baseline (numpy.ndarray): Baseline, of shape (features,)
+        steps (int, optional): Midpoints of the integral on the path from the
+            baseline to each row. Defaults to 64.
+
+    Returns:
+        numpy.ndarray: Attributions of shape (rows, features)
+    """
+    alphas = (numpy.arange(steps) + 0.5) / steps
+    differences = X - baseline
+    points = baseline + alphas[None, :, None] * differences[:, None, :]
+    points_z = _forward(scorer, points.reshape(-1, X.shape[1]))
+    gradient = _DERIVATIVES[scorer.output_activation](points_z[-1])
+    for layer in range(len(scorer.coefs) - 1, -1, -1):
+        gradient = gradient @ scorer.coefs[layer].T.astype("float64")
+        if layer > 0:
+            gradient = gradient * _DERIVATIVES[scorer.activation](points_z[layer - 1])
+    gradient = gradient.reshape(len(X), steps, X.shape[1]).mean(axis=1)
+    return differences * gradient
+
+
+def compare_attributions(attributions, reference, top_n: int = 3) -> dict:
+    """Measure how far attributions are from reference ones (e.g. SHAP values).
+
+    Args:
+        attributions (numpy.ndarray): Attributions of shape (rows, features)
+        reference (numpy.ndarray): Reference attributions of the same rows
+        top_n (int, optional): Number of most important features compared per row. Defaults to 3.
+
+    Returns:
+        dict: Largest and mean absolute errors, error relative to the norm of the
+            reference, correlation, and share of rows with the same top features
+    """
+    attributions = numpy.asarray(attributions, dtype="float64")
+    reference = numpy.asarray(reference, dtype="float64")
+    errors = numpy.abs(attributions - reference)
+    top = numpy.argsort(-numpy.abs(attributions), axis=1)[:, :top_n]
+    reference_top = numpy.argsort(-numpy.abs(reference), axis=1)[:, :top_n]
+    same_top = [set(a) == set(b) for a, b in zip(top, reference_top)]
+    return {
+        "max_abs_error": float(errors.max(initial=0.0)),
+        "mean_abs_error": float(errors.mean()),
+        "relative_error": float(
+            numpy.linalg.norm(attributions - reference)
+            / max(numpy.linalg.norm(reference), _EPSILON)
+        ),
+        "correlation": float(
+            numpy.corrcoef(attributions.ravel(), reference.ravel())[0, 1]
+        ),
+        f"same_top_{top_n}_share": float(numpy.mean(same_top)),
+    }
+
+
+def _forward(scorer: mlp.MLPScorer, X: numpy.ndarray) -> list:
+    # Pre-activations of each layer, the last one being the output
+    pre_activations = []
+    activations = X
+    for layer, (coef, intercept) in enumerate(zip(scorer.coefs, scorer.intercepts)):
+        z = activations @ coef.astype("float64") + intercept.astype("float64")
+        pre_activations.append(z)
+        if layer < len(scorer.coefs) - 1:
+            activations = mlp.ACTIVATIONS[scorer.activation](z)
+    return pre_activations
+
+
+def _expected_relu(mean, variance):
+    # Expected value of the ReLU of a normal variable
+    deviation = numpy.sqrt(variance)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        t = mean / deviation
+        expected = mean * special.ndtr(t) + deviation * numpy.exp(
+            -0.5 * t**2
+        ) / numpy.sqrt(2 * numpy.pi)
+    return numpy.where(deviation > _EPSILON, expected, numpy.maximum(mean, 0.0))
+
+
+def _get_multipliers(activation: str, row_z, baseline_z):
+    func = mlp.ACTIVATIONS[activation]
+    delta_z = row_z - baseline_z
+    small = numpy.abs(delta_z) < _EPSILON
+    delta_a = func(row_z) - func(baseline_z)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        multipliers = numpy.where(small, 0.0, delta_a / delta_z)
+    gradients = _DERIVATIVES[activation](numpy.broadcast_to(row_z, delta_z.shape))
+    return numpy.where(small, gradients, multipliers)
+
+
+def _batched(func, X: numpy.ndarray, factor: int) -> numpy.ndarray:
+    # Rows are split so that arrays of rows times the factor times features stay small
+    if len(X) == 0:
+        return numpy.zeros(X.shape)
+    batch_size = max(1, _MAX_BATCH_VALUES // max(1, factor * X.shape[1]))
+    return numpy.concatenate(
+        [func(X[start : start + batch_size]) for start in range(0, len(X), batch_size)]
+    )
@@ -0,0 +1,833 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from nba_mvp_predictor import get_conf, logger, seed_packages
+
+# Modules that must not be imported to start the CLI
+_HEAVY_MODULES = ["numpy", "pandas", "sklearn", "shap", "streamlit", "seaborn"]
+# Stages of the stages benchmark, each one running on the outputs of the previous ones
+STAGES = [
+    "bronze",
+    "silver",
+    "train",
+    "pruning",
+    "gold",
+    "selection",
+    "cv",
+    "loso",
+    "predict",
+    "shap",
+    "web",
+]
+# Measurements of each stage compared with the baseline
+_STAGE_METRICS = ["wall_seconds", "cpu_seconds", "peak_rss_mb"]
+# Days of predictions history prepared for the web app (a full season)
+_HISTORY_DAYS = 175
+
+
+def measure_import_time(module: str = "nba_mvp_predictor.cli", repeat: int = 3):
+    """Measure the cold import time of a module with ``python -X importtime``.
+
+    Args:
+        module (str, optional): Module to import. Defaults to "nba_mvp_predictor.cli".
+        repeat (int, optional): Number of fresh interpreters to run, the fastest is kept. Defaults to 3.
+
+    Returns:
+        tuple[float, dict[str, float]]: Import time of the module (ms) and cumulative time of every imported module (ms)
+    """
+    best_total, best_imports = None, None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imports = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if name.strip() == "site":
+                # Imported by the interpreter itself, before the module
+                imports = {}
+                continue
+            imports[name.strip()] = int(cumulative) / 1000
+        total = imports[module]
+        if best_total is None or total < best_total:
+            best_total, best_imports = total, imports
+    return best_total, best_imports
+
+
+def check_startup(
+    budget_ms: float | None = None,
+    module: str = "nba_mvp_predictor.cli",
+    top_n: int = 10,
+) -> bool:
+    """Check that the CLI starts without heavy imports and under a time budget.
+
+    Args:
+        budget_ms (float, optional): Maximum import time (ms). Defaults to the configured budget.
+        module (str, optional): Module to import. Defaults to "nba_mvp_predictor.cli".
+        top_n (int, optional): Number of slowest imports to log. Defaults to 10.
+
+    Returns:
+        bool: True if the startup is within budget
+    """
+    if budget_ms is None:
+        budget_ms = get_conf().bench.startup_budget_ms
+    total, imports = measure_import_time(module)
+    for name, duration in sorted(imports.items(), key=lambda item: -item[1])[:top_n]:
+        logger.debug("%8.1f ms  %s", duration, name)
+    heavy = [name for name in _HEAVY_MODULES if name in imports]
+    logger.info("Import time of %s : %.1f ms (budget %s ms)", module, total, budget_ms)
+    if heavy:
+        logger.error("Heavy modules imported at startup : %s", ", ".join(heavy))
+    if total > budget_ms:
+        logger.error("Startup is over budget by %.1f ms", total - budget_ms)
+    return not heavy and total <= budget_ms
+
+
+def compare_warm_starts(modes: list[str] | None = None):
+    """Compare leave-one-season-out evaluations with cold and warm-started fits.
+
+    Uses the gold data and model features of the last training.
+
+    Args:
+        modes (list[str], optional): Warm start modes to compare. Defaults to cold, full and previous.
+
+    Returns:
+        pandas.DataFrame: Wall time and ranking metrics per mode
+    """
+    import pandas
+
+    from nba_mvp_predictor import model, train
+
+    if modes is None:
+        modes = ["cold", "full", "previous"]
+    data, features, target = _load_training_data()
+    regressor = model.get_model()
+    results = []
+    for mode in modes:
+        start = time.perf_counter()
+        all_winners, _, _ = train.evaluate_all_seasons(
+            regressor,
+            data,
+            features,
+            target,
+            data["MVP_RANK"],
+            warm_start=mode,
+        )
+        results.append(
+            {
+                "warm_start": mode,
+                "seconds": time.perf_counter() - start,
+                **train.get_rank_metrics(all_winners),
+            }
+        )
+        logger.info(
+            "%-8s : %6.1f s - MVP found %.3f - average real rank %.2f",
+            mode,
+            results[-1]["seconds"],
+            results[-1]["mvp_share"],
+            results[-1]["average_real_rank"],
+        )
+    return pandas.DataFrame(results).set_index("warm_start")
+
+
+def compare_slicing(repeat: int = 3) -> bool:
+    """Compare building the inputs of each held-out season by slicing data frames and by selecting rows of one matrix.
+
+    Data frames are sliced for each season and converted to arrays, as sklearn
+    converts them when fitting; the matrix of train.build_training_arrays is built
+    once and each season selects its rows by index. Uses the gold data and model
+    features of the last training.
+
+    Args:
+        repeat (int, optional): Number of runs of each method, the fastest is kept. Defaults to 3.
+
+    Returns:
+        bool: True if both methods build the same arrays
+    """
+    import tracemalloc
+
+    import numpy
+
+    data, features, target = _load_training_data()
+    methods = {
+        "data frames": _slice_frames,
+        "index arrays": _select_rows,
+    }
+    for name, method in methods.items():
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            copied = sum(nbytes for nbytes, _ in method(data, features, target))
+            seconds.append(time.perf_counter() - start)
+        tracemalloc.start()
+        for _ in method(data, features, target):
+            pass
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        logger.info(
+            "%-12s : %.0f ms - %.1f MiB copied - peak memory %.1f MiB "
+            "(%s seasons, %s rows, %s features)",
+            name,
+            min(seconds) * 1000,
+            copied / 1024**2,
+            peak_bytes / 1024**2,
+            data.SEASON.nunique(),
+            len(data),
+            len(features),
+        )
+    for (_, sliced), (_, selected) in zip(
+        *(method(data, features, target) for method in methods.values())
+    ):
+        if not all(map(numpy.array_equal, sliced, selected)):
+            logger.error("Data frames and index arrays build different inputs")
+            return False
+    return True
+
+
+def compare_models(
+    names: list[str] | None = None, n_players: int = 500, repeat: int = 20
+):
+    """Compare the cost and quality of the models of the registry.
+
+    Each model is evaluated by the leave-one-season-out harness of the training, on
+    the gold data and model features of the last training. Fit time, peak memory
+    (traced Python and NumPy allocations) and artifact size are measured on a fit on
+    all seasons.
+
+    Args:
+        names (list[str], optional): Models to compare. Defaults to all models of the registry.
+        n_players (int, optional): Number of players per prediction call. Defaults to 500.
+        repeat (int, optional): Number of prediction calls, the fastest is kept. Defaults to 20.
+
+    Returns:
+        pandas.DataFrame: Costs and ranking metrics per model
+    """
+    import io
+    import tracemalloc
+
+    import joblib
+    import numpy
+    import pandas
+    from sklearn import base
+
+    from nba_mvp_predictor import model, train
+
+    if names is None:
+        names = list(model.MODELS)
+    data, features, target = _load_training_data()
+    X, y, seasons = data[features], data[target], data["SEASON"]
+    X_batch = X.iloc[numpy.resize(numpy.arange(len(X)), n_players)]
+    results = []
+    for name in names:
+        regressor = model.get_model(name=name)
+        start = time.perf_counter()
+        fitted = model.fit_model(base.clone(regressor), X, y, seasons)
+        fit_seconds = time.perf_counter() - start
+        tracemalloc.start()
+        model.fit_model(base.clone(regressor), X, y, seasons)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fitted.predict(X_batch)
+            latencies.append(time.perf_counter() - start)
+        artifact = io.BytesIO()
+        joblib.dump(fitted, artifact)
+        start = time.perf_counter()
+        all_winners, _, _ = train.evaluate_all_seasons(
+            regressor, data, features, target, data["MVP_RANK"]
+        )
+        results.append(
+            {
+                "model": name,
+                "fit_seconds": fit_seconds,
+                f"predict_ms_per_{n_players}": min(latencies) * 1000,
+                "artifact_kb": artifact.getbuffer().nbytes / 1024,
+                "peak_memory_mb": peak_bytes / 1024**2,
+                "evaluation_seconds": time.perf_counter() - start,
+                **train.get_rank_metrics(all_winners),
+            }
+        )
+        logger.info(
+            "%-8s : fit %.2f s - MVP found %.3f - average real rank %.2f",
+            name,
+            fit_seconds,
+            results[-1]["mvp_share"],
+            results[-1]["average_real_rank"],
+        )
+    results = pandas.DataFrame(results).set_index("model")
+    logger.info("Models comparison :\n%s", results.to_string(float_format="%.3f"))
+    return results
+
+
+def benchmark_inference(n_players: int = 500, repeat: int = 20) -> bool:
+    """Compare scoring with the pickled model and with its exported weights.
+
+    Loading is measured in fresh interpreters, imports included, as a command or the
+    web app would pay it. Predictions of both are checked to be the same.
+
+    Args:
+        n_players (int, optional): Number of players per prediction call. Defaults to 500.
+        repeat (int, optional): Number of prediction calls and loads, the fastest is kept. Defaults to 20.
+
+    Returns:
+        bool: True if the exported weights predict like the model
+    """
+    import numpy
+
+    from nba_mvp_predictor import load, mlp
+
+    conf = get_conf()
+    if not mlp.is_exported(conf.data.model_weights.path, conf.data.model.path):
+        logger.error(
+            "No weights exported for %s, train a multi-layer perceptron first",
+            conf.data.model.path,
+        )
+        return False
+    fitted = load.load_model()
+    scorer = mlp.MLPScorer.load(conf.data.model_weights.path)
+    X = load.load_model_input()[scorer.features]
+    X_batch = X.iloc[numpy.resize(numpy.arange(len(X)), n_players)]
+    try:
+        difference = mlp.check_parity(fitted, scorer, X_batch)
+        ok = True
+    except ValueError as e:
+        logger.error(str(e))
+        difference, ok = None, False
+    loaders = {
+        "model": "from nba_mvp_predictor import load; load.load_model()",
+        "weights": "from nba_mvp_predictor import conf, mlp; "
+        "mlp.MLPScorer.load(conf.data.model_weights.path)",
+    }
+    for name, predictor in [("model", fitted), ("weights", scorer)]:
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            predictor.predict(X_batch)
+            latencies.append(time.perf_counter() - start)
+        load_seconds = []
+        for _ in range(min(repeat, 3)):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", loaders[name]], check=True)
+            load_seconds.append(time.perf_counter() - start)
+        logger.info(
+            "%-7s : load %.0f ms (fresh interpreter), predict %.3f ms per %s players",
+            name,
+            min(load_seconds) * 1000,
+            min(latencies) * 1000,
+            n_players,
+        )
+    if difference is not None:
+        logger.info("Largest difference of predictions : %.2e", difference)
+    return ok
+
+
+def benchmark_stages(
+    scale: int = 1,
+    baseline: str | None = None,
+    threshold: float | None = None,
+    save_baseline: bool = False,
+    repeat: int | None = None,
+) -> bool:
+    """Measure each stage of the pipeline on synthetic data, and compare with a baseline.
+
+    Stages run one after the other in a temporary directory, on data generated by
+    synthetic.generate_data. Each one runs in a fresh process, after loading its
+    inputs, so that its wall time, CPU time (including worker processes) and peak
+    resident memory are its own. Results are written with machine metadata to the
+    configured results file. Stages can run many times, keeping their lowest
+    measurements, to be less sensitive to the load of the machine.
+
+    Args:
+        scale (int, optional): Synthetic data size factor. Defaults to 1.
+        baseline (str, optional): Results to compare with. Defaults to the configured baseline.
+        threshold (float, optional): Relative increase flagged as a regression. Defaults to the configured threshold.
+        save_baseline (bool, optional): Save the results as the new baseline instead of comparing. Defaults to False.
+        repeat (int, optional): Number of runs of each stage. Defaults to the configured value.
+
+    Returns:
+        bool: True if no stage regressed
+    """
+    import multiprocessing
+    import tempfile
+
+    from nba_mvp_predictor import synthetic
+
+    bench_conf = get_conf().bench.stages
+    results_path = os.path.abspath(bench_conf.results)
+    baseline_path = os.path.abspath(baseline or bench_conf.baseline)
+    if threshold is None:
+        threshold = bench_conf.threshold
+    if repeat is None:
+        repeat = bench_conf.repeat
+    context = multiprocessing.get_context("spawn")
+    measurements = {}
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            synthetic.generate_data(scale=scale)
+            for stage in STAGES:
+                runs = [_measure_stage(stage, context) for _ in range(repeat)]
+                measurements[stage] = {
+                    metric: min(run[metric] for run in runs) for metric in runs[0]
+                }
+                logger.info(
+                    "%-9s : wall %7.2f s - CPU %7.2f s - peak RSS %7.1f MB"
+                    " (workers %.1f MB)",
+                    stage,
+                    measurements[stage]["wall_seconds"],
+                    measurements[stage]["cpu_seconds"],
+                    measurements[stage]["peak_rss_mb"],
+                    measurements[stage]["workers_peak_rss_mb"],
+                )
+        finally:
+            os.chdir(working_directory)
+    results = {
+        "metadata": {**get_machine_metadata(), "scale": scale, "repeat": repeat},
+        "stages": measurements,
+    }
+    _write_json(results, results_path)
+    logger.info("Stage measurements written to %s", results_path)
+    if save_baseline:
+        _write_json(results, baseline_path)
+        logger.info("Baseline written to %s", baseline_path)
+        return True
+    try:
+        with open(baseline_path, encoding="utf-8") as json_file:
+            reference = json.load(json_file)
+    except FileNotFoundError:
+        logger.warning("No baseline found at %s : nothing to compare", baseline_path)
+        return True
+    return compare_stages(results, reference, threshold, bench_conf.min_seconds)
+
+
+def compare_stages(
+    results: dict, baseline: dict, threshold: float, min_seconds: float = 0.0
+) -> bool:
+    """Compare stage measurements with a baseline.
+
+    Args:
+        results (dict): Measurements, as written by benchmark_stages
+        baseline (dict): Reference measurements
+        threshold (float): Relative increase of a measurement flagged as a regression
+        min_seconds (float, optional): Durations shorter than this in the baseline are too noisy to compare. Defaults to 0.0.
+
+    Returns:
+        bool: True if no stage regressed
+    """
+    if results["metadata"]["scale"] != baseline["metadata"]["scale"]:
+        logger.error(
+            "Baseline was measured at scale %s, not %s : measurements cannot be compared",
+            baseline["metadata"]["scale"],
+            results["metadata"]["scale"],
+        )
+        return False
+    for key in ["platform", "cpu_count", "n_jobs"]:
+        if results["metadata"][key] != baseline["metadata"][key]:
+            logger.warning(
+                "Baseline was measured with another %s : %s instead of %s",
+                key,
+                baseline["metadata"][key],
+                results["metadata"][key],
+            )
+    regressions = []
+    for stage, measurements in results["stages"].items():
+        if stage not in baseline["stages"]:
+            logger.info("%-9s : not in baseline", stage)
+            continue
+        for metric in _STAGE_METRICS:
+            reference = baseline["stages"][stage][metric]
+            change = measurements[metric] / reference - 1 if reference > 0 else 0.0
+            noisy = metric.endswith("_seconds") and reference < min_seconds
+            regressed = change > threshold and not noisy
+            logger.info(
+                "%-9s : %-12s %9.2f -> %9.2f (%+6.1f %%)%s",
+                stage,
+                metric,
+                reference,
+                measurements[metric],
+                100 * change,
+                "  REGRESSION" if regressed else "",
+            )
+            if regressed:
+                regressions.append(f"{stage} {metric}")
+    if regressions:
+        logger.error(
+            "Regressions over %.0f %% : %s", 100 * threshold, ", ".join(regressions)
+        )
+    return not regressions
+
+
+def benchmark_serve(
+    url: str | None = None,
+    rate: float | None = None,
+    duration: float | None = None,
+    concurrency: int | None = None,
+) -> bool:
+    """Load test the prediction server at a fixed request rate.
+
+    Each request scores a random player of the current season. Requests are sent on
+    a fixed schedule by concurrent clients on keep-alive connections, and latencies
+    are measured from the scheduled time, so that a server falling behind is not
+    hidden by clients waiting for it. Without url, a server is started in another
+    process, on the model and data of the working directory.
+
+    Args:
+        url (str, optional): URL of a running server. Defaults to None.
+        rate (float, optional): Requests per second. Defaults to the configured rate.
+        duration (float, optional): Seconds of load. Defaults to the configured duration.
+        concurrency (int, optional): Concurrent clients. Defaults to the configured concurrency.
+
+    Returns:
+        bool: True if all requests succeeded
+    """
+    import itertools
+    import multiprocessing
+    import random
+    import threading
+    from urllib import parse
+
+    import numpy
+
+    bench_conf = get_conf().bench.serve
+    rate = rate or bench_conf.rate
+    duration = duration or bench_conf.duration_seconds
+    concurrency = concurrency or bench_conf.concurrency
+    process = None
+    if url is None:
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_run_server, args=(sender,), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            port = receiver.recv()
+        except EOFError:
+            port = f"process exited with code {process.exitcode}"
+        if isinstance(port, str):
+            raise RuntimeError(f"Server failed to start : {port}")
+        url = f"http://127.0.0.1:{port}"
+    address = parse.urlparse(url)
+    try:
+        _, players = _request(address, "GET", "/predictions?top=50")
+        players = [prediction["player"] for prediction in players]
+        bodies = [
+            json.dumps({"players": [player]}).encode("utf-8") for player in players
+        ]
+        n_requests = int(rate * duration)
+        counter = itertools.count()
+        latencies = numpy.full(n_requests, numpy.nan)
+        statuses = numpy.zeros(n_requests, dtype=int)
+        start = time.perf_counter() + 0.1
+
+        def run_client(client_seed):
+            generator = random.Random(client_seed)
+            connection = _connect(address)
+            for i in counter:
+                if i >= n_requests:
+                    break
+                scheduled = start + i / rate
+                time.sleep(max(0.0, scheduled - time.perf_counter()))
+                try:
+                    statuses[i], _ = _request(
+                        address, "POST", "/score", generator.choice(bodies), connection
+                    )
+                except OSError:
+                    connection.close()
+                    connection = _connect(address)
+                    statuses[i] = -1
+                latencies[i] = time.perf_counter() - scheduled
+            connection.close()
+
+        clients = [
+            threading.Thread(target=run_client, args=(seed_packages() + k,))
+            for k in range(concurrency)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+        _, server_metrics = _request(address, "GET", "/metrics.json")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+    errors = int((statuses != 200).sum())
+    results = {
+        "metadata": {
+            **get_machine_metadata(),
+            "url": url if process is None else None,
+            "rate": rate,
+            "duration_seconds": duration,
+            "concurrency": concurrency,
+        },
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_per_second": n_requests / elapsed,
+        "latency_ms": {
+            "p50": float(numpy.quantile(latencies, 0.5) * 1000),
+            "p90": float(numpy.quantile(latencies, 0.9) * 1000),
+            "p99": float(numpy.quantile(latencies, 0.99) * 1000),
+            "max": float(latencies.max() * 1000),
+        },
+        "server": server_metrics,
+    }
+    logger.info(
+        "%d requests at %.0f/s (%.0f/s achieved) : p50 %.2f ms - p99 %.2f ms"
+        " - max %.2f ms - %d errors - %.1f rows per batch",
+        n_requests,
+        rate,
+        results["throughput_per_second"],
+        results["latency_ms"]["p50"],
+        results["latency_ms"]["p99"],
+        results["latency_ms"]["max"],
+        errors,
+        server_metrics["mean_batch_rows"],
+    )
+    _write_json(results, os.path.abspath(bench_conf.results))
+    logger.info("Server measurements written to %s", bench_conf.results)
+    return errors == 0
+
+
+def get_machine_metadata() -> dict:
+    """Describe the machine and software measurements are made with.
+
+    Returns:
+        dict: Date, platform, CPU, memory, Python and package versions, worker processes and commit
+    """
+    import platform
+
+    import numpy
+    import pandas
+    import sklearn
+
+    from nba_mvp_predictor import parallel
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        memory_gb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3
+    except (AttributeError, ValueError, OSError):
+        memory_gb = None
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": memory_gb,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+        "n_jobs": parallel.get_n_jobs(),
+        "commit": commit,
+    }
+
+
+def _measure_stage(stage: str, context) -> dict:
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_stage, args=(stage, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": f"process exited with code {process.exitcode}"}
+    process.join()
+    if "error" in result:
+        raise RuntimeError(f"Stage {stage} failed : {result['error']}")
+    return result
+
+
+def _run_stage(stage: str, sender):
+    import resource
+
+    # Logs of the stages would drown the measurements
+    logger.setLevel(logging.WARNING)
+    seed_packages()
+    try:
+        func, args = _prepare_stage(stage)
+        start_times = os.times()
+        start = time.perf_counter()
+        func(*args)
+        wall_seconds = time.perf_counter() - start
+        end_times = os.times()
+    except Exception as e:
+        sender.send({"error": repr(e)})
+        return
+    # Kilobytes on Linux, bytes on macOS
+    unit = 1024**2 if sys.platform == "darwin" else 1024
+    sender.send(
+        {
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": sum(end_times[:4]) - sum(start_times[:4]),
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+            "workers_peak_rss_mb": resource.getrusage(
+                resource.RUSAGE_CHILDREN
+            ).ru_maxrss
+            / unit,
+        }
+    )
+
+
+def _run_server(sender):
+    from nba_mvp_predictor import serve
+
+    # Request logs would slow the server down
+    logger.setLevel(logging.WARNING)
+    seed_packages()
+    try:
+        httpd = serve.make_server(port=0)
+    except Exception as e:
+        sender.send(repr(e))
+        return
+    sender.send(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+def _connect(address):
+    from http import client
+
+    return client.HTTPConnection(address.hostname, address.port, timeout=30)
+
+
+def _request(address, method: str, path: str, body=None, connection=None):
+    if connection is None:
+        connection = _connect(address)
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def _prepare_stage(stage: str):
+    """Load the inputs of a stage.
+
+    Returns:
+        tuple[Callable, tuple]: Function running the stage and its arguments
+    """
+    import numpy
+    import pandas
+
+    from nba_mvp_predictor import load, model, parallel, predict, train
+
+    if stage == "bronze":
+        return train.build_bronze_data, ()
+    if stage == "silver":
+        return train.make_silver_data, ()
+    if stage == "train":
+        return train.make_gold_data_and_train_model, ()
+    if stage == "predict":
+        return predict.load_model_make_predictions, ()
+    if stage == "shap":
+        from nba_mvp_predictor import explain
+
+        return explain.explain_model, ()
+    if stage == "web":
+        # Imports streamlit, that other stages do not need
+        from nba_mvp_predictor import web
+
+        predictions = load.load_predictions()
+        days = pandas.date_range(end=datetime.now().date(), periods=_HISTORY_DAYS)
+        history = pandas.DataFrame(
+            {
+                "date": numpy.repeat(days, len(predictions)),
+                "player": numpy.tile(predictions["PLAYER"], len(days)),
+                "prediction": numpy.tile(predictions["PRED"], len(days)),
+            }
+        )
+        history["days_ago"] = (days[-1] - history["date"]).dt.days
+        return web.prepare_history, (history, 5, web.CONFIDENCE_MODE_SHARE, 5, 30)
+    silver = load.load_silver_data()
+    if stage == "pruning":
+        return train.prune_correlated_features, (silver,)
+    if stage == "gold":
+        return train.make_gold_data, (silver, *train.prune_correlated_features(silver))
+    data, features, target = _load_training_data()
+    if stage == "selection":
+        return train.select_features, (data, load.load_features()["num"], target)
+    if stage == "cv":
+
+        def cross_validate():
+            arrays = train.build_training_arrays(data, features, target)
+            with parallel.shared_arrays(**arrays) as paths:
+                train.cross_validate(model.get_model(), paths, numpy.arange(len(data)))
+
+        return cross_validate, ()
+    if stage == "loso":
+        return train.evaluate_all_seasons, (
+            model.get_model(),
+            data,
+            features,
+            target,
+            data["MVP_RANK"],
+            get_conf().train.warm_start,
+        )
+    raise ValueError(f"Unknown stage {stage}, choose from {STAGES}")
+
+
+def _write_json(content: dict, file_path: str):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as outfile:
+        json.dump(content, outfile, indent=4)
+
+
+def _load_training_data():
+    from nba_mvp_predictor import load, utils
+
+    data = load.load_gold_data()
+    data = data[data.SEASON < utils.get_current_season()]
+    features = load.load_features()["model"]
+    return data, features, "MVP_VOTES_SHARE"
+
+
+def _slice_frames(data, features: list[str], target: str):
+    # Inputs of each season as built before the training matrix was shared
+    for season in data.SEASON.unique():
+        train_data = data[data.SEASON != season]
+        test_data = data[data.SEASON == season]
+        arrays = (
+            train_data[features].to_numpy(dtype="float32"),
+            train_data[target].to_numpy(dtype="float64"),
+            test_data[features].to_numpy(dtype="float32"),
+        )
+        copied = train_data.memory_usage(index=True).sum()
+        copied += test_data.memory_usage(index=True).sum()
+        yield copied + sum(array.nbytes for array in arrays), arrays
+
+
+def _select_rows(data, features: list[str], target: str):
+    import numpy
+
+    from nba_mvp_predictor import train
+
+    training_arrays = train.build_training_arrays(data, features, target)
+    X, y = training_arrays["X"], training_arrays["y"]
+    copied = sum(array.nbytes for array in training_arrays.values())
+    for season in data.SEASON.unique():
+        train_rows = numpy.flatnonzero(training_arrays["seasons"] != season)
+        test_rows = numpy.flatnonzero(training_arrays["seasons"] == season)
+        arrays = (X[train_rows], y[train_rows], X[test_rows])
+        yield copied + sum(array.nbytes for array in arrays), arrays
+        copied = 0
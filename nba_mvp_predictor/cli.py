@@ -1,33 +1,168 @@
 import argparse
 import sys
 
-import streamlit.web.cli
+from nba_mvp_predictor import seed_packages
 
-from nba_mvp_predictor import download, explain, predict, train
+# Subcommand modules and their heavy dependencies (sklearn, shap, streamlit...)
+# are imported when the subcommand runs, to keep the CLI startup fast.
 
 
 def download_data(args=None):
     """Download data"""
+    from nba_mvp_predictor import download
+
     download.download_data(args.seasons)
 
 
+def generate_data(args=None):
+    """Generate synthetic data in place of downloaded data"""
+    from nba_mvp_predictor import logger, synthetic
+
+    try:
+        synthetic.generate_data(
+            n_seasons=args.n_seasons,
+            n_teams=args.n_teams,
+            players_per_team=args.players_per_team,
+            n_leagues=args.n_leagues,
+            scale=args.scale,
+            directory=args.directory,
+            overwrite=args.overwrite,
+        )
+    except FileExistsError as e:
+        logger.error(f"Generating synthetic data failed : {e}")
+        return 1
+    return 0
+
+
 def train_model(args=None):
     """Train a model on dowloaded data"""
+    from nba_mvp_predictor import train
+
     train.train_model()
 
 
+def tune_model(args=None):
+    """Search the hyperparameters of the model"""
+    from nba_mvp_predictor import tune
+
+    tune.tune_model(n_configs=args.n_configs, restart=args.restart)
+
+
 def make_predictions(args=None):
     """Make predictions with the trained model"""
-    predict.make_predictions()
+    from nba_mvp_predictor import predict
+
+    predict.make_predictions(refresh=args.refresh, explain=args.explain)
+
+
+def simulate_season(args=None):
+    """Simulate the rest of the season"""
+    from nba_mvp_predictor import simulate
+
+    simulate.simulate_season(n_simulations=args.n_simulations)
 
 
 def explain_model(args=None):
     """Explain model decisions"""
-    explain.explain_model()
+    if args.all_seasons:
+        from nba_mvp_predictor import importance
+
+        importance.explain_seasons()
+    else:
+        from nba_mvp_predictor import explain
+
+        explain.explain_model()
+
+
+def run_pipeline(args=None):
+    """Run the pipeline stages that are not up to date"""
+    from nba_mvp_predictor import pipeline
+
+    # Stage names are checked here, declaring stages at parse time loads the conf
+    names = [stage.name for stage in pipeline.get_stages()]
+    for name in [args.from_stage, args.until_stage, *(args.force_stages or [])]:
+        if name is not None and name not in names:
+            print(
+                f"Unknown stage {name}, choose from {', '.join(names)}",
+                file=sys.stderr,
+            )
+            return 2
+    ok = pipeline.run(
+        from_stage=args.from_stage,
+        until_stage=args.until_stage,
+        force=args.force,
+        force_stages=args.force_stages,
+    )
+    return 0 if ok else 1
+
+
+def serve_model(args=None):
+    """Serve predictions over HTTP"""
+    from nba_mvp_predictor import serve
+
+    serve.serve(host=args.host, port=args.port)
+
+
+def score_what_if(args=None):
+    """Score hypothetical changes of player features"""
+    from nba_mvp_predictor import conf, logger, serve, whatif
+
+    try:
+        perturbations = [whatif.parse_perturbation(text) for text in args.vary]
+        state = serve.ModelState.load()
+        scenarios = whatif.score_scenarios(state, args.players, perturbations)
+    except (ValueError, KeyError) as e:
+        logger.error(f"What-if scoring failed : {e}")
+        return 1
+    logger.info(f"Scenarios :\n{scenarios.to_string(index=False)}")
+    if args.output is not None:
+        scenarios.to_csv(
+            args.output,
+            sep=conf.data.predictions.sep,
+            encoding=conf.data.predictions.encoding,
+            index=False,
+        )
+    return 0
+
+
+def run_benchmark(args=None):
+    """Run a benchmark"""
+    from nba_mvp_predictor import benchmark
+
+    if args.target == "startup":
+        ok = benchmark.check_startup(budget_ms=args.budget_ms)
+    elif args.target == "warm-start":
+        benchmark.compare_warm_starts()
+        ok = True
+    elif args.target == "slicing":
+        ok = benchmark.compare_slicing()
+    elif args.target == "models":
+        benchmark.compare_models()
+        ok = True
+    elif args.target == "inference":
+        ok = benchmark.benchmark_inference()
+    elif args.target == "stages":
+        ok = benchmark.benchmark_stages(
+            scale=args.scale,
+            baseline=args.baseline,
+            threshold=args.threshold,
+            save_baseline=args.save_baseline,
+            repeat=args.repeat,
+        )
+    elif args.target == "serve":
+        ok = benchmark.benchmark_serve(
+            url=args.url,
+            rate=args.rate,
+            duration=args.duration,
+            concurrency=args.concurrency,
+        )
+    return 0 if ok else 1
 
 
 def run_webapp(args=None):
     """Run the web application"""
+    import streamlit.web.cli
+
     sys.argv = ["0", "run", "./streamlit_app.py"]
     streamlit.web.cli.main()
 
@@ -47,9 +182,213 @@ def get_parser():
         nargs="+",
         type=int,
     )
+    synthetic_parser = subparser.add_parser(
+        "synthetic",
+        help="Generate a synthetic league history in place of downloaded data",
+    )
+    synthetic_parser.add_argument(
+        "--scale",
+        required=False,
+        help="Data size factor (multiplies the number of leagues)",
+        type=int,
+        default=1,
+    )
+    synthetic_parser.add_argument(
+        "--n-seasons", required=False, help="Number of seasons", type=int
+    )
+    synthetic_parser.add_argument(
+        "--n-teams", required=False, help="Number of teams per league", type=int
+    )
+    synthetic_parser.add_argument(
+        "--players-per-team", required=False, help="Roster size", type=int
+    )
+    synthetic_parser.add_argument(
+        "--n-leagues", required=False, help="Number of leagues at scale 1", type=int
+    )
+    synthetic_parser.add_argument(
+        "--directory",
+        required=False,
+        help="Directory to write data into, instead of the working directory",
+    )
+    synthetic_parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Replace existing data files",
+    )
     subparser.add_parser("train", help="Train a model on dowloaded data")
-    subparser.add_parser("predict", help="Make predictions with the trained model")
-    subparser.add_parser("explain", help="Explain the predictions made by the model")
+    tune_parser = subparser.add_parser(
+        "tune", help="Search the hyperparameters of the model on gold data"
+    )
+    tune_parser.add_argument(
+        "--n-configs",
+        required=False,
+        help="Number of configurations to sample",
+        type=int,
+    )
+    tune_parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard the trials of previous searches",
+    )
+    predict_parser = subparser.add_parser(
+        "predict", help="Make predictions with the trained model"
+    )
+    predict_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Only process the downloaded current season, without rebuilding bronze and silver data",
+    )
+    predict_parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Also explain the predictions, handed to the explanation in memory, while files are written in the background",
+    )
+    simulate_parser = subparser.add_parser(
+        "simulate",
+        help="Simulate the rest of the season to estimate MVP probabilities",
+    )
+    simulate_parser.add_argument(
+        "--n-simulations",
+        required=False,
+        help="Number of simulated seasons",
+        type=int,
+    )
+    explain_parser = subparser.add_parser(
+        "explain", help="Explain the predictions made by the model"
+    )
+    explain_parser.add_argument(
+        "--all-seasons",
+        action="store_true",
+        help="Explain every player of every season and write feature importances per season and era",
+    )
+    serve_parser = subparser.add_parser(
+        "serve",
+        help="Serve predictions of the current season over HTTP, with the model kept in memory",
+    )
+    serve_parser.add_argument(
+        "--host", required=False, help="Address to listen on", type=str
+    )
+    serve_parser.add_argument(
+        "--port", required=False, help="Port to listen on", type=int
+    )
+    whatif_parser = subparser.add_parser(
+        "whatif",
+        help="Score hypothetical changes of the features of current season players",
+    )
+    whatif_parser.add_argument(
+        "--players", required=True, help="Players to change", nargs="+", type=str
+    )
+    whatif_parser.add_argument(
+        "--vary",
+        required=True,
+        help="Feature, operator (+, -, * or =) and comma-separated values, e.g. FG_per_game+1,2 or CONF_RANK=3 (repeat to combine as a grid)",
+        action="append",
+    )
+    whatif_parser.add_argument(
+        "--output", required=False, help="CSV file to write the scenarios to"
+    )
+    run_parser = subparser.add_parser(
+        "run", help="Run the pipeline stages that are not up to date"
+    )
+    run_parser.add_argument(
+        "--from",
+        dest="from_stage",
+        required=False,
+        help="Only run this stage and the stages depending on it",
+        metavar="STAGE",
+    )
+    run_parser.add_argument(
+        "--until",
+        dest="until_stage",
+        required=False,
+        help="Only run this stage and the stages it depends on",
+        metavar="STAGE",
+    )
+    run_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run selected stages even if their outputs are up to date",
+    )
+    run_parser.add_argument(
+        "--force-stage",
+        dest="force_stages",
+        required=False,
+        help="Run this stage even if its outputs are up to date, or pinned like the model (repeat to force many)",
+        action="append",
+        metavar="STAGE",
+    )
+    bench_parser = subparser.add_parser("bench", help="Run a benchmark")
+    bench_parser.add_argument(
+        "target",
+        help="What to benchmark (startup: CLI import time, warm-start: cold and warm-started season evaluations, slicing: inputs of the held-out seasons built from data frames and from one matrix, models: cost and quality of each model, inference: scoring with the pickled model and with its exported weights, stages: time and memory of each pipeline stage on synthetic data, serve: latency of the prediction server under load)",
+        choices=[
+            "startup",
+            "warm-start",
+            "slicing",
+            "models",
+            "inference",
+            "stages",
+            "serve",
+        ],
+    )
+    bench_parser.add_argument(
+        "--budget-ms",
+        required=False,
+        help="Maximum CLI import time in milliseconds",
+        type=float,
+    )
+    bench_parser.add_argument(
+        "--scale",
+        required=False,
+        help="Synthetic data size factor of the stages benchmark",
+        type=int,
+        default=1,
+    )
+    bench_parser.add_argument(
+        "--baseline",
+        required=False,
+        help="Stage measurements to compare with",
+    )
+    bench_parser.add_argument(
+        "--threshold",
+        required=False,
+        help="Relative increase of a stage measurement that is a regression",
+        type=float,
+    )
+    bench_parser.add_argument(
+        "--repeat",
+        required=False,
+        help="Runs of each stage, the lowest measurements are kept",
+        type=int,
+    )
+    bench_parser.add_argument(
+        "--url",
+        required=False,
+        help="URL of a running prediction server to load test, instead of starting one",
+    )
+    bench_parser.add_argument(
+        "--rate",
+        required=False,
+        help="Requests per second sent to the prediction server",
+        type=float,
+    )
+    bench_parser.add_argument(
+        "--duration",
+        required=False,
+        help="Seconds of load sent to the prediction server",
+        type=float,
+    )
+    bench_parser.add_argument(
+        "--concurrency",
+        required=False,
+        help="Concurrent clients sending requests to the prediction server",
+        type=int,
+    )
+    bench_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save the stage measurements as the new baseline",
+    )
     return parser
 
 
@@ -61,13 +400,28 @@ def run(args=None):
     """
     parser = get_parser()
     args = parser.parse_args(args)
+    seed_packages()
     if args.command == "web":
         run_webapp(args)
     elif args.command == "download":
         download_data(args)
+    elif args.command == "synthetic":
+        return generate_data(args)
     elif args.command == "train":
         train_model(args)
+    elif args.command == "tune":
+        tune_model(args)
     elif args.command == "predict":
         make_predictions(args)
+    elif args.command == "simulate":
+        simulate_season(args)
     elif args.command == "explain":
         explain_model(args)
+    elif args.command == "serve":
+        serve_model(args)
+    elif args.command == "whatif":
+        return score_what_if(args)
+    elif args.command == "run":
+        return run_pipeline(args)
+    elif args.command == "bench":
+        return run_benchmark(args)
@@ -0,0 +1,158 @@
+from os import path
+
+import pandas
+
+from nba_mvp_predictor import conf, load, logger, utils
+
+_TEAM_NAMES_PATH = path.join(path.dirname(__file__), "team_names.yaml")
+
+
+def build_team_dimension(
+    team_names: dict | None = None,
+    teams: list[str] | None = None,
+    existing: pandas.DataFrame | None = None,
+):
+    """Build the team dimension table, one integer key per team.
+
+    Known teams come from the team names mapping (in file order), then any other
+    team found in scraped data (e.g. TOT for traded players). Existing keys are kept.
+
+    Args:
+        team_names (dict, optional): Mapping of full team name to short name. Defaults to team_names.yaml.
+        teams (list[str], optional): Short team names found in scraped data. Defaults to None.
+        existing (pandas.DataFrame, optional): Previous team dimension. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: Teams with columns TEAM_ID and TEAM
+    """
+    if team_names is None:
+        team_names = utils.get_dict_from_yaml(_TEAM_NAMES_PATH)
+    known = list(dict.fromkeys(team_names.values()))
+    scraped = sorted(set(teams or []).difference(known))
+    return _extend_dimension(existing, "TEAM", "TEAM_ID", known + scraped)
+
+
+def build_player_dimension(
+    players: list[str], existing: pandas.DataFrame | None = None
+):
+    """Build the player dimension table, one integer key per player name.
+
+    Args:
+        players (list[str]): Player names found in scraped data
+        existing (pandas.DataFrame, optional): Previous player dimension. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: Players with columns PLAYER_ID and PLAYER
+    """
+    return _extend_dimension(existing, "PLAYER", "PLAYER_ID", sorted(set(players)))
+
+
+def update_dimensions(data: list[pandas.DataFrame]):
+    """Load the dimension tables, add new players and teams found in data and save them.
+
+    Args:
+        data (list[pandas.DataFrame]): Scraped datasets with PLAYER and/or TEAM columns
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: Player and team dimensions
+    """
+    try:
+        players = load.load_players()
+        teams = load.load_teams()
+    except FileNotFoundError:
+        logger.info("No existing dimension tables found: building them")
+        players, teams = None, None
+    player_names = [
+        name for df in data if "PLAYER" in df.columns for name in df["PLAYER"].unique()
+    ]
+    team_names = [
+        name for df in data if "TEAM" in df.columns for name in df["TEAM"].unique()
+    ]
+    players = build_player_dimension(player_names, existing=players)
+    teams = build_team_dimension(teams=team_names, existing=teams)
+    logger.debug(f"Dimensions : {len(players)} players - {len(teams)} teams")
+    players.to_csv(
+        conf.data.players.path,
+        sep=conf.data.players.sep,
+        encoding=conf.data.players.encoding,
+        index=False,
+    )
+    teams.to_csv(
+        conf.data.teams.path,
+        sep=conf.data.teams.sep,
+        encoding=conf.data.teams.encoding,
+        index=False,
+    )
+    return players, teams
+
+
+def add_keys(
+    data: pandas.DataFrame,
+    players: pandas.DataFrame | None = None,
+    teams: pandas.DataFrame | None = None,
+):
+    """Add integer keys (PLAYER_ID, TEAM_ID, SEASON) and drop the name columns they replace.
+
+    Args:
+        data (pandas.DataFrame): Data with PLAYER, TEAM and SEASON columns
+        players (pandas.DataFrame, optional): Player dimension. Defaults to None (no PLAYER_ID).
+        teams (pandas.DataFrame, optional): Team dimension. Defaults to None (no TEAM_ID).
+
+    Returns:
+        pandas.DataFrame: Data keyed on integers
+    """
+    data = data.copy()
+    if players is not None:
+        data["PLAYER_ID"] = _intern(data["PLAYER"], players, "PLAYER", "PLAYER_ID")
+        data = data.drop("PLAYER", axis="columns")
+    if teams is not None:
+        data["TEAM_ID"] = _intern(data["TEAM"], teams, "TEAM", "TEAM_ID")
+        data = data.drop("TEAM", axis="columns")
+    data["SEASON"] = data["SEASON"].astype(load.KEY_DTYPES["SEASON"])
+    return data
+
+
+def add_names(
+    data: pandas.DataFrame,
+    players: pandas.DataFrame | None = None,
+    teams: pandas.DataFrame | None = None,
+):
+    """Join readable PLAYER and TEAM names back from their integer keys.
+
+    Args:
+        data (pandas.DataFrame): Data with PLAYER_ID and/or TEAM_ID columns
+        players (pandas.DataFrame, optional): Player dimension. Defaults to None.
+        teams (pandas.DataFrame, optional): Team dimension. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: Data with PLAYER and TEAM columns first
+    """
+    names = []
+    if players is not None:
+        data = data.join(players.set_index("PLAYER_ID"), on="PLAYER_ID")
+        names.append("PLAYER")
+    if teams is not None:
+        data = data.join(teams.set_index("TEAM_ID"), on="TEAM_ID")
+        names.append("TEAM")
+    return data[names + [col for col in data.columns if col not in names]]
+
+
+def _intern(names: pandas.Series, dimension: pandas.DataFrame, name_col, key_col):
+    # Keys are the row positions of the dimension table
+    codes = pandas.Index(dimension[name_col]).get_indexer(names)
+    if (codes < 0).any():
+        unknown = names[codes < 0].unique().tolist()
+        raise ValueError(f"Unknown values for {name_col} : {unknown}")
+    return pandas.Series(codes, index=names.index).astype(load.KEY_DTYPES[key_col])
+
+
+def _extend_dimension(existing, name_col, key_col, names):
+    known = [] if existing is None else existing[name_col].tolist()
+    known_set = set(known)
+    all_names = known + [name for name in names if name not in known_set]
+    return pandas.DataFrame(
+        {
+            key_col: pandas.RangeIndex(len(all_names)).astype(load.KEY_DTYPES[key_col]),
+            name_col: all_names,
+        }
+    )
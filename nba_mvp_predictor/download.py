@@ -1,12 +1,15 @@
 import requests
 
-from nba_mvp_predictor import conf, logger, scrappers
+from nba_mvp_predictor import conf, logger, scrappers, tracing
 
 
+@tracing.traced("download")
 def download_data(
     seasons: list[int] | None = None,
-    scrapper: scrappers.Scrapper = scrappers.BasketballReferenceScrapper(),
+    scrapper: scrappers.Scrapper | None = None,
 ):
+    if scrapper is None:
+        scrapper = scrappers.BasketballReferenceScrapper()
     logger.info("Downloading player stats...")
     try:
         download_player_stats(seasons=seasons, scrapper=scrapper)
@@ -28,43 +31,49 @@ def download_player_stats(seasons: list[int] | None, scrapper: scrappers.Scrappe
     # We do not retrieve totals stats since we want to be able to predict at any moment in the season
     # That's not a big deal since we will have total games played, stats per game and per minute (will be highly correlated)
     # We could have normalized totals within the season if we'd have really want to use them
-    data = scrapper.build_multi_season_league_player_stats(
-        subset_by_seasons=seasons,
-        subset_by_stat_types=["per_game", "per_36min", "per_100poss", "advanced"],
-    )
-    data.to_csv(
-        conf.data.player_stats.path,
-        sep=conf.data.player_stats.sep,
-        encoding=conf.data.player_stats.encoding,
-        compression=conf.data.player_stats.compression,
-        index=True,
-    )
+    with tracing.span("download.player_stats") as span:
+        data = scrapper.build_multi_season_league_player_stats(
+            subset_by_seasons=seasons,
+            subset_by_stat_types=["per_game", "per_36min", "per_100poss", "advanced"],
+        )
+        data.to_csv(
+            conf.data.player_stats.path,
+            sep=conf.data.player_stats.sep,
+            encoding=conf.data.player_stats.encoding,
+            compression=conf.data.player_stats.compression,
+            index=True,
+        )
+        span.set_frame(data).set_file(conf.data.player_stats.path)
 
 
 def download_mvp_votes(seasons: list[int] | None, scrapper: scrappers.Scrapper):
-    data = scrapper.get_mvp(
-        subset_by_seasons=seasons,
-    )
-    data.to_csv(
-        conf.data.mvp_votes.path,
-        sep=conf.data.mvp_votes.sep,
-        encoding=conf.data.mvp_votes.encoding,
-        compression=conf.data.mvp_votes.compression,
-        index=True,
-    )
+    with tracing.span("download.mvp_votes") as span:
+        data = scrapper.get_mvp(
+            subset_by_seasons=seasons,
+        )
+        data.to_csv(
+            conf.data.mvp_votes.path,
+            sep=conf.data.mvp_votes.sep,
+            encoding=conf.data.mvp_votes.encoding,
+            compression=conf.data.mvp_votes.compression,
+            index=True,
+        )
+        span.set_frame(data).set_file(conf.data.mvp_votes.path)
 
 
 def download_team_standings(seasons: list[int] | None, scrapper: scrappers.Scrapper):
-    data = scrapper.get_team_standings(
-        subset_by_seasons=seasons,
-    )
-    data.to_csv(
-        conf.data.team_standings.path,
-        sep=conf.data.team_standings.sep,
-        encoding=conf.data.team_standings.encoding,
-        compression=conf.data.team_standings.compression,
-        index=True,
-    )
+    with tracing.span("download.team_standings") as span:
+        data = scrapper.get_team_standings(
+            subset_by_seasons=seasons,
+        )
+        data.to_csv(
+            conf.data.team_standings.path,
+            sep=conf.data.team_standings.sep,
+            encoding=conf.data.team_standings.encoding,
+            compression=conf.data.team_standings.compression,
+            index=True,
+        )
+        span.set_frame(data).set_file(conf.data.team_standings.path)
 
 
 def download_data_from_url_to_file(
@@ -81,17 +90,19 @@ def download_data_from_url_to_file(
         path (str): Chemin vers un fichier local
         stream (bool, optional): Si la donnée doit être streamée (recommandé pour les fichiers volumineux). Defaults to True.
     """
-    response = requests.get(
-        url,
-        allow_redirects=True,
-        verify=True,
-        stream=stream,
-        auth=auth,
-        headers=headers,
-    )
-    with open(path, "wb") as file_writer:
-        if stream:
-            for chunk in response.iter_content(chunk_size=4096):
-                file_writer.write(chunk)
-        else:
-            file_writer.write(response.content)
+    with tracing.span("download.file", url=url) as span:
+        response = requests.get(
+            url,
+            allow_redirects=True,
+            verify=True,
+            stream=stream,
+            auth=auth,
+            headers=headers,
+        )
+        with open(path, "wb") as file_writer:
+            if stream:
+                for chunk in response.iter_content(chunk_size=4096):
+                    file_writer.write(chunk)
+            else:
+                file_writer.write(response.content)
+        span.set(status_code=response.status_code).set_file(path)
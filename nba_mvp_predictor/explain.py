@@ -1,38 +1,595 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy
 import pandas
 import shap
 
-from nba_mvp_predictor import conf, load, logger
+from nba_mvp_predictor import (
+    SEED,
+    attribution,
+    conf,
+    feature_store,
+    load,
+    logger,
+    mlp,
+    parallel,
+    seed_packages,
+    tracing,
+    utils,
+)
+
+SHAP = "shap"
+# Summaries of the background population
+ALL = "all"
+KMEANS = "kmeans"
+STRATIFIED = "stratified"
+RANDOM = "random"
+_POSITION_PREFIX = "POS_"
+_HISTORY_COLUMNS = ["DATE", "player_season_team", "PLAYER", "KEY"]
 
 
+@tracing.traced("explain")
 def explain_model():
-    """Explain model predictions."""
-    model = load.load_model()
-    model_input = load.load_model_input().astype(float)
+    """Explain model predictions, read from disk."""
+    model = load.load_scorer()
     predictions = load.load_predictions()
+    features_dict = load.load_features()
+    if "version" in features_dict:
+        model_input = feature_store.load_model_input(
+            features_dict["version"],
+            features_dict["model"],
+            seasons=[predictions.SEASON.max()],
+        )
+    else:
+        # Features saved before the feature store existed
+        model_input = load.load_model_input()
+    return explain_predictions(model, model_input, predictions)
+
+
+def explain_predictions(
+    model,
+    model_input: pandas.DataFrame,
+    predictions: pandas.DataFrame,
+    writer: utils.BackgroundWriter | None = None,
+    method: str | None = None,
+) -> pandas.DataFrame:
+    """Explain the predictions of the current season.
+
+    Attributions are appended to the explanations history, and those of players
+    whose model input, model and background did not change since a previous day
+    are read from it instead of being computed again. Attributions computed from
+    the weights of the model are checked against SHAP values of the top players:
+    beyond explain.max-relative-error, the top players are explained by SHAP instead.
+
+    Args:
+        model (sklearn.base.BaseEstimator | mlp.MLPScorer): Model
+        model_input (pandas.DataFrame): Model input of all players of the season
+        predictions (pandas.DataFrame): Predictions, with their PRED_RANK and PLAYER
+        writer (utils.BackgroundWriter, optional): Writer of the files in the background. Defaults to writing them right away.
+        method (str, optional): Attribution method. Defaults to the method of the model (see get_method).
+
+    Returns:
+        pandas.DataFrame: Attributions of the players of the predictions, by rank
+    """
+    explain_conf = conf.explain
+    model_input = model_input.astype(float)
     predictions = predictions.sort_values(by="PRED_RANK", ascending=True)
     player_season_team_list = predictions.index.to_list()
-    # Analyze SHAP values on 10 top players
-    sample_size = 10
-    logger.debug(f"SHAP values will be computed for : {sample_size} top players")
-    sample = model_input[model_input.index.isin(player_season_team_list[:sample_size])]
     logger.debug(f"Number of players in predictions : {len(player_season_team_list)}")
     logger.debug(f"Total population : {len(model_input)}")
     population = model_input
-    logger.debug(f"Population size for SHAP : {len(population)}")
-
-    explainer = shap.Explainer(model.predict, population, algorithm="auto")
-    shap_values = explainer(sample)
-    sample["player"] = sample.index
-    sample["player"] = sample["player"].map(predictions["PLAYER"])
-    sample = sample.reset_index(drop=True)
-    feature_names = shap_values.feature_names
-    shap_df = pandas.DataFrame(
-        shap_values.values, columns=feature_names, index=sample.player
+    background, background_weights = summarize_background(
+        population, explain_conf.background.method, explain_conf.background.size
     )
-    shap_df.to_csv(
-        conf.data.shap_values.path,
-        sep=conf.data.shap_values.sep,
-        encoding=conf.data.shap_values.encoding,
-        compression=conf.data.shap_values.compression,
-        index=True,
+    logger.debug(f"Background size for explanations : {len(background)}")
+    if method is None:
+        method = get_method(model)
+    if method == SHAP:
+        # Analyze SHAP values on top players
+        sample_size = explain_conf.shap_size
+        logger.debug(f"SHAP values will be computed for : {sample_size} top players")
+        sample = model_input.loc[
+            [p for p in player_season_team_list[:sample_size] if p in model_input.index]
+        ]
+    else:
+        # Every player of the season is explained from the weights of the model
+        sample = model_input
+    keys = get_cache_keys(sample, background, background_weights, method)
+    history = load_explain_history()
+    cached = history.drop_duplicates(subset=["KEY"], keep="last").set_index("KEY")
+    is_cached = keys.isin(cached.index)
+    logger.info(f"Attributions of {is_cached.sum()} players found in the history")
+    report = {
+        "method": method,
+        "background": explain_conf.background.method,
+        "background_rows": len(background),
+        "population_rows": len(population),
+        "cached_rows": int(is_cached.sum()),
+    }
+    start = time.perf_counter()
+    computed = sample[~is_cached.to_numpy()]
+    if len(computed) == 0:
+        computed = computed.copy()
+    elif method == SHAP:
+        computed = get_shap_values(
+            model,
+            computed,
+            background,
+            max_evals=explain_conf.max_evals,
+            time_budget=explain_conf.time_budget_seconds,
+        )
+    else:
+        computed = get_attributions(
+            model, computed, background, method, background_weights
+        )
+    report["seconds"] = time.perf_counter() - start
+    report["computed_rows"] = len(computed)
+    # Only attributions computed today are checked, others were checked before
+    players = [p for p in player_season_team_list if p in computed.index]
+    if is_cached.any():
+        reused = cached.loc[keys[is_cached], sample.columns]
+        computed = pandas.concat([reused.set_index(keys[is_cached].index), computed])
+    attributions = computed
+    attributions = attributions.loc[
+        [row for row in sample.index if row in attributions.index]
+    ]
+    if method != SHAP:
+        report["validation"] = validate_attributions(
+            model,
+            method,
+            model_input,
+            population,
+            players[: explain_conf.validation_size],
+        )
+        error = report["validation"].get("relative_error", 0.0)
+        if error > explain_conf.max_relative_error:
+            logger.warning(
+                f"Attributions of the {method} method are {error:.3f} away from "
+                f"SHAP values (tolerance {explain_conf.max_relative_error}), "
+                "top players are explained by SHAP instead"
+            )
+            return explain_predictions(
+                model, model_input, predictions, writer=writer, method=SHAP
+            )
+    report["rows"] = len(attributions)
+    if len(background) < len(population):
+        report["background_error"] = check_background(
+            model,
+            method,
+            attributions,
+            model_input,
+            population,
+            players[: explain_conf.background.check_size],
+        )
+    # Players of the predictions are written, in the order of their rank
+    sample = attributions[attributions.index.isin(player_season_team_list)]
+    sample = sample.loc[[p for p in player_season_team_list if p in sample.index]]
+    shap_df = sample.set_index(sample.index.map(predictions["PLAYER"]).rename("player"))
+    history = append_explain_history(history, attributions, keys, predictions["PLAYER"])
+    utils.write(writer, write_explanations, shap_df, report, history)
+    return shap_df
+
+
+def write_explanations(
+    shap_df: pandas.DataFrame, report: dict, history: pandas.DataFrame
+):
+    """Write the attributions of the day, the explanation report and the history.
+
+    Args:
+        shap_df (pandas.DataFrame): Attributions of the players of the predictions
+        report (dict): Explanation report
+        history (pandas.DataFrame): Explanations history
+    """
+    with tracing.span("explain.write") as span:
+        shap_df.to_csv(
+            conf.data.shap_values.path,
+            sep=conf.data.shap_values.sep,
+            encoding=conf.data.shap_values.encoding,
+            compression=conf.data.shap_values.compression,
+            index=True,
+        )
+        with open(
+            conf.data.explain_report.path,
+            "w",
+            encoding=conf.data.explain_report.encoding,
+        ) as outfile:
+            json.dump(report, outfile, indent=conf.data.explain_report.indent)
+        history.to_csv(
+            conf.data.explain_history.path,
+            sep=conf.data.explain_history.sep,
+            encoding=conf.data.explain_history.encoding,
+            compression=conf.data.explain_history.compression,
+            index=False,
+        )
+        span.set_frame(shap_df).set_file(conf.data.shap_values.path)
+
+
+def get_cache_keys(
+    model_input: pandas.DataFrame,
+    background: pandas.DataFrame,
+    background_weights: numpy.ndarray,
+    method: str,
+) -> pandas.Series:
+    """Identify the attributions of each row of model input.
+
+    The key of a row is the hash of the model artifact, the settings of the
+    attribution method, the background and the row itself: equal keys give equal
+    attributions.
+
+    Args:
+        model_input (pandas.DataFrame): Model input to explain
+        background (pandas.DataFrame): Background model input
+        background_weights (numpy.ndarray): Weights of the background rows
+        method (str): Attribution method
+
+    Returns:
+        pandas.Series: Hexadecimal key of each row, indexed like model_input
+    """
+    settings = get_settings(method, model_input.columns.to_list())
+    context = hashlib.sha256(json.dumps(settings).encode())
+    context.update(background[model_input.columns].to_numpy("float64").tobytes())
+    context.update(numpy.asarray(background_weights, dtype="float64").tobytes())
+    keys = []
+    for row in model_input.to_numpy("float64"):
+        row_context = context.copy()
+        row_context.update(row.tobytes())
+        keys.append(row_context.hexdigest())
+    return pandas.Series(keys, index=model_input.index, name="KEY")
+
+
+def get_settings(method: str, columns: list[str]) -> dict:
+    """Describe what attributions depend on, besides the background and the input.
+
+    Args:
+        method (str): Attribution method
+        columns (list[str]): Model input columns
+
+    Returns:
+        dict: Digest of the model artifact, method and its configuration
+    """
+    model_path = conf.data.model.path
+    if not os.path.exists(model_path):
+        model_path = conf.data.model_weights.path
+    return {
+        "model": mlp.get_digest(model_path),
+        "method": method,
+        "columns": list(columns),
+        "shapley_nodes": conf.explain.shapley_nodes,
+        "integrated_gradients_steps": conf.explain.integrated_gradients_steps,
+        "max_evals": conf.explain.max_evals,
+    }
+
+
+def load_explain_history() -> pandas.DataFrame:
+    """Load the explanations history, empty if there is none yet.
+
+    Returns:
+        pandas.DataFrame: Attributions of each day, with the DATE, the model input
+            row (player_season_team), the PLAYER and the KEY of the attributions
+    """
+    try:
+        history = load.load_explain_history()
+        logger.debug(f"Explanations history found - {history.DATE.nunique()} entries")
+    except FileNotFoundError:
+        history = pandas.DataFrame(columns=_HISTORY_COLUMNS)
+        logger.warning("No explanations history found")
+    return history
+
+
+def append_explain_history(
+    history: pandas.DataFrame,
+    attributions: pandas.DataFrame,
+    keys: pandas.Series,
+    players: pandas.Series,
+) -> pandas.DataFrame:
+    """Replace today's attributions in the explanations history.
+
+    Args:
+        history (pandas.DataFrame): Explanations history
+        attributions (pandas.DataFrame): Attributions of the day, indexed by model input row
+        keys (pandas.Series): Keys of the attributions (see get_cache_keys)
+        players (pandas.Series): Player of each model input row
+
+    Returns:
+        pandas.DataFrame: Explanations history
+    """
+    today = datetime.now().date().strftime("%d-%m-%Y")
+    data = attributions.copy()
+    data.insert(0, "KEY", keys.loc[data.index])
+    data.insert(0, "PLAYER", data.index.map(players))
+    data.insert(0, _HISTORY_COLUMNS[1], data.index)
+    data.insert(0, "DATE", today)
+    history = history[history.DATE != today]
+    if len(history) == 0:
+        return data.reset_index(drop=True)
+    return pandas.concat([history, data], ignore_index=True)
+
+
+def get_method(model) -> str:
+    """Get the configured attribution method, or SHAP if the model has no weights to use.
+
+    Args:
+        model (sklearn.base.BaseEstimator | mlp.MLPScorer): Model
+
+    Returns:
+        str: Attribution method
+    """
+    method = conf.explain.method
+    if method != SHAP and not isinstance(model, mlp.MLPScorer):
+        logger.warning(
+            f"{method} attributions need the weights of a multi-layer perceptron, using SHAP"
+        )
+        method = SHAP
+    return method
+
+
+def summarize_background(
+    population: pandas.DataFrame, method: str = ALL, size: int = 0, seed: int = SEED
+):
+    """Summarize the population explanations compare players with.
+
+    The cost of explanations grows with the number of background rows: a summary
+    of a fixed size bounds it whatever the size of the population.
+
+    Args:
+        population (pandas.DataFrame): Model input of the season
+        method (str, optional): "all" (no summary), "kmeans" (centroids of k-means
+            clusters, weighted by their size), "stratified" (random rows of each
+            position, in proportion) or "random" (random rows). Defaults to "all".
+        size (int, optional): Number of rows of the summary. Defaults to 0 (no summary).
+        seed (int, optional): Random seed. Defaults to SEED.
+
+    Returns:
+        tuple[pandas.DataFrame, numpy.ndarray]: Background rows and their weights
+    """
+    if method == ALL or size <= 0 or size >= len(population):
+        return population, numpy.ones(len(population))
+    rng = numpy.random.default_rng(seed)
+    if method == KMEANS:
+        from sklearn import cluster
+
+        kmeans = cluster.KMeans(n_clusters=size, n_init=4, random_state=seed)
+        labels = kmeans.fit_predict(population.to_numpy())
+        background = pandas.DataFrame(
+            kmeans.cluster_centers_, columns=population.columns
+        )
+        return background, numpy.bincount(labels, minlength=size).astype("float64")
+    if method == STRATIFIED:
+        positions = [c for c in population.columns if c.startswith(_POSITION_PREFIX)]
+        if len(positions) == 0:
+            raise ValueError("Stratified background needs the position features")
+        strata = population[positions].to_numpy().argmax(axis=1)
+        rows = []
+        for stratum in numpy.unique(strata):
+            stratum_rows = numpy.flatnonzero(strata == stratum)
+            n = max(1, round(size * len(stratum_rows) / len(population)))
+            rows.append(rng.choice(stratum_rows, min(n, len(stratum_rows)), False))
+        rows = numpy.sort(numpy.concatenate(rows))
+    elif method == RANDOM:
+        rows = numpy.sort(rng.choice(len(population), size, replace=False))
+    else:
+        raise ValueError(
+            f"Unknown background {method}, use {ALL}, {KMEANS}, {STRATIFIED} or {RANDOM}"
+        )
+    return population.iloc[rows], numpy.ones(len(rows))
+
+
+def get_shap_values(
+    model,
+    sample: pandas.DataFrame,
+    population: pandas.DataFrame,
+    max_evals="auto",
+    time_budget: float = 0,
+    n_jobs: int | None = None,
+) -> pandas.DataFrame:
+    """Compute SHAP values from the predictions of the model only.
+
+    Rows are explained in parallel processes (see parallel.run_tasks), each
+    process explaining every n_jobs-th row so that the top rows come first.
+
+    Args:
+        model (sklearn.base.BaseEstimator | mlp.MLPScorer): Model
+        sample (pandas.DataFrame): Model input to explain
+        population (pandas.DataFrame): Background model input
+        max_evals (int | str, optional): Calls of the model per explained row. Defaults to "auto".
+        time_budget (float, optional): Seconds after which no other row is explained
+            (rows are explained one at a time, in order, at least one). Defaults to 0 (no budget).
+        n_jobs (int, optional): Number of processes, -1 for all cores. Defaults to the configured value.
+
+    Returns:
+        pandas.DataFrame: SHAP values indexed like the explained rows of sample
+    """
+    with tracing.span(
+        "explain.shap", rows=len(sample), background_rows=len(population)
+    ) as span:
+        n_jobs = min(parallel.get_n_jobs(n_jobs), max(1, len(sample)))
+        shared = {
+            "model": model,
+            "sample": sample,
+            "population": population,
+            "max_evals": max_evals,
+            "deadline": time.time() + time_budget if time_budget else None,
+        }
+        tasks = [numpy.arange(job, len(sample), n_jobs) for job in range(n_jobs)]
+        results = parallel.run_tasks(_explain_rows, tasks, shared=shared, n_jobs=n_jobs)
+        rows = numpy.concatenate(
+            [task[: len(values)] for task, values in zip(tasks, results)]
+        ).astype(int)
+        values = numpy.concatenate(results).reshape(-1, sample.shape[1])
+        order = numpy.argsort(rows)
+        rows, values = rows[order], values[order]
+        if len(rows) < len(sample):
+            logger.warning(
+                f"Time budget of {time_budget} s spent, "
+                f"{len(rows)} of {len(sample)} players explained"
+            )
+        span.set(explained_rows=len(rows), n_jobs=n_jobs)
+    return pandas.DataFrame(values, columns=sample.columns, index=sample.index[rows])
+
+
+def _explain_rows(rows: numpy.ndarray, shared: dict) -> numpy.ndarray:
+    sample = shared["sample"].iloc[rows]
+    explainer = shap.Explainer(
+        shared["model"].predict, shared["population"], algorithm="auto"
+    )
+    kwargs = {} if shared["max_evals"] == "auto" else {"max_evals": shared["max_evals"]}
+    values = []
+    for row in range(len(sample)):
+        # The top row is always explained
+        if (
+            shared["deadline"] is not None
+            and (values or rows[0] > 0)
+            and time.time() > shared["deadline"]
+        ):
+            break
+        # Values of a row depend neither on the other rows nor on the processes
+        seed_packages(SEED)
+        values.append(explainer(sample.iloc[[row]], **kwargs).values[0])
+    return numpy.array(values).reshape(-1, sample.shape[1])
+
+
+def get_attributions(
+    scorer: mlp.MLPScorer,
+    model_input: pandas.DataFrame,
+    population: pandas.DataFrame,
+    method: str,
+    population_weights: numpy.ndarray | None = None,
+) -> pandas.DataFrame:
+    """Compute attributions from the weights of the model (see attribution.explain).
+
+    Args:
+        scorer (mlp.MLPScorer): Weights of the model
+        model_input (pandas.DataFrame): Model input to explain
+        population (pandas.DataFrame): Background model input
+        method (str): Attribution method
+        population_weights (numpy.ndarray, optional): Weights of the background rows. Defaults to equal weights.
+
+    Returns:
+        pandas.DataFrame: Attributions indexed like model_input
+    """
+    with tracing.span(
+        "explain.attribution",
+        method=method,
+        rows=len(model_input),
+        background_rows=len(population),
+    ):
+        values, base_value = attribution.explain(
+            scorer,
+            model_input[scorer.features].to_numpy(),
+            population[scorer.features].to_numpy(),
+            method=method,
+            nodes=conf.explain.shapley_nodes,
+            steps=conf.explain.integrated_gradients_steps,
+            background_weights=population_weights,
+        )
+    logger.debug(f"Attributions computed for {len(values)} players")
+    return pandas.DataFrame(
+        values, index=model_input.index, columns=scorer.features
+    ).reindex(columns=model_input.columns)
+
+
+def check_background(
+    model,
+    method: str,
+    attributions: pandas.DataFrame,
+    model_input: pandas.DataFrame,
+    population: pandas.DataFrame,
+    players: list[str],
+) -> dict:
+    """Measure the error of attributions made with a summarized background.
+
+    Attributions of some players are computed again with the whole population as
+    background, and compared with those computed with the summary.
+
+    Args:
+        model (sklearn.base.BaseEstimator | mlp.MLPScorer): Model
+        method (str): Attribution method
+        attributions (pandas.DataFrame): Attributions computed with the summary
+        model_input (pandas.DataFrame): Model input of the season
+        population (pandas.DataFrame): Whole background population
+        players (list[str]): Model input rows to compare
+
+    Returns:
+        dict: Errors of the attributions (see attribution.compare_attributions)
+    """
+    players = [player for player in players if player in attributions.index]
+    if len(players) == 0:
+        return {}
+    with tracing.span("explain.background_check", rows=len(players)) as span:
+        if method == SHAP:
+            reference = get_shap_values(
+                model,
+                model_input.loc[players],
+                population,
+                max_evals=conf.explain.max_evals,
+            )
+        else:
+            reference = get_attributions(
+                model, model_input.loc[players], population, method
+            )
+        report = attribution.compare_attributions(
+            attributions.loc[players, reference.columns], reference
+        )
+        span.set(**report)
+    logger.info(
+        "Attributions with a background of %s rows vs all %s rows, for %s players : "
+        "correlation %.3f, relative error %.3f",
+        conf.explain.background.size,
+        len(population),
+        len(players),
+        report["correlation"],
+        report["relative_error"],
+    )
+    return report
+
+
+def validate_attributions(
+    scorer: mlp.MLPScorer,
+    method: str,
+    model_input: pandas.DataFrame,
+    population: pandas.DataFrame,
+    players: list[str],
+) -> dict:
+    """Compare attributions computed from the weights of the model with SHAP values.
+
+    Both are computed for some players with the same background, so that only the
+    attribution method is checked.
+
+    Args:
+        scorer (mlp.MLPScorer): Weights of the model
+        method (str): Attribution method
+        model_input (pandas.DataFrame): Model input of the season
+        population (pandas.DataFrame): Background model input
+        players (list[str]): Model input rows to compare
+
+    Returns:
+        dict: Errors of the attributions (see attribution.compare_attributions)
+    """
+    players = [player for player in players if player in model_input.index]
+    if len(players) == 0:
+        return {}
+    with tracing.span("explain.validation", rows=len(players)) as span:
+        attributions = get_attributions(
+            scorer, model_input.loc[players], population, method
+        )
+        reference = get_shap_values(
+            scorer,
+            model_input.loc[players],
+            population,
+            max_evals=conf.explain.max_evals,
+        )
+        report = attribution.compare_attributions(
+            attributions.loc[players, reference.columns], reference
+        )
+        span.set(**report)
+    logger.info(
+        "Attributions vs SHAP values of %s players : correlation %.3f, relative error %.3f",
+        len(players),
+        report["correlation"],
+        report["relative_error"],
     )
+    return report
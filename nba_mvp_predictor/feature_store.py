@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+
+import numpy
+import pandas
+from sklearn import preprocessing
+
+from nba_mvp_predictor import conf, logger
+
+# Version of build_feature_matrix: partitions built by another version are built again
+_BUILD_VERSION = 2
+
+
+def get_feature_spec(
+    data: pandas.DataFrame,
+    cat: list[str],
+    num: list[str],
+    min_max_scaling: bool = False,
+) -> dict:
+    """Describe the model-ready features built from silver data.
+
+    Args:
+        data (pandas.DataFrame): Silver data, used to list the values of categorical features
+        cat (list[str]): Categorical features (one-hot encoded)
+        num (list[str]): Numerical features (scaled per season)
+        min_max_scaling (bool, optional): Use min-max scaling instead of standardization. Defaults to False.
+
+    Returns:
+        dict: Feature specification
+    """
+    columns = list(num)
+    if len(cat) > 0:
+        columns += list(pandas.get_dummies(data[cat]).columns)
+    return {
+        "cat": list(cat),
+        "num": list(num),
+        "columns": columns,
+        "min_max_scaling": min_max_scaling,
+    }
+
+
+def get_feature_version(spec: dict) -> str:
+    """Version of a feature specification: features with the same version are identical.
+
+    Args:
+        spec (dict): Feature specification
+
+    Returns:
+        str: Feature version
+    """
+    spec = {key: spec[key] for key in ["cat", "num", "columns", "min_max_scaling"]}
+    content = json.dumps(spec, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def update_feature_store(data: pandas.DataFrame, spec: dict) -> str:
+    """Write the model-ready features of each season whose silver data changed.
+
+    Args:
+        data (pandas.DataFrame): Silver data (one or many seasons)
+        spec (dict): Feature specification
+
+    Returns:
+        str: Feature version
+    """
+    version = get_feature_version(spec)
+    directory = os.path.join(conf.data.feature_store.path, version)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "spec.json"), "w", encoding="utf-8") as outfile:
+        json.dump(spec, outfile, indent=conf.data.feature_store.indent)
+    updated = []
+    for season, season_data in data.groupby("SEASON", sort=True):
+        path = _get_partition_path(version, season)
+        input_hash = _hash_inputs(season_data, spec)
+        if os.path.exists(path):
+            with numpy.load(path) as partition:
+                if str(partition["input_hash"]) == input_hash:
+                    continue
+        matrix, offset, scale = build_feature_matrix(season_data, spec)
+        numpy.savez(
+            path,
+            X=matrix,
+            columns=numpy.array(spec["columns"]),
+            index=season_data.index.to_numpy(dtype=str),
+            player_id=season_data["PLAYER_ID"].to_numpy(),
+            offset=offset,
+            scale=scale,
+            input_hash=numpy.array(input_hash),
+        )
+        updated.append(season)
+    logger.debug(
+        f"Feature store {version} : {len(updated)} seasons updated"
+        f" ({', '.join(str(s) for s in updated)})"
+    )
+    return version
+
+
+def build_feature_matrix(data: pandas.DataFrame, spec: dict):
+    """Build the model-ready features of a single season.
+
+    Args:
+        data (pandas.DataFrame): Silver data of a season
+        spec (dict): Feature specification
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]: float32 features, and offset and scale of numerical features
+    """
+    num = spec["num"]
+    if spec["min_max_scaling"]:
+        scaler = preprocessing.MinMaxScaler()
+    else:
+        scaler = preprocessing.StandardScaler(with_mean=True, with_std=True)
+    # Missing stats are 0 before scaling, as the model was trained
+    scaled = scaler.fit_transform(data[num].astype("float64").fillna(0.0))
+    if spec["min_max_scaling"]:
+        offset, scale = scaler.data_min_, scaler.data_range_
+        scale = numpy.where(scale == 0.0, 1.0, scale)
+    else:
+        offset, scale = scaler.mean_, scaler.scale_
+    matrix = numpy.empty((len(data), len(spec["columns"])), dtype="float32")
+    matrix[:, : len(num)] = scaled
+    if len(spec["cat"]) > 0:
+        dummies = pandas.get_dummies(data[spec["cat"]]).reindex(
+            columns=spec["columns"][len(num) :], fill_value=0
+        )
+        matrix[:, len(num) :] = dummies.to_numpy(dtype="float32")
+    return matrix, offset, scale
+
+
+def load_feature_matrix(version: str, seasons: list[int] | None = None):
+    """Load features from the feature store.
+
+    Args:
+        version (str): Feature version
+        seasons (list[int], optional): Seasons to load. Defaults to all stored seasons.
+
+    Returns:
+        tuple[numpy.ndarray, pandas.DataFrame, list[str]]: float32 features, keys (index, SEASON, PLAYER_ID) and column names
+    """
+    if seasons is None:
+        seasons = get_stored_seasons(version)
+    matrices, keys, columns = [], [], None
+    for season in seasons:
+        with numpy.load(_get_partition_path(version, season)) as partition:
+            matrices.append(partition["X"])
+            keys.append(
+                pandas.DataFrame(
+                    {"SEASON": season, "PLAYER_ID": partition["player_id"]},
+                    index=pandas.Index(partition["index"], name="player_season_team"),
+                )
+            )
+            columns = partition["columns"].tolist()
+    if len(matrices) == 0:
+        raise FileNotFoundError(f"No season found in feature store {version}")
+    return numpy.concatenate(matrices), pandas.concat(keys), columns
+
+
+def load_features(version: str, seasons: list[int] | None = None):
+    """Load features from the feature store as a data frame.
+
+    Args:
+        version (str): Feature version
+        seasons (list[int], optional): Seasons to load. Defaults to all stored seasons.
+
+    Returns:
+        pandas.DataFrame: float32 features indexed by player_season_team
+    """
+    matrix, keys, columns = load_feature_matrix(version, seasons)
+    return pandas.DataFrame(matrix, index=keys.index, columns=columns)
+
+
+def load_model_input(
+    version: str, model_features: list[str], seasons: list[int] | None = None
+):
+    """Load the input of the model from the feature store.
+
+    Args:
+        version (str): Feature version
+        model_features (list[str]): Features used by the model
+        seasons (list[int], optional): Seasons to load. Defaults to all stored seasons.
+
+    Returns:
+        pandas.DataFrame: float32 model input indexed by player_season_team
+    """
+    return load_features(version, seasons)[model_features]
+
+
+def load_scaling(version: str, season: int):
+    """Load the scaling of numerical features fitted on a season.
+
+    Args:
+        version (str): Feature version
+        season (int): Season
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: Offset and scale (scaled = (raw - offset) / scale)
+    """
+    with numpy.load(_get_partition_path(version, season)) as partition:
+        return partition["offset"], partition["scale"]
+
+
+def get_stored_seasons(version: str) -> list[int]:
+    """List the seasons stored for a feature version.
+
+    Args:
+        version (str): Feature version
+
+    Returns:
+        list[int]: Seasons, sorted
+    """
+    directory = os.path.join(conf.data.feature_store.path, version)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        int(name[len("season=") : -len(".npz")])
+        for name in os.listdir(directory)
+        if name.startswith("season=") and name.endswith(".npz")
+    )
+
+
+def _get_partition_path(version: str, season: int) -> str:
+    return os.path.join(
+        conf.data.feature_store.path, version, f"season={int(season)}.npz"
+    )
+
+
+def _hash_inputs(data: pandas.DataFrame, spec: dict) -> str:
+    inputs = data[spec["num"] + spec["cat"]]
+    hashes = pandas.util.hash_pandas_object(inputs, index=True).to_numpy()
+    digest = hashlib.sha256(hashes.tobytes())
+    digest.update(str(_BUILD_VERSION).encode())
+    return digest.hexdigest()
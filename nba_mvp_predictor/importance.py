@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+
+import numpy
+import pandas
+
+from nba_mvp_predictor import (
+    conf,
+    explain,
+    feature_store,
+    load,
+    logger,
+    parallel,
+    tracing,
+)
+
+
+@tracing.traced("importance")
+def explain_seasons(seasons: list[int] | None = None, n_jobs: int | None = None):
+    """Explain the predictions of every player of every season and write feature importances.
+
+    Seasons are explained in parallel processes, each one from its partition of
+    the feature store, against a summary of its own population (see
+    explain.summarize_background). Attributions are written to a store with one
+    partition per season, and seasons whose model input did not change since the
+    last run are not explained again.
+
+    Models without weights can only be explained by SHAP, one model call per
+    player and feature coalition: only the importance.shap-size top predicted
+    players of each season are then explained, and the job is skipped if it is 0.
+
+    Args:
+        seasons (list[int], optional): Seasons to explain. Defaults to all stored seasons.
+        n_jobs (int, optional): Number of processes, -1 for all cores. Defaults to the configured value.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: Feature importances per season and
+            per era, or None if the job was skipped
+    """
+    model = load.load_scorer()
+    features_dict = load.load_features()
+    if "version" not in features_dict:
+        raise ValueError(
+            "Attributions of all seasons need the feature store, train the model again"
+        )
+    if seasons is None:
+        seasons = feature_store.get_stored_seasons(features_dict["version"])
+    method = explain.get_method(model)
+    if method == explain.SHAP and not conf.importance.shap_size:
+        logger.warning(
+            f"Attributions of all seasons skipped: {type(model).__name__} has no "
+            "weights to compute them from, and explaining every player by SHAP "
+            "would take hours (set importance.shap-size to explain top players)"
+        )
+        return None
+    settings = explain.get_settings(method, features_dict["model"])
+    settings["background"] = dict(conf.explain.background)
+    if method == explain.SHAP:
+        settings["shap_size"] = conf.importance.shap_size
+        logger.warning(
+            f"{type(model).__name__} is explained by SHAP: feature importances "
+            f"only cover the top {conf.importance.shap_size} players of each season"
+        )
+    version = get_store_version(settings)
+    os.makedirs(os.path.join(conf.data.attribution_store.path, version), exist_ok=True)
+    shared = {
+        "model": model,
+        "method": method,
+        "feature_version": features_dict["version"],
+        "features": features_dict["model"],
+        "version": version,
+    }
+    explained = parallel.run_tasks(
+        explain_season, seasons, shared=shared, n_jobs=n_jobs
+    )
+    logger.info(
+        f"Attributions of {sum(explained)} of {len(seasons)} seasons computed, "
+        f"others found in attribution store {version}"
+    )
+    attributions = load_attributions(version, seasons)
+    season_importances, era_importances = get_importances(attributions)
+    with tracing.span("importance.write") as span:
+        for importances, data_conf in [
+            (season_importances, conf.data.season_importances),
+            (era_importances, conf.data.era_importances),
+        ]:
+            importances.to_csv(
+                data_conf.path,
+                sep=data_conf.sep,
+                encoding=data_conf.encoding,
+                index=True,
+            )
+        span.set_frame(attributions).set_file(conf.data.season_importances.path)
+    return season_importances, era_importances
+
+
+def explain_season(season: int, shared: dict) -> bool:
+    """Explain the predictions of the players of a season and store them.
+
+    Every player is explained from the weights of the model, only the top
+    predicted players (importance.shap-size) by SHAP.
+
+    Args:
+        season (int): Season
+        shared (dict): Data shared by all seasons: model, attribution method,
+            feature_version, model features and version of the attribution store
+
+    Returns:
+        bool: True if attributions were computed, False if they were stored already
+    """
+    model_input = feature_store.load_model_input(
+        shared["feature_version"], shared["features"], seasons=[season]
+    ).astype(float)
+    path = _get_partition_path(shared["version"], season)
+    input_hash = hashlib.sha256(model_input.to_numpy().tobytes())
+    input_hash.update(json.dumps(model_input.index.to_list()).encode())
+    input_hash = input_hash.hexdigest()
+    if os.path.exists(path):
+        with numpy.load(path) as partition:
+            if str(partition["input_hash"]) == input_hash:
+                return False
+    background, background_weights = explain.summarize_background(
+        model_input, conf.explain.background.method, conf.explain.background.size
+    )
+    prediction = pandas.Series(
+        shared["model"].predict(model_input), index=model_input.index
+    )
+    if shared["method"] == explain.SHAP:
+        top = prediction.sort_values(ascending=False).index
+        # Seasons are already explained in parallel
+        attributions = explain.get_shap_values(
+            shared["model"],
+            model_input.loc[top[: conf.importance.shap_size]],
+            background,
+            max_evals=conf.explain.max_evals,
+            time_budget=conf.explain.time_budget_seconds,
+            n_jobs=1,
+        )
+    else:
+        attributions = explain.get_attributions(
+            shared["model"],
+            model_input,
+            background,
+            shared["method"],
+            background_weights,
+        )
+    numpy.savez(
+        path,
+        attributions=attributions.to_numpy(),
+        columns=numpy.array(attributions.columns, dtype=str),
+        index=attributions.index.to_numpy(dtype=str),
+        prediction=prediction[attributions.index].to_numpy(),
+        input_hash=numpy.array(input_hash),
+    )
+    logger.debug(f"Season {season} : {len(attributions)} players explained")
+    return True
+
+
+def load_attributions(version: str, seasons: list[int] | None = None):
+    """Load attributions from the attribution store.
+
+    Args:
+        version (str): Version of the attribution store
+        seasons (list[int], optional): Seasons to load. Defaults to all stored seasons.
+
+    Returns:
+        pandas.DataFrame: Attributions indexed by player_season_team, with the SEASON
+            and the prediction (PRED) of each player
+    """
+    if seasons is None:
+        directory = os.path.join(conf.data.attribution_store.path, version)
+        seasons = sorted(
+            int(name[len("season=") : -len(".npz")])
+            for name in os.listdir(directory)
+            if name.startswith("season=") and name.endswith(".npz")
+        )
+    frames = []
+    for season in seasons:
+        with numpy.load(_get_partition_path(version, season)) as partition:
+            frame = pandas.DataFrame(
+                partition["attributions"],
+                columns=partition["columns"].tolist(),
+                index=pandas.Index(partition["index"], name="player_season_team"),
+            )
+            frame.insert(0, "PRED", partition["prediction"])
+            frame.insert(0, "SEASON", season)
+            frames.append(frame)
+    if len(frames) == 0:
+        raise FileNotFoundError(f"No season found in attribution store {version}")
+    return pandas.concat(frames)
+
+
+def get_importances(attributions: pandas.DataFrame, era_length: int | None = None):
+    """Aggregate attributions into feature importances (mean absolute attribution).
+
+    Args:
+        attributions (pandas.DataFrame): Attributions, with the SEASON and PRED of each player
+        era_length (int, optional): Number of seasons of an era. Defaults to the importance configuration.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: Importance of each feature (columns,
+            most important first) per season and per era (first season of the era)
+    """
+    if era_length is None:
+        era_length = conf.importance.era_length
+    features = attributions.columns.drop(["SEASON", "PRED"])
+    absolute = attributions[features].abs()
+    order = absolute.mean().sort_values(ascending=False).index
+    seasons = attributions.SEASON.rename("SEASON")
+    eras = (seasons // era_length * era_length).rename("ERA")
+    season_importances = absolute.groupby(seasons).mean()[order]
+    era_importances = absolute.groupby(eras).mean()[order]
+    return season_importances, era_importances
+
+
+def get_store_version(settings: dict) -> str:
+    """Version of the attribution store: attributions with the same version are comparable.
+
+    Args:
+        settings (dict): What attributions depend on (see explain.get_settings)
+
+    Returns:
+        str: Version of the attribution store
+    """
+    content = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def _get_partition_path(version: str, season: int) -> str:
+    return os.path.join(
+        conf.data.attribution_store.path, version, f"season={int(season)}.npz"
+    )
@@ -0,0 +1,239 @@
+import dataclasses
+from typing import Callable
+
+import pandas
+
+LAG = "lag"
+ROLLING = "rolling"
+CUMULATIVE = "cumulative"
+STREAK = "streak"
+_WEIGHT_PREFIX = "__WEIGHT_"
+
+
+@dataclasses.dataclass(frozen=True)
+class LagFeature:
+    """Feature computed from the previous seasons of a player.
+
+    Args:
+        name (str): Name of the column to create
+        source (str | Callable): Column to read, or function building the source series from the data
+        kind (str, optional): One of "lag", "rolling", "cumulative" or "streak". Defaults to "lag".
+        periods (int, optional): Number of seasons back ("lag") or window size in seasons played ("rolling"). Defaults to 1.
+        func (str, optional): Aggregation used by "rolling" windows. Defaults to "mean".
+        agg (str, optional): Aggregation of the rows of a player within a season (traded players). Defaults to "max".
+        weight (str, optional): Column weighting the rows of a player within a season, when agg is "mean". Defaults to None (equal weights).
+        fill_value (optional): Value used when the player has no history. Defaults to 0.
+        dtype (str, optional): Output dtype. Defaults to "float64".
+    """
+
+    name: str
+    source: str | Callable[[pandas.DataFrame], pandas.Series]
+    kind: str = LAG
+    periods: int = 1
+    func: str = "mean"
+    agg: str = "max"
+    weight: str | None = None
+    fill_value: object = 0
+    dtype: str = "float64"
+
+
+LAG_FEATURES = [
+    LagFeature(
+        name="PREVIOUS_SEASON_MVP_WINNER",
+        source="MVP_WINNER",
+        fill_value=False,
+        dtype="bool",
+    ),
+    LagFeature(
+        name="PREVIOUS_SEASON_MVP_PODIUM_NOT_WINNER",
+        source=lambda data: data["MVP_PODIUM"] & ~data["MVP_WINNER"],
+        fill_value=False,
+        dtype="bool",
+    ),
+    LagFeature(
+        name="LAST_3_SEASONS_PER",
+        source="PER_advanced",
+        kind=ROLLING,
+        periods=3,
+        func="mean",
+        # Traded players have one row per team they played for (the total row has
+        # no team standings and is dropped when merging them): the PER of the
+        # season is the mean of those of each team, weighted by games played
+        agg="mean",
+        weight="G",
+    ),
+    LagFeature(
+        name="CAREER_MVP_VOTES_SHARE",
+        source="MVP_VOTES_SHARE",
+        kind=CUMULATIVE,
+    ),
+    LagFeature(
+        name="CONSECUTIVE_MVP_PODIUMS",
+        source="MVP_PODIUM",
+        kind=STREAK,
+        dtype="int16",
+    ),
+]
+
+
+def add_lag_features(
+    data: pandas.DataFrame,
+    features: list[LagFeature] | None = None,
+    player_column: str = "PLAYER",
+    season_column: str = "SEASON",
+):
+    """Add features computed from the previous seasons of each player.
+
+    Rows are reduced to one row per player and season, sorted once, and every
+    feature is computed with vectorized group operations before being joined
+    back on (player, season). Players keep their history when changing team.
+
+    Args:
+        data (pandas.DataFrame): Player stats, one row per player, season and team
+        features (list[LagFeature], optional): Features to compute. Defaults to LAG_FEATURES.
+        player_column (str, optional): Column identifying players. Defaults to "PLAYER".
+        season_column (str, optional): Column holding the season end year. Defaults to "SEASON".
+
+    Returns:
+        pandas.DataFrame: Data with one new column per feature
+    """
+    if features is None:
+        features = LAG_FEATURES
+    seasons = compute_lag_features(
+        data, features, player_column=player_column, season_column=season_column
+    )
+    return data.join(seasons, on=[player_column, season_column])
+
+
+def compute_lag_features(
+    data: pandas.DataFrame,
+    features: list[LagFeature],
+    player_column: str = "PLAYER",
+    season_column: str = "SEASON",
+):
+    """Compute lag features at the (player, season) level.
+
+    Args:
+        data (pandas.DataFrame): Player stats, one row per player, season and team
+        features (list[LagFeature]): Features to compute
+        player_column (str, optional): Column identifying players. Defaults to "PLAYER".
+        season_column (str, optional): Column holding the season end year. Defaults to "SEASON".
+
+    Returns:
+        pandas.DataFrame: Features indexed by (player, season)
+    """
+    seasons = get_lag_sources(
+        data, features, player_column=player_column, season_column=season_column
+    )
+    return compute_lag_features_from_sources(
+        seasons, features, player_column=player_column, season_column=season_column
+    )
+
+
+def get_lag_sources(
+    data: pandas.DataFrame,
+    features: list[LagFeature],
+    player_column: str = "PLAYER",
+    season_column: str = "SEASON",
+):
+    """Reduce player stats to the source of each lag feature, per player and season.
+
+    Sources are all the lag features need from past seasons: storing them is
+    enough to compute the features of a new season without the full history.
+
+    Args:
+        data (pandas.DataFrame): Player stats, one row per player, season and team
+        features (list[LagFeature]): Features to compute
+        player_column (str, optional): Column identifying players. Defaults to "PLAYER".
+        season_column (str, optional): Column holding the season end year. Defaults to "SEASON".
+
+    Returns:
+        pandas.DataFrame: Sources indexed by (player, season), one column per feature
+    """
+    keys = [player_column, season_column]
+    sources = pandas.DataFrame(
+        {feature.name: _get_source(data, feature) for feature in features},
+        index=data.index,
+    )
+    aggregations = {feature.name: feature.agg for feature in features}
+    weighted = [feature for feature in features if feature.weight is not None]
+    for feature in weighted:
+        if feature.agg != "mean":
+            raise ValueError(f"Weights of {feature.name} need a mean aggregation")
+        # Weighted mean: sum of weighted values divided by the sum of their weights
+        weights = data[feature.weight].astype("float64")
+        weights = weights.where(sources[feature.name].notna(), 0.0)
+        sources[feature.name] = sources[feature.name] * weights
+        sources[_WEIGHT_PREFIX + feature.name] = weights
+        aggregations[feature.name] = "sum"
+        aggregations[_WEIGHT_PREFIX + feature.name] = "sum"
+    sources[player_column] = data[player_column]
+    sources[season_column] = data[season_column]
+    seasons = sources.groupby(keys, sort=True).agg(aggregations)
+    for feature in weighted:
+        weights = seasons.pop(_WEIGHT_PREFIX + feature.name)
+        seasons[feature.name] = seasons[feature.name] / weights.where(weights > 0)
+    return seasons
+
+
+def compute_lag_features_from_sources(
+    seasons: pandas.DataFrame,
+    features: list[LagFeature],
+    player_column: str = "PLAYER",
+    season_column: str = "SEASON",
+):
+    """Compute lag features from their sources.
+
+    Args:
+        seasons (pandas.DataFrame): Sources indexed by (player, season), sorted (see get_lag_sources)
+        features (list[LagFeature]): Features to compute
+        player_column (str, optional): Column identifying players. Defaults to "PLAYER".
+        season_column (str, optional): Column holding the season end year. Defaults to "SEASON".
+
+    Returns:
+        pandas.DataFrame: Features indexed by (player, season)
+    """
+    players = seasons.index.get_level_values(player_column)
+    season_values = pandas.Series(
+        seasons.index.get_level_values(season_column), index=seasons.index
+    )
+    by_player = pandas.Series(players, index=seasons.index)
+    grouper = by_player.to_numpy()
+    new_player = by_player.ne(by_player.shift())
+    contiguous = ~new_player & season_values.diff().eq(1)
+
+    results = {}
+    for feature in features:
+        values = seasons[feature.name].astype("float64")
+        if feature.kind == LAG:
+            lagged = values.groupby(grouper).shift(feature.periods)
+            lagged_seasons = season_values.groupby(grouper).shift(feature.periods)
+            result = lagged.where(season_values - lagged_seasons == feature.periods)
+        elif feature.kind == ROLLING:
+            result = (
+                values.groupby(grouper)
+                .shift(1)
+                .groupby(grouper)
+                .rolling(feature.periods, min_periods=1)
+                .agg(feature.func)
+                .reset_index(level=0, drop=True)
+            )
+        elif feature.kind == CUMULATIVE:
+            result = (
+                values.fillna(0).groupby(grouper).cumsum().groupby(grouper).shift(1)
+            )
+        elif feature.kind == STREAK:
+            truthy = values.fillna(0).astype(bool)
+            blocks = (~truthy | ~contiguous).cumsum()
+            runs = truthy.astype("int64").groupby(blocks.to_numpy()).cumsum()
+            result = runs.shift(1).where(contiguous)
+        else:
+            raise ValueError(f"Unknown lag feature kind : {feature.kind}")
+        results[feature.name] = result.fillna(feature.fill_value).astype(feature.dtype)
+    return pandas.DataFrame(results, index=seasons.index)
+
+
+def _get_source(data: pandas.DataFrame, feature: LagFeature):
+    if callable(feature.source):
+        return feature.source(data)
+    return data[feature.source]
@@ -5,6 +5,8 @@ import pandas
 
 from nba_mvp_predictor import conf
 
+KEY_DTYPES = {"PLAYER_ID": "int32", "TEAM_ID": "int16", "SEASON": "int16"}
+
 
 def load_model():
     """Load the model.
@@ -15,6 +17,19 @@ def load_model():
     return joblib.load(conf.data.model.path)
 
 
+def load_scorer():
+    """Load the model to score with, from its exported weights when possible.
+
+    Returns:
+        mlp.MLPScorer | sklearn.base.BaseEstimator: Object with a predict method
+    """
+    from nba_mvp_predictor import mlp
+
+    if mlp.is_exported(conf.data.model_weights.path, conf.data.model.path):
+        return mlp.MLPScorer.load(conf.data.model_weights.path)
+    return load_model()
+
+
 def load_player_stats(nrows: int | None = None):
     return pandas.read_csv(
         conf.data.player_stats.path,
@@ -48,6 +63,26 @@ def load_team_standings(nrows: int | None = None):
     )
 
 
+def load_players():
+    return pandas.read_csv(
+        conf.data.players.path,
+        sep=conf.data.players.sep,
+        encoding=conf.data.players.encoding,
+        dtype={"PLAYER_ID": KEY_DTYPES["PLAYER_ID"]},
+        keep_default_na=False,
+    )
+
+
+def load_teams():
+    return pandas.read_csv(
+        conf.data.teams.path,
+        sep=conf.data.teams.sep,
+        encoding=conf.data.teams.encoding,
+        dtype={"TEAM_ID": KEY_DTYPES["TEAM_ID"]},
+        keep_default_na=False,
+    )
+
+
 def load_bronze_data(nrows: int | None = None):
     return pandas.read_csv(
         conf.data.bronze.path,
@@ -56,6 +91,17 @@ def load_bronze_data(nrows: int | None = None):
         compression=conf.data.bronze.compression,
         index_col=0,
         nrows=nrows,
+        dtype=KEY_DTYPES,
+    )
+
+
+def load_lag_sources():
+    return pandas.read_csv(
+        conf.data.lag_sources.path,
+        sep=conf.data.lag_sources.sep,
+        encoding=conf.data.lag_sources.encoding,
+        index_col=[0, 1],
+        dtype=KEY_DTYPES,
     )
 
 
@@ -67,6 +113,7 @@ def load_silver_data(nrows: int | None = None):
         compression=conf.data.silver.compression,
         index_col=0,
         nrows=nrows,
+        dtype=KEY_DTYPES,
     )
 
 
@@ -78,6 +125,7 @@ def load_gold_data(nrows: int | None = None):
         compression=conf.data.gold.compression,
         index_col=0,
         nrows=nrows,
+        dtype=KEY_DTYPES,
     )
 
 
@@ -105,6 +153,20 @@ def load_history(nrows: int | None = None):
     )
 
 
+def load_explain_history(nrows: int | None = None):
+    return pandas.read_csv(
+        conf.data.explain_history.path,
+        sep=conf.data.explain_history.sep,
+        encoding=conf.data.explain_history.encoding,
+        compression=conf.data.explain_history.compression,
+        index_col=False,
+        nrows=nrows,
+        dtype={},
+        # Attributions read from the history are those written, to the last bit
+        float_precision="round_trip",
+    )
+
+
 def load_features():
     with open(
         conf.data.features.path, encoding=conf.data.features.encoding
@@ -113,6 +175,25 @@ def load_features():
     return features_dict
 
 
+def load_tuned_params(model_name: str):
+    """Load the best hyperparameters found by the search for a model, if any.
+
+    Args:
+        model_name (str): Model of the registry
+
+    Returns:
+        dict: Hyperparameters, or None if no search was run for this model
+    """
+    try:
+        with open(
+            conf.data.tuning.path, encoding=conf.data.tuning.encoding
+        ) as json_file:
+            state = json.load(json_file)
+    except FileNotFoundError:
+        return None
+    return state.get("best") if state.get("model") == model_name else None
+
+
 def load_model_input(nrows: int | None = None):
     return pandas.read_csv(
         conf.data.model_input.path,
@@ -0,0 +1,314 @@
+import gc
+import os
+import sys
+import threading
+import time
+
+from nba_mvp_predictor import logger
+
+# Levels of memory profiling, read from the MEMORY_PROFILE environment variable
+OFF = 0
+STAGES = 1
+SITES = 2
+# Frames kept by tracemalloc for each allocation, to attribute it to project code
+_TRACEMALLOC_FRAMES = 25
+_RSS_SAMPLING_SECONDS = 0.05
+_TOP_SITES = 10
+_TOP_FRAMES = 10
+_PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Frames of the profiling itself, never the site of an allocation of a stage
+_PROFILING_FILES = [
+    os.path.join(_PACKAGE_DIRECTORY, "memory.py"),
+    os.path.join(_PACKAGE_DIRECTORY, "tracing.py"),
+]
+
+_lock = threading.Lock()
+# Profiles of the spans currently open, whose peaks are updated by the sampler
+_open_profiles = []
+_sampler = None
+
+
+def get_profile_level() -> int:
+    """Read the memory profiling level from the MEMORY_PROFILE environment variable.
+
+    OFF (default) does nothing. STAGES reports the peak traced and resident memory of
+    each span and the data frames kept alive after each stage. SITES also reports the
+    allocation sites holding the most memory in each stage, at a higher overhead.
+
+    Returns:
+        int: Memory profiling level
+    """
+    memory_profile = os.environ.get("MEMORY_PROFILE", "OFF").upper()
+    if memory_profile == "OFF":
+        level = OFF
+    elif memory_profile == "STAGES":
+        level = STAGES
+    elif memory_profile == "SITES":
+        level = SITES
+    else:
+        raise ValueError(
+            f"Unknown MEMORY_PROFILE {memory_profile!r}, use OFF, STAGES or SITES"
+        )
+    return level
+
+
+LEVEL = get_profile_level()
+
+
+def is_enabled() -> bool:
+    return LEVEL > OFF
+
+
+class _Profile:
+    """Memory of a span, from the moment it starts."""
+
+    __slots__ = [
+        "name",
+        "is_stage",
+        "traced_start",
+        "traced_peak",
+        "rss_start",
+        "rss_peak",
+        "frames_before",
+        "snapshot_start",
+        "snapshot_peak",
+        "snapshot_peak_traced",
+    ]
+
+
+def start(name: str, is_stage: bool) -> _Profile:
+    """Start profiling the memory of a span.
+
+    Args:
+        name (str): Name of the span
+        is_stage (bool): Whether the span is a stage (a span with no parent), whose
+            data frames kept alive and allocation sites are reported
+
+    Returns:
+        _Profile: Profile to give to stop
+    """
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(_TRACEMALLOC_FRAMES if LEVEL >= SITES else 1)
+        _start_sampler()
+    profile = _Profile()
+    profile.name = name
+    profile.is_stage = is_stage
+    profile.frames_before = None
+    profile.snapshot_start = None
+    profile.snapshot_peak = None
+    profile.snapshot_peak_traced = 0
+    if is_stage:
+        profile.frames_before = _get_live_frames()
+    if is_stage and LEVEL >= SITES:
+        profile.snapshot_start = _take_snapshot()
+    with _lock:
+        traced = _update_peaks()
+        rss = _get_rss()
+        profile.traced_start = profile.traced_peak = traced
+        profile.rss_start = profile.rss_peak = rss
+        _open_profiles.append(profile)
+    return profile
+
+
+def stop(profile: _Profile, result=None) -> dict:
+    """Stop profiling the memory of a span, and log the report of stages.
+
+    Args:
+        profile (_Profile): Profile returned by start
+        result (optional): Value returned by the span, whose data frames are not
+            reported as kept alive. Defaults to None.
+
+    Returns:
+        dict: Memory attributes of the span
+    """
+    with _lock:
+        _update_peaks()
+        profile.rss_peak = max(profile.rss_peak, _get_rss())
+        _open_profiles.remove(profile)
+    if LEVEL >= SITES:
+        # Sites holding memory when the span ends are those of its parents' peak too
+        for parent in _open_profiles:
+            if parent.is_stage:
+                _checkpoint_sites(parent)
+    attributes = {
+        "traced_peak_bytes": profile.traced_peak,
+        "traced_growth_bytes": profile.traced_peak - profile.traced_start,
+        "rss_peak_bytes": profile.rss_peak,
+        "rss_growth_bytes": profile.rss_peak - profile.rss_start,
+    }
+    if not profile.is_stage:
+        return attributes
+    logger.info(
+        "Memory of %s : peak traced %s (+%s), peak resident %s (+%s)",
+        profile.name,
+        _format_bytes(profile.traced_peak),
+        _format_bytes(attributes["traced_growth_bytes"]),
+        _format_bytes(profile.rss_peak),
+        _format_bytes(attributes["rss_growth_bytes"]),
+    )
+    if profile.snapshot_start is not None:
+        _checkpoint_sites(profile)
+        _log_top_sites(profile)
+    kept_frames = _get_kept_frames(profile.frames_before, result)
+    attributes["kept_frames"] = len(kept_frames)
+    attributes["kept_frames_bytes"] = sum(size for _, size, _ in kept_frames)
+    for shape, size, referrers in kept_frames[:_TOP_FRAMES]:
+        logger.warning(
+            "Data frame %s of %s kept alive after %s, referenced by %s",
+            shape,
+            _format_bytes(size),
+            profile.name,
+            ", ".join(referrers) or "an unknown object",
+        )
+    return attributes
+
+
+def _update_peaks() -> int:
+    # The peak of tracemalloc is global: it is reset once given to all open spans
+    import tracemalloc
+
+    traced, traced_peak = tracemalloc.get_traced_memory()
+    for profile in _open_profiles:
+        profile.traced_peak = max(profile.traced_peak, traced_peak)
+    tracemalloc.reset_peak()
+    return traced
+
+
+def _start_sampler():
+    global _sampler
+
+    def sample():
+        while True:
+            time.sleep(_RSS_SAMPLING_SECONDS)
+            rss = _get_rss()
+            with _lock:
+                for profile in _open_profiles:
+                    profile.rss_peak = max(profile.rss_peak, rss)
+
+    _sampler = threading.Thread(target=sample, name="memory-sampler", daemon=True)
+    _sampler.start()
+
+
+def _get_rss() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Without procfs, the peak resident memory of the process is the best guess
+        import resource
+
+        unit = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+
+def _take_snapshot():
+    import tracemalloc
+
+    return tracemalloc.take_snapshot().filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            *[tracemalloc.Filter(False, path) for path in _PROFILING_FILES],
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+    )
+
+
+def _checkpoint_sites(profile: _Profile):
+    # Snapshots are taken at span boundaries, the one holding the most memory is kept
+    import tracemalloc
+
+    traced, _ = tracemalloc.get_traced_memory()
+    if traced > profile.snapshot_peak_traced:
+        profile.snapshot_peak = _take_snapshot()
+        profile.snapshot_peak_traced = traced
+
+
+def _log_top_sites(profile: _Profile):
+    sites = {}
+    differences = profile.snapshot_peak.compare_to(profile.snapshot_start, "traceback")
+    for difference in differences:
+        if difference.size_diff <= 0:
+            continue
+        site = _get_site(difference.traceback)
+        sites[site] = sites.get(site, 0) + difference.size_diff
+    top_sites = sorted(sites.items(), key=lambda item: item[1], reverse=True)
+    logger.info(
+        "Top allocation sites of %s at its highest checkpoint (%s traced) :",
+        profile.name,
+        _format_bytes(profile.snapshot_peak_traced),
+    )
+    for site, size in top_sites[:_TOP_SITES]:
+        logger.info("    %10s  %s", _format_bytes(size), site)
+
+
+def _get_site(traceback) -> str:
+    # Allocations are attributed to the most recent frame in project code
+    for frame in reversed(traceback):
+        if (
+            frame.filename.startswith(_PACKAGE_DIRECTORY)
+            and frame.filename not in _PROFILING_FILES
+        ):
+            filename = os.path.relpath(frame.filename, _PACKAGE_DIRECTORY)
+            return f"{filename}:{frame.lineno}"
+    frame = traceback[-1]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+def _get_live_frames() -> dict:
+    # Data frames are not hashable: they are tracked by id, with a weak reference
+    # telling whether the object with this id is still the same
+    import weakref
+
+    return {id(frame): weakref.ref(frame) for frame in _find_frames()}
+
+
+def _find_frames() -> list:
+    pandas = sys.modules.get("pandas")
+    if pandas is None:
+        return []
+    return [o for o in gc.get_objects() if isinstance(o, pandas.DataFrame)]
+
+
+def _get_kept_frames(frames_before: dict, result) -> list:
+    gc.collect()
+    returned = result if isinstance(result, (tuple, list)) else [result]
+    returned_ids = {id(value) for value in returned}
+    frames = _find_frames()
+    kept_frames = []
+    for frame in frames:
+        reference = frames_before.get(id(frame))
+        if id(frame) in returned_ids or (
+            reference is not None and reference() is frame
+        ):
+            continue
+        size = int(frame.memory_usage(index=True).sum())
+        kept_frames.append((frame.shape, size, _get_referrers(frame, frames)))
+    return sorted(kept_frames, key=lambda kept_frame: kept_frame[1], reverse=True)
+
+
+def _get_referrers(value, frames: list) -> list:
+    modules = {id(vars(module)): name for name, module in list(sys.modules.items())}
+    referrers = []
+    for referrer in gc.get_referrers(value):
+        if referrer is frames or referrer is sys._getframe(1):
+            continue
+        if isinstance(referrer, dict):
+            keys = [str(k) for k, v in referrer.items() if v is value]
+            owner = modules.get(id(referrer))
+            if owner is not None:
+                referrers += [f"{owner}.{key}" for key in keys]
+            else:
+                referrers += [f"key {key!r} of a dict" for key in keys]
+        elif hasattr(referrer, "f_code"):
+            referrers.append(f"a local of {referrer.f_code.co_name}")
+        else:
+            referrers.append(f"a {type(referrer).__name__}")
+    return referrers
+
+
+def _format_bytes(size: int) -> str:
+    return f"{size / 2**20:.1f} MiB"
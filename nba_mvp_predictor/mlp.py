@@ -0,0 +1,212 @@
+import hashlib
+import os
+
+import numpy
+
+from nba_mvp_predictor import logger
+
+# Largest difference with the predictions of the fitted model accepted at export
+PARITY_TOLERANCE = 1e-9
+# Activation functions of multi-layer perceptrons, by scikit-learn name
+ACTIVATIONS = {
+    "identity": lambda x: x,
+    "relu": lambda x: numpy.maximum(x, 0.0),
+    "tanh": numpy.tanh,
+    "logistic": lambda x: _logistic(x),
+}
+
+
+class MLPScorer:
+    """Multi-layer perceptron scored with NumPy only, from exported weights.
+
+    It predicts like the fitted model without importing scikit-learn or unpickling
+    it, which dominates the time to load and score a small model.
+    """
+
+    def __init__(
+        self,
+        coefs: list[numpy.ndarray],
+        intercepts: list[numpy.ndarray],
+        activation: str,
+        output_activation: str,
+        features: list[str],
+    ):
+        """
+        Args:
+            coefs (list[numpy.ndarray]): Weights of each layer
+            intercepts (list[numpy.ndarray]): Biases of each layer
+            activation (str): Activation of hidden layers (identity, relu, tanh or logistic)
+            output_activation (str): Activation of the output (identity or relu)
+            features (list[str]): Features, in the order of the first layer inputs
+        """
+        self.coefs = coefs
+        self.intercepts = intercepts
+        self.activation = activation
+        self.output_activation = output_activation
+        self.features = features
+        self.feature_names_in_ = numpy.array(features, dtype=object)
+
+    @classmethod
+    def load(cls, path: str):
+        """Load exported weights.
+
+        Args:
+            path (str): Path of the .npz file written by export_model
+
+        Returns:
+            MLPScorer: Scorer
+        """
+        with numpy.load(path) as weights:
+            n_layers = int(weights["n_layers"])
+            return cls(
+                coefs=[weights[f"coef_{layer}"] for layer in range(n_layers)],
+                intercepts=[weights[f"intercept_{layer}"] for layer in range(n_layers)],
+                activation=str(weights["activation"]),
+                output_activation=str(weights["output_activation"]),
+                features=weights["features"].tolist(),
+            )
+
+    def predict(self, X) -> numpy.ndarray:
+        """Predict MVP votes shares.
+
+        Args:
+            X (pandas.DataFrame | numpy.ndarray): Model input, with the features as
+                columns (arrays must have them in the order of features)
+
+        Returns:
+            numpy.ndarray: Predictions
+        """
+        if hasattr(X, "columns"):
+            X = X[self.features]
+        # float32 input stays float32 like in scikit-learn, anything else is float64
+        activations = numpy.asarray(X)
+        if activations.dtype != numpy.float32:
+            activations = activations.astype("float64")
+        hidden = ACTIVATIONS[self.activation]
+        for layer, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+            activations = activations @ coef + intercept
+            if layer < len(self.coefs) - 1:
+                activations = hidden(activations)
+        return ACTIVATIONS[self.output_activation](activations[:, 0])
+
+
+def export_model(fitted, path: str, model_path: str, X=None) -> bool:
+    """Export the weights of a fitted multi-layer perceptron to a .npz file.
+
+    Models that are not multi-layer perceptrons are not exported, and an existing
+    export is removed so that it is never used in place of them.
+
+    Args:
+        fitted (sklearn.base.BaseEstimator): Fitted model, an MLPRegressor or a
+            TransformedTargetRegressor of an MLPRegressor clipping at 0 (mlp-relu)
+        path (str): Path of the .npz file
+        model_path (str): Path of the pickled model, whose digest is saved with the
+            weights to detect an export of another model
+        X (pandas.DataFrame, optional): Model input checked to be scored like the
+            fitted model does. Defaults to None.
+
+    Returns:
+        bool: True if the model was exported
+    """
+    regressor, output_activation = fitted, "identity"
+    if hasattr(fitted, "regressor_"):
+        # mlp-relu: the output is clipped at 0 by the inverse function of the target
+        regressor = fitted.regressor_
+        inverse_func = getattr(fitted.inverse_func, "__name__", None)
+        output_activation = "relu" if inverse_func == "_relu" else None
+    if (
+        not hasattr(regressor, "coefs_")
+        or output_activation is None
+        or regressor.out_activation_ != "identity"
+    ):
+        logger.info(f"No weights exported for {type(fitted).__name__}")
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    weights = {
+        "n_layers": len(regressor.coefs_),
+        "activation": regressor.activation,
+        "output_activation": output_activation,
+        "features": numpy.array(fitted.feature_names_in_, dtype=str),
+        "model_digest": get_digest(model_path),
+    }
+    for layer, (coef, intercept) in enumerate(
+        zip(regressor.coefs_, regressor.intercepts_)
+    ):
+        weights[f"coef_{layer}"] = coef
+        weights[f"intercept_{layer}"] = intercept
+    if X is not None:
+        scorer = MLPScorer(
+            coefs=list(regressor.coefs_),
+            intercepts=list(regressor.intercepts_),
+            activation=regressor.activation,
+            output_activation=output_activation,
+            features=weights["features"].tolist(),
+        )
+        check_parity(fitted, scorer, X)
+    numpy.savez(path, **weights)
+    return True
+
+
+def check_parity(fitted, scorer: MLPScorer, X, tolerance: float = PARITY_TOLERANCE):
+    """Check that the scorer predicts like the fitted model.
+
+    Args:
+        fitted (sklearn.base.BaseEstimator): Fitted model
+        scorer (MLPScorer): Scorer of the exported weights
+        X (pandas.DataFrame): Model input
+        tolerance (float, optional): Largest difference accepted. Defaults to PARITY_TOLERANCE.
+
+    Returns:
+        float: Largest difference between predictions
+    """
+    difference = numpy.max(
+        numpy.abs(scorer.predict(X) - fitted.predict(X)), initial=0.0
+    )
+    logger.debug(f"Largest difference with the fitted model : {difference:.2e}")
+    if not difference <= tolerance:
+        raise ValueError(
+            f"Exported weights predict up to {difference:.2e} away from the model "
+            f"(tolerance {tolerance:.0e})"
+        )
+    return difference
+
+
+def get_digest(path: str) -> str:
+    """Compute the SHA-256 digest of a file.
+
+    Args:
+        path (str): Path of the file
+
+    Returns:
+        str: Hexadecimal digest
+    """
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def is_exported(path: str, model_path: str) -> bool:
+    """Check that exported weights exist and are those of the pickled model.
+
+    Args:
+        path (str): Path of the .npz file
+        model_path (str): Path of the pickled model
+
+    Returns:
+        bool: True if the weights can be used in place of the model
+    """
+    if not os.path.exists(path):
+        return False
+    with numpy.load(path) as weights:
+        digest = str(weights["model_digest"])
+    if os.path.exists(model_path) and digest != get_digest(model_path):
+        logger.warning(f"{path} was not exported from {model_path}, ignoring it")
+        return False
+    return True
+
+
+def _logistic(x):
+    # scikit-learn's expit, 1 / (1 + exp(-x)) differs from it in float32
+    from scipy import special
+
+    return special.expit(x)
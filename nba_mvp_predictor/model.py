@@ -1,25 +1,278 @@
+import copy
+
 import numpy
-from sklearn import compose, neural_network
+from sklearn import (
+    base,
+    compose,
+    ensemble,
+    linear_model,
+    model_selection,
+    neural_network,
+)
 
+from nba_mvp_predictor import conf
 
-def get_model():
-    return _get_regressor()
+# Maximum number of epochs when fine-tuning a warm-started model
+_FINE_TUNING_MAX_ITER = 50
 
+# Values explored by the hyperparameter search of each model (see tune.py)
+SEARCH_SPACES = {
+    "mlp": {
+        "hidden_layer_sizes": [4, 8, 16, 32, [16, 8]],
+        "learning_rate_init": [0.001, 0.005, 0.01, 0.03, 0.065, 0.1],
+        "alpha": [0.00001, 0.0001, 0.001, 0.01],
+        "activation": ["relu", "tanh"],
+    },
+    "mlp-relu": {
+        "hidden_layer_sizes": [4, 8, 16, 32, [16, 8]],
+        "learning_rate_init": [0.001, 0.005, 0.01, 0.03, 0.065, 0.1],
+        "alpha": [0.00001, 0.0001, 0.001, 0.01],
+    },
+    "hgb": {
+        "learning_rate": [0.01, 0.03, 0.1, 0.3],
+        "max_leaf_nodes": [7, 15, 31, 63],
+        "min_samples_leaf": [10, 20, 50],
+        "l2_regularization": [0.0, 0.1, 1.0],
+    },
+    "ridge": {
+        "alpha": [0.01, 0.1, 1.0, 10.0, 100.0],
+    },
+    "ranking": {
+        "C": [0.001, 0.01, 0.1, 1.0, 10.0],
+    },
+}
 
-def _get_regressor():
-    return neural_network.MLPRegressor(
-        hidden_layer_sizes=8,
-        learning_rate="adaptive",
-        learning_rate_init=0.065,
-        random_state=0,
-    )
 
+class PairwiseRankingRegressor(base.RegressorMixin, base.BaseEstimator):
+    """Linear ranking model fitted on pairs of players of the same season.
+
+    Each pair of a player who received MVP votes and a player of the same season
+    with a lower award share is a training example for a logistic regression on
+    feature differences. Predictions are ranking scores, not award shares: only
+    their order within a season is meaningful.
+    """
+
+    def __init__(self, C: float = 1.0, max_iter: int = 200):
+        """
+        Args:
+            C (float, optional): Inverse of the regularization strength. Defaults to 1.0.
+            max_iter (int, optional): Maximum number of solver iterations. Defaults to 200.
+        """
+        self.C = C
+        self.max_iter = max_iter
+
+    def fit(self, X, y, groups=None):
+        """Fit the model on pairs of players of the same group.
+
+        Args:
+            X (array-like): Features
+            y (array-like): Award shares
+            groups (array-like, optional): Season of each player. Defaults to a single season.
+
+        Returns:
+            PairwiseRankingRegressor: Fitted model
+        """
+        X = numpy.asarray(X, dtype="float64")
+        y = numpy.asarray(y, dtype="float64")
+        groups = numpy.zeros(len(y)) if groups is None else numpy.asarray(groups)
+        firsts, seconds = [], []
+        for group in numpy.unique(groups):
+            rows = numpy.flatnonzero(groups == group)
+            candidates = rows[y[rows] > 0]
+            first, second = numpy.meshgrid(candidates, rows, indexing="ij")
+            ordered = y[first] > y[second]
+            firsts.append(first[ordered])
+            seconds.append(second[ordered])
+        first, second = numpy.concatenate(firsts), numpy.concatenate(seconds)
+        if len(first) == 0:
+            raise ValueError("No pair of players with different award shares")
+        differences = X[first] - X[second]
+        # Half of the pairs are swapped to have both classes
+        swapped = numpy.arange(len(differences)) % 2 == 1
+        differences[swapped] *= -1
+        self.classifier_ = linear_model.LogisticRegression(
+            C=self.C, fit_intercept=False, max_iter=self.max_iter
+        ).fit(differences, ~swapped)
+        self.coef_ = self.classifier_.coef_.ravel()
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X):
+        """Predict ranking scores.
+
+        Args:
+            X (array-like): Features
+
+        Returns:
+            numpy.ndarray: Scores, higher for players more likely to win
+        """
+        return numpy.asarray(X, dtype="float64") @ self.coef_
+
+
+class FineTunedMLPRegressor(base.RegressorMixin, base.BaseEstimator):
+    """Multi-layer perceptron fine-tuned from the weights of a fitted one, with early stopping.
+
+    Each epoch is a partial_fit of a copy of the starting model on the training
+    rows, scored on rows held out for validation. Training stops when the score
+    did not improve for n_iter_no_change epochs, and the model of the best epoch
+    is kept, like the early stopping of a first fit of MLPRegressor. The split,
+    tolerance and patience are those of the starting model.
+    """
+
+    def __init__(self, start=None, max_iter: int = _FINE_TUNING_MAX_ITER):
+        """
+        Args:
+            start (neural_network.MLPRegressor, optional): Fitted model to start from. Defaults to None.
+            max_iter (int, optional): Maximum number of epochs. Defaults to _FINE_TUNING_MAX_ITER.
+        """
+        self.start = start
+        self.max_iter = max_iter
+
+    def fit(self, X, y):
+        """Fine-tune a copy of the starting model.
+
+        Args:
+            X (array-like): Features
+            y (array-like): Award shares
+
+        Returns:
+            FineTunedMLPRegressor: Fitted model
+        """
+        regressor = copy.deepcopy(self.start)
+        X_train, X_val, y_train, y_val = model_selection.train_test_split(
+            X,
+            y,
+            test_size=regressor.validation_fraction,
+            random_state=regressor.random_state,
+        )
+        self.validation_scores_ = []
+        self.best_validation_score_ = -numpy.inf
+        self.regressor_ = regressor
+        no_improvement = 0
+        for epoch in range(self.max_iter):
+            regressor.partial_fit(X_train, y_train)
+            score = regressor.score(X_val, y_val)
+            self.validation_scores_.append(score)
+            if score < self.best_validation_score_ + regressor.tol:
+                no_improvement += 1
+            else:
+                no_improvement = 0
+            if score > self.best_validation_score_:
+                self.best_validation_score_ = score
+                self.regressor_ = copy.deepcopy(regressor)
+            if no_improvement > regressor.n_iter_no_change:
+                break
+        self.n_iter_ = epoch + 1
+        self.n_features_in_ = regressor.n_features_in_
+        return self
+
+    def predict(self, X):
+        """Predict award shares with the model of the best epoch.
+
+        Args:
+            X (array-like): Features
+
+        Returns:
+            numpy.ndarray: Award shares
+        """
+        return self.regressor_.predict(X)
+
+
+def get_model(params: dict | None = None, name: str | None = None):
+    """Get the model to train.
+
+    Args:
+        params (dict, optional): Hyperparameters overriding the default ones (e.g. tuned ones). Defaults to None.
+        name (str, optional): Model of the registry. Defaults to the configured model.
 
-def _get_relu_regressor():
+    Returns:
+        sklearn.base.BaseEstimator: Unfitted model
+    """
+    if name is None:
+        name = conf.train.model
+    if name not in MODELS:
+        raise ValueError(f"Unknown model {name}, choose from {list(MODELS)}")
+    return MODELS[name](**(params or {}))
+
+
+def fit_model(regressor, X, y, groups=None):
+    """Fit a model, giving the season of each player to models that need it.
+
+    Args:
+        regressor (sklearn.base.BaseEstimator): Model
+        X (array-like): Features
+        y (array-like): Award shares
+        groups (array-like, optional): Season of each player. Defaults to None.
+
+    Returns:
+        sklearn.base.BaseEstimator: Fitted model
+    """
+    if isinstance(regressor, PairwiseRankingRegressor):
+        return regressor.fit(X, y, groups=groups)
+    return regressor.fit(X, y)
+
+
+def get_warm_started_model(fitted, max_iter: int = _FINE_TUNING_MAX_ITER):
+    """Get a model whose fit fine-tunes the weights of a fitted model, with early stopping.
+
+    Args:
+        fitted (neural_network.MLPRegressor | FineTunedMLPRegressor): Fitted model to start from
+        max_iter (int, optional): Maximum number of fine-tuning epochs. Defaults to _FINE_TUNING_MAX_ITER.
+
+    Returns:
+        FineTunedMLPRegressor: Model to fit
+    """
+    if isinstance(fitted, FineTunedMLPRegressor):
+        fitted = fitted.regressor_
+    if not isinstance(fitted, neural_network.MLPRegressor):
+        raise ValueError(f"Warm start is not supported by {type(fitted).__name__}")
+    return FineTunedMLPRegressor(start=fitted, max_iter=max_iter)
+
+
+def _get_regressor(**params):
+    default_params = {
+        "hidden_layer_sizes": 8,
+        "learning_rate": "adaptive",
+        "learning_rate_init": 0.065,
+        "random_state": 0,
+    }
+    return neural_network.MLPRegressor(**{**default_params, **params})
+
+
+def _get_relu_regressor(**params):
     return compose.TransformedTargetRegressor(
-        regressor=_get_regressor(), func=None, inverse_func=_relu
+        regressor=_get_regressor(**params),
+        func=_identity,
+        inverse_func=_relu,
+        check_inverse=False,
     )
 
 
+def _get_gradient_boosting_regressor(**params):
+    return ensemble.HistGradientBoostingRegressor(**{"random_state": 0, **params})
+
+
+def _get_ridge_regressor(**params):
+    return linear_model.Ridge(**params)
+
+
+def _get_ranking_model(**params):
+    return PairwiseRankingRegressor(**params)
+
+
 def _relu(x):
     return numpy.maximum(x, 0)
+
+
+def _identity(x):
+    return x
+
+
+# Models that can be trained, by name
+MODELS = {
+    "mlp": _get_regressor,
+    "mlp-relu": _get_relu_regressor,
+    "hgb": _get_gradient_boosting_regressor,
+    "ridge": _get_ridge_regressor,
+    "ranking": _get_ranking_model,
+}
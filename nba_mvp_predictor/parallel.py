@@ -0,0 +1,140 @@
+import contextlib
+import functools
+import multiprocessing
+import os
+import tempfile
+from concurrent import futures
+from typing import Callable, Iterable
+
+from nba_mvp_predictor import SEED, get_conf, logger, seed_packages
+
+_BLAS_ENV_VARIABLES = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+# Data shared by all tasks of a worker process, set once by the pool initializer
+_shared = None
+
+
+def get_n_jobs(n_jobs: int | None = None) -> int:
+    """Resolve the number of worker processes to use.
+
+    Args:
+        n_jobs (int, optional): Number of processes, -1 for all cores. Defaults to the configured value.
+
+    Returns:
+        int: Number of processes (at least 1)
+    """
+    if n_jobs is None:
+        n_jobs = get_conf().parallel.n_jobs
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    return max(1, int(n_jobs))
+
+
+def run_tasks(
+    func: Callable,
+    tasks: Iterable,
+    shared=None,
+    n_jobs: int | None = None,
+    seed: int = SEED,
+    callback: Callable | None = None,
+) -> list:
+    """Run ``func(task, shared)`` for every task, in parallel worker processes.
+
+    Shared data is sent once to each worker. Every task is seeded the same way, so
+    results do not depend on the number of workers, and are returned in task order.
+
+    Args:
+        func (Callable): Module-level function taking a task and the shared data
+        tasks (Iterable): Tasks
+        shared (optional): Read-only data used by all tasks. Defaults to None.
+        n_jobs (int, optional): Number of processes, -1 for all cores. Defaults to the configured value.
+        seed (int, optional): Seed set before each task. Defaults to SEED.
+        callback (Callable, optional): Called with each task and its result, in task order, as soon as available. Defaults to None.
+
+    Returns:
+        list: Results, in task order
+    """
+    tasks = list(tasks)
+    n_jobs = min(get_n_jobs(n_jobs), max(1, len(tasks)))
+    if n_jobs == 1:
+        return _collect(
+            tasks, (_run_task(func, task, seed, shared) for task in tasks), callback
+        )
+    logger.debug(f"Running {len(tasks)} tasks of {func.__name__} on {n_jobs} processes")
+    with futures.ProcessPoolExecutor(
+        max_workers=n_jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(shared, get_conf().parallel.blas_threads),
+    ) as executor:
+        results = executor.map(_run_task, *zip(*[(func, task, seed) for task in tasks]))
+        return _collect(tasks, results, callback)
+
+
+@contextlib.contextmanager
+def shared_arrays(**arrays):
+    """Write arrays once to memory-mapped files that all workers can read without copies.
+
+    Args:
+        **arrays (numpy.ndarray): Arrays to share, by name
+
+    Yields:
+        dict[str, str]: Path of each array, to open with load_shared_array
+    """
+    import numpy
+
+    with tempfile.TemporaryDirectory(prefix="nba_mvp_predictor-") as directory:
+        paths = {}
+        for name, array in arrays.items():
+            paths[name] = os.path.join(directory, f"{name}.npy")
+            numpy.save(paths[name], numpy.ascontiguousarray(array))
+        try:
+            yield paths
+        finally:
+            load_shared_array.cache_clear()
+
+
+@functools.cache
+def load_shared_array(path: str):
+    """Open a shared array as read-only memory map (once per process).
+
+    Args:
+        path (str): Path given by shared_arrays
+
+    Returns:
+        numpy.memmap: Read-only array
+    """
+    import numpy
+
+    return numpy.load(path, mmap_mode="r")
+
+
+def _collect(tasks: list, results: Iterable, callback: Callable | None) -> list:
+    collected = []
+    for task, result in zip(tasks, results):
+        if callback is not None:
+            callback(task, result)
+        collected.append(result)
+    return collected
+
+
+def _init_worker(shared, blas_threads: int):
+    global _shared
+    _shared = shared
+    # Avoid oversubscription: each worker uses few BLAS / OpenMP threads
+    for variable in _BLAS_ENV_VARIABLES:
+        os.environ[variable] = str(blas_threads)
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=blas_threads)
+
+
+def _run_task(func: Callable, task, seed: int, shared=None):
+    seed_packages(seed)
+    return func(task, shared if shared is not None else _shared)
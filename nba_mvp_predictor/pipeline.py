@@ -0,0 +1,371 @@
+import hashlib
+import importlib
+import json
+import os
+import zipfile
+from concurrent import futures
+from datetime import datetime
+from typing import Callable
+
+from nba_mvp_predictor import get_conf, logger
+
+
+class Stage:
+    """Step of the pipeline, declared by the files it reads and writes.
+
+    Stages depend on the stages writing their inputs. A stage is up to date when
+    its outputs exist and its inputs (and key) did not change since its last run.
+    Exclusive stages run alone: they write or read the feature store while others
+    could rewrite it, or start their own process pools.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], object],
+        inputs: list[str] | None = None,
+        outputs: list[str] | None = None,
+        key: Callable[[], str] | None = None,
+        pinned: bool = False,
+        exclusive: bool = False,
+    ):
+        """
+        Args:
+            name (str): Name of the stage, used on the command line
+            func (Callable): Function running the stage
+            inputs (list[str], optional): Files read by the stage. Defaults to None.
+            outputs (list[str], optional): Files written by the stage. Defaults to None.
+            key (Callable, optional): Extra value invalidating the stage when it changes (e.g. the date). Defaults to None.
+            pinned (bool, optional): Keep existing outputs even if inputs changed, unless the stage is forced. Defaults to False.
+            exclusive (bool, optional): Never run at the same time as another stage. Defaults to False.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.key = key
+        self.pinned = pinned
+        self.exclusive = exclusive
+
+    def __repr__(self):
+        return f"Stage({self.name})"
+
+
+def get_stages() -> list[Stage]:
+    """Declare the stages of the pipeline.
+
+    Returns:
+        list[Stage]: Stages, in a valid execution order
+    """
+    conf = get_conf()
+    data = conf.data
+    return [
+        Stage(
+            "bronze",
+            _lazy("train", "build_bronze_data"),
+            inputs=[
+                data.player_stats.path,
+                data.mvp_votes.path,
+                data.team_standings.path,
+            ],
+            outputs=[
+                data.bronze.path,
+                data.lag_sources.path,
+                data.players.path,
+                data.teams.path,
+            ],
+        ),
+        Stage(
+            "silver",
+            _lazy("train", "make_silver_data"),
+            inputs=[data.bronze.path],
+            outputs=[data.silver.path],
+        ),
+        Stage(
+            "train",
+            _lazy("train", "make_gold_data_and_train_model"),
+            inputs=[data.silver.path, data.tuning.path],
+            outputs=[data.gold.path, data.features.path, data.model.path]
+            # Metrics of a full warm start leak the evaluated seasons
+            + ([] if conf.train.warm_start == "full" else [data.performances.path]),
+            # The model is trained once at the beginning of the season
+            pinned=True,
+            exclusive=True,
+        ),
+        Stage(
+            "predict",
+            _lazy("predict", "load_model_make_predictions"),
+            inputs=[data.silver.path, data.model.path, data.features.path],
+            outputs=[data.model_input.path, data.predictions.path],
+            exclusive=True,
+        ),
+        Stage(
+            "simulate",
+            _lazy("simulate", "simulate_season"),
+            # After predict, which updates the feature store partition of the season
+            inputs=[
+                data.silver.path,
+                data.team_standings.path,
+                data.model.path,
+                data.features.path,
+                data.predictions.path,
+            ],
+            outputs=[data.simulations.path],
+            exclusive=True,
+        ),
+        Stage(
+            "explain",
+            _lazy("explain", "explain_model"),
+            # Model input is the current season partition of the feature store
+            inputs=[
+                data.model.path,
+                data.features.path,
+                data.model_input.path,
+                data.predictions.path,
+            ],
+            outputs=[
+                data.shap_values.path,
+                data.explain_report.path,
+                data.explain_history.path,
+            ],
+            exclusive=True,
+        ),
+        Stage(
+            "importance",
+            _lazy("importance", "explain_seasons"),
+            # Past seasons are in the gold data, the current season in the model input
+            inputs=[
+                data.model.path,
+                data.features.path,
+                data.gold.path,
+                data.model_input.path,
+            ],
+            outputs=[data.season_importances.path, data.era_importances.path],
+            exclusive=True,
+        ),
+        Stage(
+            "history",
+            _lazy("predict", "append_history"),
+            inputs=[data.predictions.path],
+            outputs=[data.history.path],
+            key=lambda: datetime.now().date().isoformat(),
+        ),
+    ]
+
+
+def run(
+    from_stage: str | None = None,
+    until_stage: str | None = None,
+    force: bool = False,
+    force_stages: list[str] | None = None,
+    stages: list[Stage] | None = None,
+    max_workers: int | None = None,
+):
+    """Run the pipeline, skipping stages whose outputs are up to date.
+
+    Args:
+        from_stage (str, optional): Only run this stage and the stages depending on it. Defaults to None.
+        until_stage (str, optional): Only run this stage and the stages it depends on. Defaults to None.
+        force (bool, optional): Run selected stages even if up to date. Defaults to False.
+        force_stages (list[str], optional): Stages to run even if up to date (and pinned). Defaults to None.
+        stages (list[Stage], optional): Stages to run. Defaults to the stages of get_stages.
+        max_workers (int, optional): Maximum number of stages running in parallel. Defaults to None.
+
+    Returns:
+        bool: True if all selected stages succeeded
+    """
+    if stages is None:
+        stages = get_stages()
+    by_name = {stage.name: stage for stage in stages}
+    force_stages = list(force_stages or [])
+    for name in [from_stage, until_stage, *force_stages]:
+        if name is not None and name not in by_name:
+            raise ValueError(f"Unknown stage {name}, choose from {list(by_name)}")
+    parents = get_dependencies(stages)
+    selected = [stage.name for stage in stages]
+    if from_stage is not None:
+        descendants = _get_descendants(from_stage, parents)
+        selected = [name for name in selected if name in descendants]
+    if until_stage is not None:
+        ancestors = _get_ancestors(until_stage, parents)
+        selected = [name for name in selected if name in ancestors]
+    logger.info("Pipeline stages : %s", ", ".join(selected))
+
+    manifest = load_manifest()
+    done, failed = set(), set()
+    pending = list(selected)
+    running = {}
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name in list(pending):
+                stage_parents = [p for p in parents[name] if p in selected]
+                if any(p in failed for p in stage_parents):
+                    logger.error("Stage %s not run: a dependency failed", name)
+                    failed.add(name)
+                    pending.remove(name)
+                elif all(p in done for p in stage_parents):
+                    stage = by_name[name]
+                    forced = force or name in force_stages
+                    if not forced and is_up_to_date(stage, manifest):
+                        logger.info("Stage %s is up to date (skipped)", name)
+                        pending.remove(name)
+                        done.add(name)
+                    elif running and (
+                        stage.exclusive
+                        or any(by_name[other].exclusive for other in running.values())
+                    ):
+                        # Waits for the running stages
+                        continue
+                    else:
+                        logger.info("Running stage %s...", name)
+                        pending.remove(name)
+                        running[executor.submit(stage.func)] = name
+            if not running:
+                continue
+            finished, _ = futures.wait(
+                list(running), return_when=futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Stage {name} failed : {e}", exc_info=True)
+                    failed.add(name)
+                else:
+                    logger.info("Stage %s done", name)
+                    manifest[name] = get_fingerprint(by_name[name])
+                    save_manifest(manifest)
+                    done.add(name)
+    return len(failed) == 0
+
+
+def get_dependencies(stages: list[Stage]) -> dict[str, list[str]]:
+    """Get the stages each stage depends on, from the files they read and write.
+
+    Args:
+        stages (list[Stage]): Stages
+
+    Returns:
+        dict[str, list[str]]: Names of parent stages per stage name
+    """
+    writers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            writers[output] = stage.name
+    return {
+        stage.name: list(
+            dict.fromkeys(
+                writers[path]
+                for path in stage.inputs
+                if path in writers and writers[path] != stage.name
+            )
+        )
+        for stage in stages
+    }
+
+
+def is_up_to_date(stage: Stage, manifest: dict) -> bool:
+    """Check if the outputs of a stage are still valid.
+
+    Args:
+        stage (Stage): Stage
+        manifest (dict): Fingerprints of the last successful runs
+
+    Returns:
+        bool: True if the stage does not need to run
+    """
+    if not all(os.path.exists(path) for path in stage.outputs):
+        return False
+    if stage.pinned:
+        return True
+    if stage.name not in manifest:
+        return False
+    return manifest[stage.name] == get_fingerprint(stage)
+
+
+def get_fingerprint(stage: Stage) -> dict:
+    """Fingerprint the inputs of a stage.
+
+    Args:
+        stage (Stage): Stage
+
+    Returns:
+        dict: Content hash of each input, and the key of the stage
+    """
+    return {
+        "inputs": {path: hash_file(path) for path in stage.inputs},
+        "key": stage.key() if stage.key is not None else None,
+    }
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str | None:
+    """Hash the content of a file.
+
+    Zip archives are hashed from the name, size and CRC of their members: pandas
+    writes the time into each archive, so the same data written again must not
+    change the hash.
+
+    Args:
+        path (str): Path to the file
+        chunk_size (int, optional): Bytes read at once. Defaults to 1 MiB.
+
+    Returns:
+        str: SHA-256 digest, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                digest.update(
+                    f"{member.filename}:{member.file_size}:{member.CRC}\n".encode()
+                )
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest() -> dict:
+    manifest_conf = get_conf().data.pipeline
+    try:
+        with open(manifest_conf.path, encoding=manifest_conf.encoding) as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest: dict):
+    manifest_conf = get_conf().data.pipeline
+    with open(manifest_conf.path, "w", encoding=manifest_conf.encoding) as outfile:
+        json.dump(manifest, outfile, indent=manifest_conf.indent)
+
+
+def _lazy(module: str, function: str) -> Callable[[], object]:
+    # Import stage modules (and sklearn, shap...) only when the stage runs
+    def run_stage():
+        stage_module = importlib.import_module(f"nba_mvp_predictor.{module}")
+        return getattr(stage_module, function)()
+
+    return run_stage
+
+
+def _get_ancestors(name: str, parents: dict[str, list[str]]) -> set[str]:
+    ancestors, stack = set(), [name]
+    while stack:
+        current = stack.pop()
+        if current not in ancestors:
+            ancestors.add(current)
+            stack.extend(parents[current])
+    return ancestors
+
+
+def _get_descendants(name: str, parents: dict[str, list[str]]) -> set[str]:
+    children = {stage: [] for stage in parents}
+    for stage, stage_parents in parents.items():
+        for parent in stage_parents:
+            children[parent].append(stage)
+    return _get_ancestors(name, children)
@@ -1,49 +1,171 @@
-import json
 from datetime import datetime
 
 import pandas
 
-from nba_mvp_predictor import conf, load, logger, preprocess, train
+from nba_mvp_predictor import conf, feature_store, load, logger, tracing, train, utils
 
 
+@tracing.traced("predict")
 def load_model_make_predictions(max_n=50):
-    model = load.load_model()
-    data = load.load_silver_data()
-    data = data.fillna(0.0)
-    current_season = (
-        datetime.now().year + 1 if datetime.now().month > 9 else datetime.now().year
-    )
+    """Make predictions for the current season with the trained model.
+
+    Args:
+        max_n (int, optional): Number of top players to keep. Defaults to 50.
+
+    Returns:
+        pandas.DataFrame: Predictions written to disk
+    """
+    with tracing.span("predict.read") as span:
+        model = load.load_scorer()
+        data = load.load_silver_data()
+        current_season = utils.get_current_season()
+        logger.debug(f"Current season : {current_season}")
+        data = data[data.SEASON == current_season]
+        span.set_frame(data)
+    return score_season(model, data, current_season, max_n=max_n)
+
+
+@tracing.traced("refresh")
+def refresh_predictions(max_n=50):
+    """Make predictions for the current season from its downloaded data only.
+
+    Unlike make_predictions, bronze and silver data of past seasons are neither
+    rebuilt nor read, so the cost does not grow with the length of the history.
+
+    Args:
+        max_n (int, optional): Number of top players to keep. Defaults to 50.
+
+    Returns:
+        pandas.DataFrame: Predictions written to disk
+    """
+    model = load.load_scorer()
+    current_season = utils.get_current_season()
     logger.debug(f"Current season : {current_season}")
-    data = data[data.SEASON == current_season]
-    with open("data/features.json") as json_file:
-        features_dict = json.load(json_file)
-    cat = features_dict["cat"]
-    num = features_dict["num"]
-    features = features_dict["model"]
-    min_max_scaling = False
-    data_processed_features_only, _ = preprocess.scale_per_value_of(
-        data, cat, num, data["SEASON"], min_max_scaler=min_max_scaling
-    )
-    X = data_processed_features_only[features]
-    X.to_csv(
-        conf.data.model_input.path,
-        sep=conf.data.model_input.sep,
-        encoding=conf.data.model_input.encoding,
-        compression=conf.data.model_input.compression,
-        index=True,
-    )
-    predictions = model.predict(X)
+    data = train.make_season_silver_data(current_season)
+    return score_season(model, data, current_season, max_n=max_n)
+
+
+def score_season(
+    model,
+    data: pandas.DataFrame,
+    season: int,
+    max_n=50,
+    writer: utils.BackgroundWriter | None = None,
+):
+    """Score the silver data of a season and write the top predictions.
+
+    Args:
+        model (sklearn.base.BaseEstimator): Trained model
+        data (pandas.DataFrame): Silver data of the season
+        season (int): Season
+        max_n (int, optional): Number of top players to keep. Defaults to 50.
+        writer (utils.BackgroundWriter, optional): Writer of the files in the background. Defaults to writing them right away.
+
+    Returns:
+        pandas.DataFrame: Predictions written to disk
+    """
+    X, predictions = predict_season(model, data, season, max_n=max_n)
+    utils.write(writer, write_model_input, X)
+    utils.write(writer, write_predictions, predictions)
+    return predictions
+
+
+def predict_season(model, data: pandas.DataFrame, season: int, max_n=50):
+    """Score the silver data of a season.
+
+    Args:
+        model (sklearn.base.BaseEstimator): Trained model
+        data (pandas.DataFrame): Silver data of the season
+        season (int): Season
+        max_n (int, optional): Number of top players to keep. Defaults to 50.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: Model input of all players, and top predictions
+    """
+    X, _ = get_model_input(data, season)
+    data = data.fillna(0.0)
+    with tracing.span("predict.score", rows=len(X)):
+        predictions = model.predict(X)
     data.loc[:, "PRED"] = predictions
     data.loc[:, "PRED_RANK"] = data["PRED"].rank(ascending=False)
     data = data.sort_values(by="PRED", ascending=False).head(max_n)
     data = data[data["PRED"] > 0.0]
-    data.to_csv(
-        conf.data.predictions.path,
-        sep=conf.data.predictions.sep,
-        encoding=conf.data.predictions.encoding,
-        compression=conf.data.predictions.compression,
-        index=True,
-    )
+    return X, data
+
+
+def write_model_input(X: pandas.DataFrame):
+    """Write the model input of the season.
+
+    Args:
+        X (pandas.DataFrame): Model input
+    """
+    with tracing.span("predict.write_model_input") as span:
+        X.to_csv(
+            conf.data.model_input.path,
+            sep=conf.data.model_input.sep,
+            encoding=conf.data.model_input.encoding,
+            compression=conf.data.model_input.compression,
+            index=True,
+        )
+        span.set_frame(X).set_file(conf.data.model_input.path)
+
+
+def write_predictions(predictions: pandas.DataFrame):
+    """Write the top predictions of the season.
+
+    Args:
+        predictions (pandas.DataFrame): Predictions
+    """
+    with tracing.span("predict.write") as span:
+        predictions.to_csv(
+            conf.data.predictions.path,
+            sep=conf.data.predictions.sep,
+            encoding=conf.data.predictions.encoding,
+            compression=conf.data.predictions.compression,
+            index=True,
+        )
+        span.set_frame(predictions).set_file(conf.data.predictions.path)
+
+
+def get_model_input(data: pandas.DataFrame, season: int):
+    """Build the model input of a season through the feature store.
+
+    Args:
+        data (pandas.DataFrame): Silver data of the season
+        season (int): Season
+
+    Returns:
+        tuple[pandas.DataFrame, str]: Model input indexed like data, and feature version
+    """
+    features_dict = load.load_features()
+    features = features_dict["model"]
+    if "columns" in features_dict:
+        feature_spec = features_dict
+    else:
+        # Features saved before the feature store existed
+        feature_spec = feature_store.get_feature_spec(
+            data, features_dict["cat"], features_dict["num"]
+        )
+    with tracing.span("predict.features") as span:
+        # Only the partition of the season is rebuilt, with its own scaling
+        feature_version = feature_store.update_feature_store(data, feature_spec)
+        X = feature_store.load_model_input(
+            feature_version, features, seasons=[season]
+        ).loc[data.index]
+        span.set_frame(X)
+    return X, feature_version
+
+
+@tracing.traced("predict.history")
+def append_history(predictions=None):
+    """Append today's predictions to the predictions history.
+
+    Args:
+        predictions (pandas.DataFrame, optional): Predictions of the day. Defaults to predictions on disk.
+    """
+    if predictions is None:
+        predictions = load.load_predictions()
+    data = predictions.copy()
     try:
         history = load.load_history()
         logger.debug(f"History found - {history.DATE.nunique()} entries")
@@ -67,10 +189,59 @@ def load_model_make_predictions(max_n=50):
         )
 
 
-def make_predictions():
+def make_predictions(refresh: bool = False, explain: bool = False):
+    """Make predictions for the current season and append them to the history.
+
+    Args:
+        refresh (bool, optional): Only process the downloaded current season data (see refresh_predictions). Defaults to False.
+        explain (bool, optional): Also explain the predictions in the same run (see predict_and_explain). Defaults to False.
+    """
     try:
-        train.make_bronze_data()
-        train.make_silver_data()
-        load_model_make_predictions()
+        if explain:
+            predict_and_explain(refresh=refresh)
+            return
+        if refresh:
+            predictions = refresh_predictions()
+        else:
+            train.make_bronze_data()
+            train.make_silver_data()
+            predictions = load_model_make_predictions()
+        append_history(predictions)
     except Exception as e:
         logger.error(f"Predicting failed : {e}", exc_info=True)
+
+
+@tracing.traced("predict.explain")
+def predict_and_explain(refresh: bool = False, max_n=50):
+    """Make predictions for the current season and explain them in the same run.
+
+    The model, the model input and the ranked predictions are handed to the
+    explanation in memory, instead of being written and read back. Files are
+    written in the background meanwhile, and all of them once this returns.
+
+    Args:
+        refresh (bool, optional): Only process the downloaded current season data (see refresh_predictions). Defaults to False.
+        max_n (int, optional): Number of top players to keep. Defaults to 50.
+
+    Returns:
+        pandas.DataFrame: Predictions written to disk
+    """
+    from nba_mvp_predictor import explain
+
+    current_season = utils.get_current_season()
+    logger.debug(f"Current season : {current_season}")
+    if refresh:
+        data = train.make_season_silver_data(current_season)
+    else:
+        train.make_bronze_data()
+        train.make_silver_data()
+        data = load.load_silver_data()
+        data = data[data.SEASON == current_season]
+    model = load.load_scorer()
+    with utils.BackgroundWriter() as writer:
+        X, predictions = predict_season(model, data, current_season, max_n=max_n)
+        writer.submit(write_model_input, X)
+        writer.submit(write_predictions, predictions)
+        writer.submit(append_history, predictions)
+        explain.explain_predictions(model, X, predictions, writer=writer)
+    return predictions
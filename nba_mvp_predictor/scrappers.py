@@ -10,7 +10,7 @@ import pandas
 from bs4 import BeautifulSoup
 from curl_cffi import requests as _br_http
 
-from nba_mvp_predictor import logger, utils
+from nba_mvp_predictor import logger, tracing, utils
 
 """
 1955-56 through 1979-1980: Voting was done by players. Rules prohibited player from voting
@@ -231,14 +231,17 @@ class BasketballReferenceScrapper(Scrapper):
     @classmethod
     def get_request(cls, uri):
         url = urljoin(f"{cls.BR_ORIGIN}/", uri)
-        cls.wait_between_request()
+        with tracing.span("http.wait"):
+            cls.wait_between_request()
         impersonate = cls.BR_IMPERSONATE_DEFAULT
         logger.debug("Requesting %s (impersonate=%s)...", url, impersonate)
-        r = _br_http.get(
-            url,
-            impersonate=impersonate,
-            timeout=cls.BR_REQUEST_TIMEOUT_SECONDS,
-        )
+        with tracing.span("http.request", url=url) as span:
+            r = _br_http.get(
+                url,
+                impersonate=impersonate,
+                timeout=cls.BR_REQUEST_TIMEOUT_SECONDS,
+            )
+            span.set(status_code=r.status_code, response_bytes=len(r.content))
         if r.status_code == 200:
             return r
         logger.error("Failed to get %s", url)
@@ -0,0 +1,535 @@
+import collections
+import json
+import queue
+import threading
+import time
+from concurrent import futures
+from http import server
+from urllib import parse
+
+import numpy
+import pandas
+
+from nba_mvp_predictor import (
+    conf,
+    feature_store,
+    load,
+    logger,
+    predict,
+    utils,
+    whatif,
+)
+
+_LATENCY_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class ModelState:
+    """Model and current season model input, loaded once and kept in memory."""
+
+    def __init__(
+        self,
+        model,
+        data: pandas.DataFrame,
+        X: pandas.DataFrame,
+        season: int,
+        offset: numpy.ndarray | None = None,
+        scale: numpy.ndarray | None = None,
+    ):
+        """
+        Args:
+            model (sklearn.base.BaseEstimator): Trained model
+            data (pandas.DataFrame): Silver data of the season
+            X (pandas.DataFrame): Model input of the season, indexed like data
+            season (int): Season
+            offset (numpy.ndarray, optional): Scaling offset of each model feature. Defaults to 0 (not scaled).
+            scale (numpy.ndarray, optional): Scaling factor of each model feature. Defaults to 1 (not scaled).
+        """
+        self.model = model
+        self.season = season
+        self.columns = list(X.columns)
+        self.matrix = X.to_numpy(dtype="float32")
+        # Raw values of model features are offset + scale * model input
+        self.offset = numpy.zeros(len(self.columns)) if offset is None else offset
+        self.scale = numpy.ones(len(self.columns)) if scale is None else scale
+        self.players = data["PLAYER"].to_numpy()
+        self.teams = data["TEAM"].to_numpy()
+        # Traded players have a row per team: they are scored on the row with most games
+        by_games = pandas.Series(data["G"].to_numpy()).sort_values(
+            ascending=False, kind="stable"
+        )
+        self.rows = {}
+        for row in by_games.index:
+            self.rows.setdefault(self.players[row], row)
+        self.predictions = self.predict(self.matrix)
+
+    @classmethod
+    def load(cls):
+        """Load the model and build the model input of the current season.
+
+        Returns:
+            ModelState: State of the current season
+        """
+        model = load.load_scorer()
+        season = utils.get_current_season()
+        data = load.load_silver_data()
+        data = data[data.SEASON == season]
+        if len(data) == 0:
+            raise ValueError(f"No silver data found for season {season}")
+        X, feature_version = predict.get_model_input(data, season)
+        # Numerical features are scaled with the statistics of the season
+        num = load.load_features()["num"]
+        season_offset, season_scale = feature_store.load_scaling(
+            feature_version, season
+        )
+        positions = {feature: position for position, feature in enumerate(num)}
+        offset = numpy.array(
+            [season_offset[positions[c]] if c in positions else 0.0 for c in X.columns]
+        )
+        scale = numpy.array(
+            [season_scale[positions[c]] if c in positions else 1.0 for c in X.columns]
+        )
+        return cls(model, data, X, season, offset=offset, scale=scale)
+
+    def predict(self, matrix: numpy.ndarray) -> numpy.ndarray:
+        """Score model input rows.
+
+        Args:
+            matrix (numpy.ndarray): Model input, one column per model feature
+
+        Returns:
+            numpy.ndarray: Predicted MVP votes shares
+        """
+        # Named columns, as the model was fitted on a data frame
+        X = pandas.DataFrame(matrix, columns=self.columns, copy=False)
+        return self.model.predict(X)
+
+    def get_row(self, player: str) -> int:
+        """Find the model input row of a player.
+
+        Args:
+            player (str): Player name
+
+        Returns:
+            int: Row of the player in the model input matrix
+        """
+        try:
+            return self.rows[player]
+        except KeyError:
+            raise KeyError(f"Unknown player for season {self.season} : {player}")
+
+
+class Metrics:
+    """Latency and throughput of the requests served, over a sliding window."""
+
+    def __init__(self, window: int):
+        """
+        Args:
+            window (int): Number of last requests the latency quantiles are computed on
+        """
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._requests = collections.Counter()
+        self._batches = 0
+        self._batched_requests = 0
+        self._batched_rows = 0
+        self._start = time.perf_counter()
+
+    def observe_request(self, path: str, status: int, seconds: float):
+        with self._lock:
+            self._requests[(path, status)] += 1
+            self._latencies.append((time.perf_counter(), seconds))
+
+    def observe_batch(self, n_requests: int, n_rows: int):
+        with self._lock:
+            self._batches += 1
+            self._batched_requests += n_requests
+            self._batched_rows += n_rows
+
+    def get_summary(self) -> dict:
+        """Summarize the requests served.
+
+        Returns:
+            dict: Request counts, latency quantiles (seconds) and throughput (requests per second) of the window, and batch sizes
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            requests = dict(self._requests)
+            batches = self._batches
+            batched_requests = self._batched_requests
+            batched_rows = self._batched_rows
+        summary = {
+            "uptime_seconds": time.perf_counter() - self._start,
+            "requests": sum(requests.values()),
+            "errors": sum(n for (_, status), n in requests.items() if status >= 400),
+            "batches": batches,
+            "mean_batch_requests": batched_requests / batches if batches else 0.0,
+            "mean_batch_rows": batched_rows / batches if batches else 0.0,
+            "latency_seconds": {},
+            "throughput_per_second": 0.0,
+        }
+        if len(latencies) > 0:
+            seconds = numpy.array([latency for _, latency in latencies])
+            for quantile in _LATENCY_QUANTILES:
+                summary["latency_seconds"][f"p{quantile * 100:g}"] = float(
+                    numpy.quantile(seconds, quantile)
+                )
+        if len(latencies) > 1:
+            elapsed = latencies[-1][0] - latencies[0][0]
+            if elapsed > 0:
+                summary["throughput_per_second"] = (len(latencies) - 1) / elapsed
+        return summary
+
+    def to_prometheus(self) -> str:
+        """Format the metrics in the Prometheus text format.
+
+        Returns:
+            str: Metrics
+        """
+        summary = self.get_summary()
+        with self._lock:
+            requests = dict(self._requests)
+        prefix = "nba_mvp_predictor_serve"
+        lines = [
+            f"# TYPE {prefix}_requests_total counter",
+            *[
+                f'{prefix}_requests_total{{path="{path}",status="{status}"}} {n}'
+                for (path, status), n in sorted(requests.items())
+            ],
+            f"# TYPE {prefix}_latency_seconds summary",
+            *[
+                f'{prefix}_latency_seconds{{quantile="{quantile}"}} '
+                f'{summary["latency_seconds"].get(f"p{quantile * 100:g}", 0.0)}'
+                for quantile in _LATENCY_QUANTILES
+            ],
+            f"# TYPE {prefix}_throughput_per_second gauge",
+            f'{prefix}_throughput_per_second {summary["throughput_per_second"]}',
+            f"# TYPE {prefix}_batches_total counter",
+            f'{prefix}_batches_total {summary["batches"]}',
+            f"# TYPE {prefix}_mean_batch_rows gauge",
+            f'{prefix}_mean_batch_rows {summary["mean_batch_rows"]}',
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class MicroBatcher:
+    """Score the rows submitted by concurrent requests with one predict call per batch.
+
+    A batch starts with the first pending request, and takes the requests arriving
+    until it is full or its waiting time is over.
+    """
+
+    def __init__(
+        self,
+        predict_func,
+        max_batch_size: int,
+        max_wait_seconds: float,
+        metrics: Metrics | None = None,
+    ):
+        """
+        Args:
+            predict_func (Callable): Function scoring a matrix of rows
+            max_batch_size (int): Maximum number of rows of a batch
+            max_wait_seconds (float): Maximum time to wait for other requests
+            metrics (Metrics, optional): Metrics recording batch sizes. Defaults to None.
+        """
+        self.predict_func = predict_func
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, matrix: numpy.ndarray) -> futures.Future:
+        """Submit rows to score.
+
+        Args:
+            matrix (numpy.ndarray): Rows to score
+
+        Returns:
+            concurrent.futures.Future: Predictions of the rows
+        """
+        future = futures.Future()
+        self._queue.put((matrix, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait_seconds
+            while n_rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = (
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+            self._score(batch, n_rows)
+
+    def _score(self, batch: list, n_rows: int):
+        try:
+            predictions = self.predict_func(
+                numpy.concatenate([matrix for matrix, _ in batch])
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        offsets = numpy.cumsum([len(matrix) for matrix, _ in batch])[:-1]
+        for (_, future), scores in zip(batch, numpy.split(predictions, offsets)):
+            future.set_result(scores)
+        if self.metrics is not None:
+            self.metrics.observe_batch(len(batch), n_rows)
+
+
+class PredictionService:
+    """Scoring of the current season, shared by the requests of the server."""
+
+    def __init__(self, state: ModelState, serve_conf=None):
+        """
+        Args:
+            state (ModelState): Model and model input
+            serve_conf (box.Box, optional): Server configuration. Defaults to the serve configuration.
+        """
+        if serve_conf is None:
+            serve_conf = conf.serve
+        self.state = state
+        self.metrics = Metrics(serve_conf.latency_window)
+        self.batcher = MicroBatcher(
+            state.predict,
+            serve_conf.max_batch_size,
+            serve_conf.max_batch_wait_ms / 1000,
+            self.metrics,
+        )
+
+    def get_predictions(self, top: int = 10) -> list[dict]:
+        """Predictions of the current season, computed when the state was loaded.
+
+        Args:
+            top (int, optional): Number of players to return. Defaults to 10.
+
+        Returns:
+            list[dict]: Best predicted players
+        """
+        order = numpy.argsort(-self.state.predictions, kind="stable")[:top]
+        return [
+            {
+                "player": self.state.players[row],
+                "team": self.state.teams[row],
+                "pred": float(self.state.predictions[row]),
+                "rank": rank + 1,
+            }
+            for rank, row in enumerate(order)
+        ]
+
+    def score(self, request: dict) -> dict:
+        """Score players of the current season, or model input rows.
+
+        Args:
+            request (dict): "players" (list of player names) and/or "rows" (list of
+                model inputs, as feature to value mappings, missing features being 0)
+
+        Returns:
+            dict: "predictions", one per player then per row
+        """
+        players = _get_list(request, "players")
+        rows = _get_list(request, "rows")
+        if len(players) + len(rows) == 0:
+            raise ValueError("Nothing to score : give players or rows")
+        matrix = numpy.zeros(
+            (len(players) + len(rows), len(self.state.columns)), dtype="float32"
+        )
+        for position, player in enumerate(players):
+            matrix[position] = self.state.matrix[self.state.get_row(player)]
+        columns = {
+            column: position for position, column in enumerate(self.state.columns)
+        }
+        for position, row in enumerate(rows, start=len(players)):
+            if not isinstance(row, dict):
+                raise ValueError("Each row must map model features to values")
+            unknown = set(row).difference(columns)
+            if unknown:
+                raise ValueError(f"Unknown model features : {sorted(unknown)}")
+            for column, value in row.items():
+                matrix[position, columns[column]] = value
+        scores = self.batcher.submit(matrix).result()
+        names = list(players) + [None] * len(rows)
+        return {
+            "season": self.state.season,
+            "predictions": [
+                {"player": name, "pred": float(score)}
+                for name, score in zip(names, scores)
+            ],
+        }
+
+    def what_if(self, request: dict) -> dict:
+        """Score a grid of perturbations of features of players (see whatif.score_scenarios).
+
+        Args:
+            request (dict): "players" (list of player names) and "perturbations", each
+                one a mapping with "feature", "values" and "operation" ("add",
+                "multiply" or "set", defaults to "add") or a text like "FG_per_game+1,2"
+
+        Returns:
+            dict: "scenarios", one per player and combination of values
+        """
+        players = _get_list(request, "players")
+        if len(players) == 0:
+            raise ValueError("No players given")
+        requested = _get_list(request, "perturbations")
+        if any(not isinstance(p, (str, dict)) for p in requested):
+            raise ValueError("Each perturbation must be a text or a mapping")
+        perturbations = [
+            (
+                whatif.parse_perturbation(perturbation)
+                if isinstance(perturbation, str)
+                else whatif.Perturbation(
+                    perturbation["feature"],
+                    tuple(float(value) for value in perturbation["values"]),
+                    perturbation.get("operation", whatif.ADD),
+                )
+            )
+            for perturbation in requested
+        ]
+        scenarios = whatif.score_scenarios(self.state, players, perturbations)
+        return {
+            "season": self.state.season,
+            "scenarios": scenarios.to_dict(orient="records"),
+        }
+
+
+class _RequestHandler(server.BaseHTTPRequestHandler):
+    # Keep-alive connections, so that clients do not reconnect for every request
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def do_GET(self):
+        url = parse.urlparse(self.path)
+        query = parse.parse_qs(url.query)
+        if url.path == "/health":
+            self._respond(
+                url.path,
+                200,
+                {"status": "ok", "season": self.service.state.season},
+            )
+        elif url.path == "/predictions":
+            try:
+                top = int(query.get("top", ["10"])[0])
+                if top < 0:
+                    raise ValueError(f"top must be positive, not {top}")
+            except ValueError as e:
+                self._respond(url.path, 400, {"error": str(e)})
+                return
+            self._respond(url.path, 200, self.service.get_predictions(top))
+        elif url.path == "/metrics":
+            self._respond(
+                url.path, 200, self.service.metrics.to_prometheus(), record=False
+            )
+        elif url.path == "/metrics.json":
+            self._respond(
+                url.path, 200, self.service.metrics.get_summary(), record=False
+            )
+        else:
+            self._respond(url.path, 404, {"error": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        url = parse.urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if url.path == "/score":
+            handle = self.service.score
+        elif url.path == "/whatif":
+            handle = self.service.what_if
+        else:
+            self._respond(url.path, 404, {"error": f"Unknown path {url.path}"})
+            return
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("The request body must be a JSON object")
+            content = handle(request)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._respond(url.path, 400, {"error": str(e).strip("'\"")})
+            return
+        self._respond(url.path, 200, content)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _respond(self, path: str, status: int, content, record: bool = True):
+        if isinstance(content, str):
+            body, content_type = content.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(content).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if record:
+            # Latency from the parsed request line to the response written
+            seconds = time.perf_counter() - self._start
+            self.service.metrics.observe_request(path, status, seconds)
+
+    def parse_request(self):
+        self._start = time.perf_counter()
+        return super().parse_request()
+
+
+def make_server(host: str | None = None, port: int | None = None, service=None):
+    """Create the prediction server, with the model and current season in memory.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to the configured host.
+        port (int, optional): Port to listen on, 0 for any free port. Defaults to the configured port.
+        service (PredictionService, optional): Service to expose. Defaults to a service on the current season.
+
+    Returns:
+        http.server.ThreadingHTTPServer: Server, not started
+    """
+    if host is None:
+        host = conf.serve.host
+    if port is None:
+        port = conf.serve.port
+    if service is None:
+        service = PredictionService(ModelState.load())
+    handler = type("RequestHandler", (_RequestHandler,), {"service": service})
+    httpd = server.ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def serve(host: str | None = None, port: int | None = None):
+    """Serve predictions of the current season over HTTP until interrupted.
+
+    Endpoints: GET /health, GET /predictions?top=N, POST /score, POST /whatif and GET /metrics
+    (Prometheus text format, or JSON at /metrics.json).
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to the configured host.
+        port (int, optional): Port to listen on. Defaults to the configured port.
+    """
+    httpd = make_server(host, port)
+    host, port = httpd.server_address[:2]
+    logger.info("Serving predictions on http://%s:%s", host, port)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+    finally:
+        httpd.server_close()
+
+
+def _get_list(request: dict, key: str) -> list:
+    value = request.get(key, [])
+    if not isinstance(value, list):
+        raise ValueError(f"{key} must be a list, not {type(value).__name__}")
+    return value
@@ -8,16 +8,32 @@ setup(
         "analytics",
         "analyze",
         "artifacts",
+        "attribution",
+        "benchmark",
         "cli",
+        "dimensions",
         "download",
         "evaluate",
+        "feature_store",
+        "importance",
+        "lags",
         "load",
+        "memory",
+        "mlp",
+        "parallel",
+        "pipeline",
         "predict",
         "preprocess",
         "scrappers",
+        "serve",
+        "simulate",
+        "synthetic",
+        "tracing",
         "train",
+        "tune",
         "utils",
         "web",
+        "whatif",
         "basketball_reference_scrapper.seasons",
     ],
 )
@@ -0,0 +1,313 @@
+import numpy
+import pandas
+
+from nba_mvp_predictor import SEED, conf, lags, load, logger, predict, tracing, utils
+
+# Team features of silver data, recomputed from the simulated standings
+TEAM_FEATURES = ["W", "L", "W/L%", "GB", "PW", "PL", "PS/G", "PA/G", "CONF_RANK"]
+# Exponent of the Pythagorean expectation used by Basketball Reference (PW, PL)
+PYTHAGOREAN_EXPONENT = 14
+_Z_95 = 1.959964
+
+
+@tracing.traced("simulate")
+def simulate_season(n_simulations: int | None = None, seed: int = SEED):
+    """Simulate the rest of the current season and write the MVP probabilities.
+
+    Args:
+        n_simulations (int, optional): Number of simulated seasons. Defaults to the simulate configuration.
+        seed (int, optional): Random seed. Defaults to SEED.
+
+    Returns:
+        pandas.DataFrame: Simulated probabilities written to disk
+    """
+    if n_simulations is None:
+        n_simulations = conf.simulate.n_simulations
+    with tracing.span("simulate.read") as span:
+        model = load.load_scorer()
+        season = utils.get_current_season()
+        data = load.load_silver_data()
+        data = data[data.SEASON == season]
+        standings = load.load_team_standings()
+        standings = standings[standings.SEASON == season]
+        spec = load.load_features()
+        span.set_frame(data)
+    X, _ = predict.get_model_input(data, season)
+    simulations = simulate_predictions(
+        model, data, standings, X, spec, n_simulations, seed=seed
+    )
+    with tracing.span("simulate.write") as span:
+        simulations.to_csv(
+            conf.data.simulations.path,
+            sep=conf.data.simulations.sep,
+            encoding=conf.data.simulations.encoding,
+            index=True,
+        )
+        span.set_frame(simulations).set_file(conf.data.simulations.path)
+    return simulations
+
+
+def simulate_predictions(
+    model,
+    data: pandas.DataFrame,
+    standings: pandas.DataFrame,
+    X: pandas.DataFrame,
+    spec: dict,
+    n_simulations: int,
+    seed: int = SEED,
+) -> pandas.DataFrame:
+    """Score simulated ends of season and count how often each player wins the MVP.
+
+    Simulations are run in batches of the simulate configuration batch size: each
+    batch is a single array of simulated seasons, scaled and scored at once.
+
+    Args:
+        model (sklearn.base.BaseEstimator): Trained model
+        data (pandas.DataFrame): Silver data of the season
+        standings (pandas.DataFrame): Team standings of the season
+        X (pandas.DataFrame): Model input of the season, indexed like data
+        spec (dict): Feature specification
+        n_simulations (int): Number of simulated seasons
+        seed (int, optional): Random seed. Defaults to SEED.
+
+    Returns:
+        pandas.DataFrame: Probabilities of each player to win the MVP (with its 95%
+            confidence interval) and to finish on the podium, and quantiles of the
+            predicted share, indexed like data (one row per player)
+    """
+    rng = numpy.random.default_rng(seed)
+    num = spec["num"]
+    columns = list(X.columns)
+    # Positions of the numerical features used by the model, in the model input and in num
+    model_positions = [i for i, column in enumerate(columns) if column in num]
+    num_positions = [num.index(columns[i]) for i in model_positions]
+    matrix = X.to_numpy(dtype="float32")
+    # Traded players have a row per team: the best scored row is the player's score
+    codes, players = pandas.factorize(data["PLAYER"])
+    order = numpy.argsort(codes, kind="stable")
+    starts = numpy.flatnonzero(numpy.r_[True, numpy.diff(codes[order]) != 0])
+    wins = numpy.zeros(len(players), dtype="int64")
+    podiums = numpy.zeros(len(players), dtype="int64")
+    shares = []
+    batch_size = conf.simulate.batch_size
+    with tracing.span("simulate.score", simulations=n_simulations):
+        for start in range(0, n_simulations, batch_size):
+            n = min(batch_size, n_simulations - start)
+            raw = simulate_features(data, standings, num, n, rng)
+            scaled = scale_features(raw, spec["min_max_scaling"])
+            inputs = numpy.broadcast_to(matrix, (n, *matrix.shape)).copy()
+            inputs[:, :, model_positions] = scaled[:, :, num_positions]
+            predictions = model.predict(
+                pandas.DataFrame(inputs.reshape(-1, len(columns)), columns=columns)
+            ).reshape(n, len(data))
+            player_predictions = numpy.maximum.reduceat(
+                predictions[:, order], starts, axis=1
+            )
+            wins += numpy.bincount(
+                player_predictions.argmax(axis=1), minlength=len(players)
+            )
+            top_3 = numpy.argpartition(-player_predictions, 2, axis=1)[:, :3]
+            podiums += numpy.bincount(top_3.ravel(), minlength=len(players))
+            shares.append(player_predictions)
+    shares = numpy.concatenate(shares)
+    probability = wins / n_simulations
+    low, high = get_wilson_interval(wins, n_simulations)
+    quantiles = numpy.quantile(shares, [0.05, 0.5, 0.95], axis=0)
+    rows = data.iloc[order[starts]]
+    simulations = pandas.DataFrame(
+        {
+            "PLAYER": rows["PLAYER"].to_numpy(),
+            "TEAM": rows["TEAM"].to_numpy(),
+            "MVP_PROBABILITY": probability,
+            "MVP_PROBABILITY_LOW": low,
+            "MVP_PROBABILITY_HIGH": high,
+            "PODIUM_PROBABILITY": podiums / n_simulations,
+            "PRED_P05": quantiles[0],
+            "PRED_P50": quantiles[1],
+            "PRED_P95": quantiles[2],
+        },
+        index=rows.index,
+    )
+    simulations = simulations.sort_values(
+        by=["MVP_PROBABILITY", "PRED_P50"], ascending=False
+    )
+    logger.debug(
+        f"{n_simulations} seasons simulated, "
+        f"{(simulations.MVP_PROBABILITY > 0).sum()} players won at least once"
+    )
+    return simulations
+
+
+def simulate_features(
+    data: pandas.DataFrame,
+    standings: pandas.DataFrame,
+    num: list[str],
+    n_simulations: int,
+    rng: numpy.random.Generator,
+) -> numpy.ndarray:
+    """Simulate the numerical features of the players at the end of the season.
+
+    Remaining games of each team are won with its current winning percentage,
+    players play a share of them given by the games they played so far, and per
+    game stats move by a noise shrinking with the share of the season played.
+    Features computed from previous seasons do not change. Outcomes of teams and
+    players are simulated independently.
+
+    Args:
+        data (pandas.DataFrame): Silver data of the season
+        standings (pandas.DataFrame): Team standings of the season
+        num (list[str]): Numerical features
+        n_simulations (int): Number of simulated seasons
+        rng (numpy.random.Generator): Random generator
+
+    Returns:
+        numpy.ndarray: Raw features of shape (simulations, players, features)
+    """
+    sim_conf = conf.simulate
+    teams = simulate_standings(standings, n_simulations, rng)
+    team_index = pandas.Index(standings["TEAM"]).get_indexer(data["TEAM"])
+    known = team_index >= 0
+    team_played = (standings["W"] + standings["L"]).to_numpy(dtype="float64")
+    # Players of teams without standings (several teams in the season) keep team stats
+    played = numpy.where(known, team_played[team_index], team_played.max())
+    remaining = numpy.maximum(sim_conf.season_games - played, 0)
+    games = data["G"].to_numpy(dtype="float64")
+    games_share = numpy.clip(games / numpy.maximum(played, 1), 0.0, 1.0)
+    future_games = rng.binomial(
+        remaining.astype("int64"), games_share, size=(n_simulations, len(data))
+    )
+    final_games = games + future_games
+    # Weight of the noise of per game stats: standard deviation of the mean of the
+    # remaining games, shrunk by the share of them in the final games
+    noise_weight = (
+        numpy.sqrt(future_games * (1.0 + future_games / numpy.maximum(games, 1)))
+        / final_games
+    )
+    cumulative = set(sim_conf.cumulative_stats)
+    raw = numpy.empty((n_simulations, len(data), len(num)), dtype="float64")
+    lag_features = {feature.name for feature in lags.LAG_FEATURES}
+    for position, feature in enumerate(num):
+        values = data[feature].to_numpy(dtype="float64")
+        if feature in lag_features:
+            raw[:, :, position] = values
+        elif feature in TEAM_FEATURES:
+            raw[:, :, position] = numpy.where(
+                known, teams[feature][:, team_index], values
+            )
+        elif feature == "G":
+            raw[:, :, position] = final_games
+        elif feature == "GS":
+            starts_share = numpy.clip(values / numpy.maximum(games, 1), 0.0, 1.0)
+            raw[:, :, position] = values + rng.binomial(future_games, starts_share)
+        else:
+            per_game = (
+                values / numpy.maximum(games, 1) if feature in cumulative else values
+            )
+            cv = sim_conf.percentage_cv if "%" in feature else sim_conf.per_game_cv
+            noise = rng.standard_normal((n_simulations, len(data)))
+            simulated = per_game + cv * numpy.abs(per_game) * noise_weight * noise
+            if numpy.nanmin(values, initial=0.0) >= 0.0:
+                simulated = numpy.maximum(simulated, 0.0)
+            if feature in cumulative:
+                simulated = simulated * final_games
+            raw[:, :, position] = simulated
+    return raw
+
+
+def simulate_standings(
+    standings: pandas.DataFrame, n_simulations: int, rng: numpy.random.Generator
+) -> dict:
+    """Simulate the final standings of the teams.
+
+    Args:
+        standings (pandas.DataFrame): Team standings of the season
+        n_simulations (int): Number of simulated seasons
+        rng (numpy.random.Generator): Random generator
+
+    Returns:
+        dict: Team features (see TEAM_FEATURES) of shape (simulations, teams)
+    """
+    sim_conf = conf.simulate
+    wins = standings["W"].to_numpy(dtype="float64")
+    losses = standings["L"].to_numpy(dtype="float64")
+    played = wins + losses
+    remaining = numpy.maximum(sim_conf.season_games - played, 0)
+    win_share = numpy.clip(wins / numpy.maximum(played, 1), 0.0, 1.0)
+    future_wins = rng.binomial(
+        remaining.astype("int64"), win_share, size=(n_simulations, len(standings))
+    )
+    final_wins = wins + future_wins
+    final_losses = losses + remaining - future_wins
+    final_played = numpy.maximum(final_wins + final_losses, 1)
+    # Points per game move like any per game stat, with a noise of points_sd per game
+    points_weight = numpy.sqrt(remaining) / final_played
+    points_scored = standings["PS/G"].to_numpy(dtype="float64") + (
+        sim_conf.points_sd * points_weight * rng.standard_normal(final_wins.shape)
+    )
+    points_allowed = standings["PA/G"].to_numpy(dtype="float64") + (
+        sim_conf.points_sd * points_weight * rng.standard_normal(final_wins.shape)
+    )
+    pythagorean = points_scored**PYTHAGOREAN_EXPONENT / (
+        points_scored**PYTHAGOREAN_EXPONENT + points_allowed**PYTHAGOREAN_EXPONENT
+    )
+    pythagorean_wins = numpy.round(pythagorean * final_played)
+    win_percentage = final_wins / final_played
+    games_behind = numpy.empty_like(final_wins)
+    conference_rank = numpy.empty_like(final_wins)
+    for conference in standings["CONF"].unique():
+        teams = numpy.flatnonzero((standings["CONF"] == conference).to_numpy())
+        lead = final_wins[:, teams] - final_losses[:, teams]
+        games_behind[:, teams] = (lead.max(axis=1, keepdims=True) - lead) / 2
+        order = numpy.argsort(-win_percentage[:, teams], axis=1, kind="stable")
+        ranks = numpy.empty_like(order)
+        numpy.put_along_axis(ranks, order, numpy.arange(1, len(teams) + 1), axis=1)
+        conference_rank[:, teams] = ranks
+    return {
+        "W": final_wins,
+        "L": final_losses,
+        "W/L%": win_percentage,
+        "GB": games_behind,
+        "PW": pythagorean_wins,
+        "PL": final_played - pythagorean_wins,
+        "PS/G": points_scored,
+        "PA/G": points_allowed,
+        "CONF_RANK": conference_rank,
+    }
+
+
+def scale_features(raw: numpy.ndarray, min_max_scaling: bool) -> numpy.ndarray:
+    """Scale the features of each simulated season, like the feature store scales a season.
+
+    Args:
+        raw (numpy.ndarray): Raw features of shape (simulations, players, features)
+        min_max_scaling (bool): Min-max scaling instead of standardization
+
+    Returns:
+        numpy.ndarray: float32 scaled features, missing values set to 0 before scaling
+    """
+    raw = numpy.nan_to_num(raw, nan=0.0)
+    if min_max_scaling:
+        offset = raw.min(axis=1, keepdims=True)
+        scale = raw.max(axis=1, keepdims=True) - offset
+    else:
+        offset = raw.mean(axis=1, keepdims=True)
+        scale = raw.std(axis=1, keepdims=True)
+    scale = numpy.where(scale == 0.0, 1.0, scale)
+    return ((raw - offset) / scale).astype("float32")
+
+
+def get_wilson_interval(successes: numpy.ndarray, n: int, z: float = _Z_95):
+    """Compute the Wilson score interval of probabilities estimated from counts.
+
+    Args:
+        successes (numpy.ndarray): Number of successes
+        n (int): Number of trials
+        z (float, optional): Quantile of the normal distribution. Defaults to 95% confidence.
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: Lower and upper bounds
+    """
+    p = successes / n
+    center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half_width = z * numpy.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    return numpy.clip(center - half_width, 0, 1), numpy.clip(center + half_width, 0, 1)
@@ -0,0 +1,505 @@
+import os
+from os import path
+
+import numpy
+import pandas
+
+from nba_mvp_predictor import SEED, conf, logger, utils
+
+_TEAM_NAMES_PATH = path.join(path.dirname(__file__), "team_names.yaml")
+
+_POSITIONS = ["PG", "SG", "SF", "PF", "C"]
+_CONFERENCES = ["EASTERN_CONF", "WESTERN_CONF"]
+_SEASON_GAMES = 82
+_FIRST_NAMES = [
+    "Aaron", "Andre", "Ben", "Brandon", "Caleb", "Chris", "Damian", "Darius",
+    "Derrick", "Devin", "Dwight", "Eric", "Gary", "Isaiah", "Jalen", "Jamal",
+    "Jaylen", "Jordan", "Julius", "Karl", "Kevin", "Kyle", "Lamar", "Luka",
+    "Malik", "Marcus", "Michael", "Mike", "Nikola", "Paul", "Reggie", "Robert",
+    "Scottie", "Shawn", "Terry", "Tim", "Tony", "Trae", "Tyrese", "Zach",
+]  # fmt: skip
+_LAST_NAMES = [
+    "Adams", "Allen", "Anderson", "Baker", "Bell", "Brooks", "Brown", "Carter",
+    "Clark", "Collins", "Davis", "Evans", "Green", "Hall", "Harris", "Hill",
+    "Jackson", "Johnson", "Jones", "King", "Lewis", "Martin", "Miller", "Moore",
+    "Morris", "Nelson", "Parker", "Reed", "Robinson", "Scott", "Smith", "Taylor",
+    "Thomas", "Thompson", "Turner", "Walker", "Ward", "White", "Williams", "Young",
+]  # fmt: skip
+# Share of players traded during a season, and team of their season total row
+_TRADED_SHARE = 0.05
+_TOTAL_TEAM = "TOT"
+# Season totals of the advanced table, split between the teams of traded players
+_SEASON_TOTALS = ["OWS_advanced", "DWS_advanced", "WS_advanced", "VORP_advanced"]
+# Counting stats of the per game, per 36 minutes and per 100 possessions tables
+_COUNTING_STATS = [
+    "FG", "FGA", "3P", "3PA", "2P", "2PA", "FT", "FTA",
+    "ORB", "DRB", "TRB", "AST", "STL", "BLK", "TOV", "PF", "PTS",
+]  # fmt: skip
+
+
+def generate_data(
+    n_seasons: int | None = None,
+    n_teams: int | None = None,
+    players_per_team: int | None = None,
+    n_leagues: int | None = None,
+    scale: int = 1,
+    seed: int = SEED,
+    directory: str | None = None,
+    overwrite: bool = False,
+):
+    """Generate a synthetic league history and write it in place of the downloaded data.
+
+    Files have the schemas and keys of the downloaded player stats, MVP votes and team
+    standings, so every stage from make_bronze_data onwards runs on them. Data size
+    grows linearly with scale, which multiplies the number of leagues.
+
+    Args:
+        n_seasons (int, optional): Number of seasons, ending with the current one. Defaults to the configured value.
+        n_teams (int, optional): Number of teams of each league. Defaults to the configured value.
+        players_per_team (int, optional): Roster size. Defaults to the configured value.
+        n_leagues (int, optional): Number of leagues at scale 1. Defaults to the configured value.
+        scale (int, optional): Data size factor. Defaults to 1.
+        seed (int, optional): Seed of the random generator. Defaults to SEED.
+        directory (str, optional): Directory in which data paths are resolved. Defaults to the working directory.
+        overwrite (bool, optional): Replace existing data files. Defaults to False.
+    """
+    synthetic_conf = conf.synthetic
+    player_stats, mvp_votes, team_standings = generate_league(
+        n_seasons=n_seasons or synthetic_conf.n_seasons,
+        n_teams=n_teams or synthetic_conf.n_teams,
+        players_per_team=players_per_team or synthetic_conf.players_per_team,
+        n_leagues=(n_leagues or synthetic_conf.n_leagues) * scale,
+        current_season_share=synthetic_conf.current_season_share,
+        seed=seed,
+    )
+    outputs = [
+        (player_stats, conf.data.player_stats),
+        (mvp_votes, conf.data.mvp_votes),
+        (team_standings, conf.data.team_standings),
+    ]
+    paths = [path.join(directory or "", file_conf.path) for _, file_conf in outputs]
+    existing = [file_path for file_path in paths if path.exists(file_path)]
+    if len(existing) > 0 and not overwrite:
+        raise FileExistsError(
+            f"Data files already exist, not overwriting them : {', '.join(existing)}"
+        )
+    for (data, file_conf), file_path in zip(outputs, paths):
+        os.makedirs(path.dirname(file_path) or ".", exist_ok=True)
+        data.to_csv(
+            file_path,
+            sep=file_conf.sep,
+            encoding=file_conf.encoding,
+            compression=file_conf.compression,
+            index=True,
+        )
+    logger.info(
+        f"Synthetic data : {len(player_stats)} player seasons"
+        f" - {len(mvp_votes)} MVP votes - {len(team_standings)} team seasons"
+    )
+
+
+def generate_league(
+    n_seasons: int = 50,
+    n_teams: int = 30,
+    players_per_team: int = 15,
+    n_leagues: int = 1,
+    last_season: int | None = None,
+    current_season_share: float = 0.5,
+    seed: int = SEED,
+):
+    """Simulate the history of independent leagues.
+
+    Players have a latent talent, size and shooting skill that drive correlated box
+    score and advanced stats. Talent rises then declines with age, players retire and
+    are replaced by rookies, and some change teams each season. Team records follow
+    the box plus-minus of their players, and MVP votes go to the best players of the
+    best teams. The last season is in progress: it has no MVP votes.
+
+    Args:
+        n_seasons (int, optional): Number of seasons. Defaults to 50.
+        n_teams (int, optional): Number of teams of each league. Defaults to 30.
+        players_per_team (int, optional): Roster size. Defaults to 15.
+        n_leagues (int, optional): Number of leagues, each with its own teams and MVP. Defaults to 1.
+        last_season (int, optional): Last season. Defaults to the current season.
+        current_season_share (float, optional): Share of the last season already played. Defaults to 0.5.
+        seed (int, optional): Seed of the random generator. Defaults to SEED.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame, pandas.DataFrame]: Player stats, MVP votes and team standings
+    """
+    if last_season is None:
+        last_season = utils.get_current_season()
+    rng = numpy.random.default_rng(seed)
+    teams = _get_team_codes(n_teams, n_leagues)
+    slot_team = numpy.repeat(numpy.arange(len(teams)), players_per_team)
+    players = _draw_players(len(slot_team), rng, first_id=0)
+    players["AGE"] = rng.integers(19, 35, len(slot_team))
+    players["TALENT"] = rng.normal(0, 1, len(slot_team))
+    next_id = len(slot_team)
+    all_stats, all_votes, all_standings = [], [], []
+    for season in range(last_season - n_seasons + 1, last_season + 1):
+        share = current_season_share if season == last_season else 1.0
+        games = max(1, round(_SEASON_GAMES * share))
+        stats = _get_player_stats(players, slot_team, season, games, rng)
+        standings = _get_team_standings(stats, slot_team, n_teams, games, rng)
+        stats["TEAM"] = teams[slot_team]
+        standings["TEAM"] = teams[standings.pop("TEAM_INDEX")]
+        stats["SEASON"] = season
+        standings["SEASON"] = season
+        if season < last_season:
+            win_share = standings["W/L%"].to_numpy()[slot_team]
+            all_votes.append(
+                _get_mvp_votes(stats, win_share, slot_team // n_teams, rng)
+            )
+        all_stats.append(_add_trades(stats, slot_team, teams, n_teams, rng))
+        all_standings.append(standings)
+        next_id = _age_players(players, slot_team // n_teams, next_id, rng)
+
+    player_stats = pandas.concat(all_stats, ignore_index=True)
+    player_stats.index = _get_player_season_team(player_stats)
+    player_stats.index.name = "player_season_team"
+    mvp_votes = pandas.concat(all_votes, ignore_index=True)
+    mvp_votes.index = _get_player_season_team(mvp_votes)
+    mvp_votes.index.name = "player_season_team"
+    team_standings = pandas.concat(all_standings, ignore_index=True)
+    team_standings.index = (
+        team_standings["TEAM"] + "_" + team_standings["SEASON"].astype(str)
+    )
+    team_standings.index.name = "TEAM_SEASON"
+    return player_stats, mvp_votes, team_standings
+
+
+def _get_team_codes(n_teams: int, n_leagues: int) -> numpy.ndarray:
+    known = list(dict.fromkeys(utils.get_dict_from_yaml(_TEAM_NAMES_PATH).values()))
+    codes = known[:n_teams] + [f"T{i}" for i in range(len(known), n_teams)]
+    # Teams of other leagues are numbered: ATL1, ATL2...
+    return numpy.array(
+        [
+            code + (str(league) if league > 0 else "")
+            for league in range(n_leagues)
+            for code in codes
+        ]
+    )
+
+
+def _draw_players(n: int, rng: numpy.random.Generator, first_id: int) -> dict:
+    return {
+        "ID": numpy.arange(first_id, first_id + n),
+        "AGE": rng.integers(19, 23, n),
+        "TALENT": rng.normal(-0.6, 0.8, n),
+        "SIZE": rng.uniform(0, 1, n),
+        "SHOOTING": rng.normal(0, 1, n),
+        "HEALTH": rng.beta(8, 1.5, n),
+    }
+
+
+def _age_players(
+    players: dict,
+    slot_league: numpy.ndarray,
+    next_id: int,
+    rng: numpy.random.Generator,
+) -> int:
+    n = len(slot_league)
+    age = players["AGE"] + 1
+    growth = numpy.select([age < 25, age < 30, age < 33], [0.25, 0.05, -0.15], -0.3)
+    players["AGE"] = age
+    players["TALENT"] = players["TALENT"] + growth + rng.normal(0, 0.25, n)
+    players["HEALTH"] = numpy.clip(players["HEALTH"] + rng.normal(0, 0.05, n), 0.3, 1)
+    retiring = rng.random(n) < _expit(age - 35 - players["TALENT"])
+    rookies = _draw_players(int(retiring.sum()), rng, first_id=next_id)
+    for attribute, values in rookies.items():
+        players[attribute][retiring] = values
+    # Players changing team swap their roster slots, within the same league
+    moving = numpy.flatnonzero(rng.random(n) < 0.15)
+    destination = moving[numpy.argsort(slot_league[moving], kind="stable")]
+    origin = moving[numpy.lexsort((rng.random(len(moving)), slot_league[moving]))]
+    for attribute in players:
+        players[attribute][destination] = players[attribute][origin]
+    return next_id + len(rookies["ID"])
+
+
+def _get_player_stats(
+    players: dict,
+    slot_team: numpy.ndarray,
+    season: int,
+    games: int,
+    rng: numpy.random.Generator,
+) -> pandas.DataFrame:
+    n = len(slot_team)
+    talent, size = players["TALENT"], players["SIZE"]
+    shooting = players["SHOOTING"]
+
+    def noise(scale):
+        return rng.normal(0, scale, n)
+
+    g = numpy.maximum(1, rng.binomial(games, players["HEALTH"]))
+    mp = numpy.clip(8 + 28 * _expit(1.3 * talent + noise(0.5)), 4, 40)
+    gs = numpy.rint(g * _expit((mp - 26) / 3)).astype(int)
+    usage = numpy.clip(0.19 + 0.045 * talent + noise(0.025), 0.1, 0.38)
+    # Three point attempts grow from 1980 to 2020
+    era = numpy.clip((season - 1980) / 40, 0, 1)
+    three_rate = numpy.clip(
+        era * (0.45 - 0.35 * size + 0.05 * shooting + noise(0.03)), 0, 0.8
+    )
+    three_pct = numpy.where(
+        three_rate > 0, numpy.clip(0.35 + 0.03 * shooting + noise(0.03), 0.15, 0.5), 0
+    )
+    two_pct = numpy.clip(0.48 + 0.04 * size + 0.02 * talent + noise(0.03), 0.3, 0.7)
+    free_throw_rate = numpy.clip(
+        0.22 + 0.12 * size + 0.04 * talent + noise(0.05), 0.05, 0.7
+    )
+    ft_pct = numpy.clip(0.77 - 0.12 * size + 0.04 * shooting + noise(0.04), 0.4, 0.95)
+    # Per 36 minutes
+    per_36 = {"FGA": 72 * usage}
+    per_36["3PA"] = per_36["FGA"] * three_rate
+    per_36["2PA"] = per_36["FGA"] - per_36["3PA"]
+    per_36["FTA"] = per_36["FGA"] * free_throw_rate
+    per_36["3P"] = per_36["3PA"] * three_pct
+    per_36["2P"] = per_36["2PA"] * two_pct
+    per_36["FT"] = per_36["FTA"] * ft_pct
+    per_36["FG"] = per_36["3P"] + per_36["2P"]
+    per_36["PTS"] = 2 * per_36["2P"] + 3 * per_36["3P"] + per_36["FT"]
+    per_36["TRB"] = numpy.clip(3.5 + 8 * size + 0.6 * talent + noise(1), 1, 20)
+    per_36["ORB"] = per_36["TRB"] * numpy.clip(
+        0.15 + 0.15 * size + noise(0.03), 0.05, 0.45
+    )
+    per_36["DRB"] = per_36["TRB"] - per_36["ORB"]
+    per_36["AST"] = numpy.clip(
+        1 + 6 * (1 - size) ** 2 + 0.8 * talent + noise(0.8), 0.3, 13
+    )
+    per_36["STL"] = numpy.clip(
+        0.8 + 0.6 * (1 - size) + 0.15 * talent + noise(0.2), 0.2, 3
+    )
+    per_36["BLK"] = numpy.clip(0.2 + 1.8 * size**2 + 0.15 * talent + noise(0.2), 0, 4.5)
+    per_36["TOV"] = numpy.clip(
+        0.9 + 4 * usage + 0.15 * per_36["AST"] + noise(0.3), 0.3, 6
+    )
+    per_36["PF"] = numpy.clip(2.2 + 2 * size - 0.2 * talent + noise(0.4), 0.8, 6)
+    pace = rng.normal(99, 3, slot_team.max() + 1)[slot_team]
+
+    # Advanced stats
+    minutes = mp * g
+    efficiency = (
+        per_36["PTS"] + per_36["TRB"] + per_36["AST"] + per_36["STL"] + per_36["BLK"]
+        - (per_36["FGA"] - per_36["FG"]) - (per_36["FTA"] - per_36["FT"]) - per_36["TOV"]
+    )  # fmt: skip
+    per = 15 * efficiency / numpy.average(efficiency, weights=minutes)
+    bpm = (per - 15) / 2.2 + noise(1.2)
+    obpm = 0.65 * bpm + noise(0.8)
+    dbpm = bpm - obpm
+    ows = numpy.maximum((obpm + 2.5) * minutes / 3000, -1)
+    dws = numpy.maximum((dbpm + 2.5) * minutes / 4500, -0.5)
+    shots = per_36["FGA"] + 0.44 * per_36["FTA"]
+    advanced = {
+        "PER": per,
+        "TS%": per_36["PTS"] / (2 * shots),
+        "3PAR": three_rate,
+        "FTR": free_throw_rate,
+        "ORB%": 3.2 * per_36["ORB"],
+        "DRB%": 2.5 * per_36["DRB"],
+        "TRB%": 2.7 * per_36["TRB"],
+        "AST%": 4.3 * per_36["AST"],
+        "STL%": 1.35 * per_36["STL"],
+        "BLK%": 1.6 * per_36["BLK"],
+        "TOV%": 100 * per_36["TOV"] / (shots + per_36["TOV"]),
+        "USG%": 100 * usage,
+        "OWS": ows,
+        "DWS": dws,
+        "WS": ows + dws,
+        "WS/48": 48 * (ows + dws) / minutes,
+        "OBPM": obpm,
+        "DBPM": dbpm,
+        "BPM": bpm,
+        "VORP": (bpm + 2) * minutes / (48 * _SEASON_GAMES),
+    }
+
+    columns = {
+        "PLAYER": _get_player_names(players["ID"]),
+        "AGE": players["AGE"],
+        "POS": numpy.array(_POSITIONS)[numpy.minimum((size * 5).astype(int), 4)],
+        "G": g,
+        "GS": gs,
+        "MP": mp.round(1),
+        "FG%": (per_36["FG"] / per_36["FGA"]).round(3),
+        "3P%": three_pct.round(3),
+        "2P%": two_pct.round(3),
+        "EFG%_per_game": ((per_36["FG"] + 0.5 * per_36["3P"]) / per_36["FGA"]).round(3),
+        "FT%": ft_pct.round(3),
+    }
+    for stat in _COUNTING_STATS:
+        columns[f"{stat}_per_game"] = (per_36[stat] * mp / 36).round(1)
+    for stat in _COUNTING_STATS:
+        columns[f"{stat}_per_36min"] = per_36[stat].round(1)
+    for stat in _COUNTING_STATS:
+        columns[f"{stat}_per_100poss"] = (per_36[stat] * 48 / 36 * 100 / pace).round(1)
+    columns["ORTG_per_100poss"] = numpy.rint(108 + 2.5 * obpm + noise(3))
+    columns["DRTG_per_100poss"] = numpy.rint(110 - 1.5 * dbpm + noise(2))
+    for stat, values in advanced.items():
+        decimals = 3 if stat in ["TS%", "3PAR", "FTR", "WS/48"] else 1
+        columns[f"{stat}_advanced"] = values.round(decimals)
+    return pandas.DataFrame(columns)
+
+
+def _add_trades(
+    stats: pandas.DataFrame,
+    slot_team: numpy.ndarray,
+    teams: numpy.ndarray,
+    n_teams: int,
+    rng: numpy.random.Generator,
+) -> pandas.DataFrame:
+    # Traded players start the season with another team of their league, and end
+    # it with their own. Like on Basketball Reference, their season total row
+    # (TOT) comes before one row per team.
+    games = stats["G"].to_numpy()
+    traded = numpy.flatnonzero((rng.random(len(stats)) < _TRADED_SHARE) & (games > 1))
+    totals = stats.iloc[traded].copy()
+    other_team = (slot_team[traded] // n_teams) * n_teams + (
+        slot_team[traded] % n_teams + rng.integers(1, n_teams, len(traded))
+    ) % n_teams
+    first_games = rng.integers(1, games[traded])
+    stints = []
+    for team, stint_games in [
+        (teams[other_team], first_games),
+        (totals["TEAM"].to_numpy(), games[traded] - first_games),
+    ]:
+        share = stint_games / games[traded]
+        stint = totals.copy()
+        stint["TEAM"] = team
+        stint["G"] = stint_games
+        stint["GS"] = numpy.rint(totals["GS"].to_numpy() * share).astype(int)
+        for stat in _SEASON_TOTALS:
+            stint[stat] = (totals[stat] * share).round(1)
+        stint["PER_advanced"] = (
+            totals["PER_advanced"] + rng.normal(0, 3, len(traded))
+        ).round(1)
+        stints.append(stint)
+    totals["TEAM"] = _TOTAL_TEAM
+    totals["PER_advanced"] = (
+        sum(stint["PER_advanced"] * stint["G"] for stint in stints) / totals["G"]
+    ).round(1)
+    rows = pandas.concat([stats.drop(stats.index[traded]), totals] + stints)
+    # Rows of a traded player follow each other, in place of their single row
+    order = numpy.concatenate(
+        [
+            numpy.delete(numpy.arange(len(stats)), traded) * 3,
+            traded * 3,
+            traded * 3 + 1,
+            traded * 3 + 2,
+        ]
+    )
+    return rows.iloc[numpy.argsort(order, kind="stable")]
+
+
+def _get_team_standings(
+    stats: pandas.DataFrame,
+    slot_team: numpy.ndarray,
+    n_teams: int,
+    games: int,
+    rng: numpy.random.Generator,
+) -> pandas.DataFrame:
+    n = slot_team.max() + 1
+    team = numpy.arange(n)
+    league = team // n_teams
+    # Point margin of a team is the playing time weighted plus-minus of its players
+    minutes = stats["MP"].to_numpy() * stats["G"].to_numpy()
+    margin = 5 * (
+        numpy.bincount(slot_team, weights=stats["BPM_advanced"].to_numpy() * minutes)
+        / numpy.bincount(slot_team, weights=minutes)
+    )
+    margin = margin - (numpy.bincount(league, weights=margin) / n_teams)[league]
+    margin = margin + rng.normal(0, 2, n)
+    wins = numpy.rint(
+        games * numpy.clip(0.5 + 0.032 * margin + rng.normal(0, 0.03, n), 0.05, 0.95)
+    ).astype(int)
+    points_scored = rng.normal(105, 5, n) + margin / 2
+    points_allowed = points_scored - margin
+    pythagorean = points_scored**14 / (points_scored**14 + points_allowed**14)
+    standings = pandas.DataFrame(
+        {
+            "TEAM_INDEX": team,
+            "W": wins,
+            "L": games - wins,
+            "W/L%": (wins / games).round(3),
+            "PW": numpy.rint(games * pythagorean).astype(int),
+            "PS/G": points_scored.round(1),
+            "PA/G": points_allowed.round(1),
+            "CONF": numpy.array(_CONFERENCES)[(team % n_teams) * 2 // n_teams],
+            "LEAGUE": league,
+        }
+    )
+    standings["PL"] = games - standings["PW"]
+    standings = standings.sort_values(
+        ["LEAGUE", "CONF", "W/L%"], ascending=[True, True, False], kind="stable"
+    )
+    conference = standings.groupby(["LEAGUE", "CONF"], sort=False)
+    standings["CONF_RANK"] = conference.cumcount() + 1
+    standings["GB"] = (
+        (conference["W"].transform("first") - standings["W"])
+        + (standings["L"] - conference["L"].transform("first"))
+    ) / 2
+    standings = standings.sort_values("TEAM_INDEX")
+    return standings[
+        ["TEAM_INDEX", "W", "L", "W/L%", "GB", "PW", "PL", "PS/G", "PA/G"]
+        + ["CONF_RANK", "CONF"]
+    ].reset_index(drop=True)
+
+
+def _get_mvp_votes(
+    stats: pandas.DataFrame,
+    win_share: numpy.ndarray,
+    slot_league: numpy.ndarray,
+    rng: numpy.random.Generator,
+) -> pandas.DataFrame:
+    n_leagues = slot_league.max() + 1
+    # Voters look at the value of players and at the record of their team
+    value = (
+        stats["VORP_advanced"].to_numpy()
+        + 12 * (win_share - 0.5)
+        + rng.normal(0, 0.7, len(stats))
+    )
+    order = numpy.lexsort((-value, slot_league))
+    starts = numpy.searchsorted(slot_league[order], numpy.arange(n_leagues))
+    rank = numpy.arange(len(order)) - starts[slot_league[order]]
+    n_candidates = rng.integers(10, 17, n_leagues)
+    voted = rank < n_candidates[slot_league[order]]
+    rows, rank = order[voted], rank[voted]
+    # Each candidate gets a share of the share of the previous one
+    decay = rng.uniform(0.35, 0.85, len(rows))
+    decay[rank == 0] = rng.uniform(0.55, 1.0, int((rank == 0).sum()))
+    group_start = numpy.flatnonzero(rank == 0)
+    log_share = numpy.cumsum(numpy.log(decay))
+    log_share -= numpy.repeat(
+        log_share[group_start] - numpy.log(decay[group_start]),
+        numpy.diff(numpy.append(group_start, len(rows))),
+    )
+    votes = stats.iloc[rows][["PLAYER", "TEAM", "SEASON"]].reset_index(drop=True)
+    votes["MVP_VOTES_SHARE"] = numpy.maximum(numpy.exp(log_share), 0.001).round(3)
+    votes["MVP_WINNER"] = rank == 0
+    votes["MVP_PODIUM"] = rank < 3
+    votes["MVP_CANDIDATE"] = True
+    return votes
+
+
+def _get_player_names(ids: numpy.ndarray) -> numpy.ndarray:
+    n_first, n_last = len(_FIRST_NAMES), len(_LAST_NAMES)
+    first = numpy.array(_FIRST_NAMES)[ids % n_first]
+    last = numpy.array(_LAST_NAMES)[(ids // n_first) % n_last]
+    homonym = ids // (n_first * n_last)
+    # Names are unique: homonyms are numbered
+    suffix = numpy.where(homonym > 0, numpy.char.add(" ", homonym.astype(str)), "")
+    return numpy.char.add(numpy.char.add(numpy.char.add(first, " "), last), suffix)
+
+
+def _get_player_season_team(data: pandas.DataFrame) -> pandas.Index:
+    # Spaces of names are removed from keys, like the scrapper does
+    return pandas.Index(
+        data["PLAYER"].str.replace(" ", "")
+        + "_"
+        + data["SEASON"].astype(str)
+        + "_"
+        + data["TEAM"]
+    )
+
+
+def _expit(x):
+    return 1 / (1 + numpy.exp(-x))
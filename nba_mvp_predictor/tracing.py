@@ -0,0 +1,241 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from nba_mvp_predictor import memory
+
+# Tracing is enabled by giving the path of the JSON lines trace to append spans to,
+# and optionally of a Prometheus textfile summarizing them
+TRACE_PATH = os.environ.get("TRACE_PATH")
+PROMETHEUS_PATH = os.environ.get("TRACE_PROMETHEUS_PATH")
+_METRIC_PREFIX = "nba_mvp_predictor_span"
+# Spans also carry the memory profile of their section when MEMORY_PROFILE is set
+_ENABLED = TRACE_PATH is not None or memory.is_enabled()
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+_lock = threading.Lock()
+# Count, total seconds, errors and last attributes of the spans of each name
+_totals = {}
+
+
+class Span:
+    """Timed section of the pipeline, nested in the span open when it starts.
+
+    Attributes set on the span (row counts, bytes...) are written to the trace with
+    its wall and CPU durations when it ends.
+    """
+
+    __slots__ = [
+        "name",
+        "attributes",
+        "span_id",
+        "parent_id",
+        "_start",
+        "_cpu",
+        "_token",
+        "_memory",
+        "_result",
+    ]
+
+    def __init__(self, name: str, attributes: dict):
+        """
+        Args:
+            name (str): Name of the span, e.g. "train.cv"
+            attributes (dict): Attributes known when the span starts
+        """
+        self.name = name
+        self.attributes = attributes
+        self._memory = None
+        self._result = None
+
+    def set(self, **attributes):
+        """Add attributes to the span.
+
+        Returns:
+            Span: The span
+        """
+        self.attributes.update(attributes)
+        return self
+
+    def set_frame(self, data, prefix: str = ""):
+        """Add the number of rows and the memory size of a data frame to the span.
+
+        Args:
+            data (pandas.DataFrame): Data frame
+            prefix (str, optional): Prefix of the attribute names. Defaults to "".
+
+        Returns:
+            Span: The span
+        """
+        self.attributes[f"{prefix}rows"] = len(data)
+        self.attributes[f"{prefix}bytes"] = int(data.memory_usage(index=True).sum())
+        return self
+
+    def set_file(self, path: str, prefix: str = "file_"):
+        """Add the size of a file to the span.
+
+        Args:
+            path (str): Path of the file
+            prefix (str, optional): Prefix of the attribute name. Defaults to "file_".
+
+        Returns:
+            Span: The span
+        """
+        self.attributes[f"{prefix}bytes"] = os.path.getsize(path)
+        return self
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = f"{os.getpid()}-{next(_span_ids)}"
+        self._token = _current_span.set(self)
+        if memory.is_enabled():
+            self._memory = memory.start(self.name, is_stage=self.parent_id is None)
+        self._start = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self._start
+        cpu_seconds = time.process_time() - self._cpu
+        _current_span.reset(self._token)
+        if self._memory is not None:
+            self.attributes.update(memory.stop(self._memory, self._result))
+            self._result = None
+        record = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "pid": os.getpid(),
+            "end": datetime.now().isoformat(timespec="milliseconds"),
+            "seconds": seconds,
+            "cpu_seconds": cpu_seconds,
+            "status": "ok" if exc_type is None else "error",
+            **self.attributes,
+        }
+        if exc_type is not None:
+            record["error"] = repr(exc_value)
+        _record(record)
+        return False
+
+
+class _DisabledSpan:
+    """Span doing nothing, returned when tracing is disabled."""
+
+    __slots__ = []
+
+    def set(self, **attributes):
+        return self
+
+    def set_frame(self, data, prefix: str = ""):
+        return self
+
+    def set_file(self, path: str, prefix: str = "file_"):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+
+def span(name: str, **attributes):
+    """Open a span, to use as a context manager.
+
+    Args:
+        name (str): Name of the span, e.g. "train.cv"
+        **attributes: Attributes known when the span starts
+
+    Returns:
+        Span: Span, that does nothing when tracing is disabled
+    """
+    if not _ENABLED:
+        return _DISABLED_SPAN
+    return Span(name, attributes)
+
+
+def traced(name: str):
+    """Decorate a function so that each call is a span.
+
+    Args:
+        name (str): Name of the span
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with Span(name, {}) as span:
+                # Kept so that the memory profile does not report it as kept alive
+                span._result = func(*args, **kwargs)
+                return span._result
+
+        return wrapper
+
+    return decorator
+
+
+def _record(record: dict):
+    with _lock:
+        if TRACE_PATH is not None:
+            # Appended in one write: processes of a pool can share the trace
+            with open(TRACE_PATH, "a", encoding="utf-8") as trace_file:
+                trace_file.write(json.dumps(record, default=str) + "\n")
+        count, seconds, errors, _ = _totals.get(record["name"], (0, 0.0, 0, {}))
+        _totals[record["name"]] = (
+            count + 1,
+            seconds + record["seconds"],
+            errors + (record["status"] == "error"),
+            {k: v for k, v in record.items() if k.endswith(("rows", "bytes"))},
+        )
+        if PROMETHEUS_PATH is not None and record["parent_id"] is None:
+            _write_prometheus_textfile(PROMETHEUS_PATH)
+
+
+def _write_prometheus_textfile(path: str):
+    import multiprocessing
+
+    if multiprocessing.parent_process() is not None:
+        # Only the main process writes the summary, workers would overwrite it
+        return
+    metrics = {
+        "seconds": ("Wall time spent in spans of this run", {}),
+        "count": ("Number of spans of this run", {}),
+        "errors": ("Number of spans of this run that raised an error", {}),
+    }
+    sizes = {}
+    for name, (count, seconds, errors, attributes) in sorted(_totals.items()):
+        metrics["seconds"][1][name] = seconds
+        metrics["count"][1][name] = count
+        metrics["errors"][1][name] = errors
+        for attribute, value in attributes.items():
+            sizes.setdefault(attribute, {})[name] = value
+    for attribute, values in sorted(sizes.items()):
+        metrics[attribute] = (f"{attribute} of the last span", values)
+    lines = []
+    for metric, (description, values) in metrics.items():
+        lines.append(f"# HELP {_METRIC_PREFIX}_{metric} {description}")
+        lines.append(f"# TYPE {_METRIC_PREFIX}_{metric} gauge")
+        for name, value in values.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{_METRIC_PREFIX}_{metric}{{span="{label}"}} {value}')
+    # Written to a temporary file then renamed, so that collectors never read a partial file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as textfile:
+        textfile.write("\n".join(lines) + "\n")
+    os.replace(temporary_path, path)
@@ -1,12 +1,26 @@
 import json
-from datetime import datetime
+import os
 
 import joblib
 import numpy
 import pandas
 from sklearn import base, metrics, model_selection
 
-from nba_mvp_predictor import analyze, conf, load, logger, model, preprocess
+from nba_mvp_predictor import (
+    analyze,
+    conf,
+    dimensions,
+    feature_store,
+    lags,
+    load,
+    logger,
+    mlp,
+    model,
+    parallel,
+    preprocess,
+    tracing,
+    utils,
+)
 
 _MIN_TARGET_CORRELATION = 0.05
 _MAX_FEATURES_CORRELATION = 0.95
@@ -28,92 +42,141 @@ def make_bronze_data():
             conf.data.bronze.path,
         )
         return
-
-    player_stats = load.load_player_stats()
-    mvp_votes = load.load_mvp_votes()
-    team_standings = load.load_team_standings()
-    if mvp_votes.duplicated(subset=["PLAYER", "TEAM", "SEASON"]).sum() > 0:
+    build_bronze_data()
+
+
+@tracing.traced("bronze")
+def build_bronze_data():
+    """Build bronze training data from raw downloaded data and write it."""
+    with tracing.span("bronze.read") as span:
+        player_stats = load.load_player_stats()
+        mvp_votes = load.load_mvp_votes()
+        team_standings = load.load_team_standings()
+        span.set_frame(player_stats)
+        span.set_file(conf.data.player_stats.path)
+    with tracing.span("bronze.dimensions"):
+        players, teams = dimensions.update_dimensions(
+            [player_stats, mvp_votes, team_standings]
+        )
+    with tracing.span("bronze.merge") as span:
+        bronze = merge_raw_data(player_stats, mvp_votes, team_standings, players, teams)
+        span.set_frame(bronze)
+    # Add features from previous seasons of each player (PREVIOUS_SEASON_MVP_WINNER...)
+    with tracing.span("bronze.lags") as span:
+        lag_sources = lags.get_lag_sources(
+            bronze, lags.LAG_FEATURES, player_column="PLAYER_ID"
+        )
+        bronze = bronze.join(
+            lags.compute_lag_features_from_sources(
+                lag_sources, lags.LAG_FEATURES, player_column="PLAYER_ID"
+            ),
+            on=["PLAYER_ID", "SEASON"],
+        )
+        # Kept so that a season can be refreshed without reading the whole history
+        lag_sources.to_csv(
+            conf.data.lag_sources.path,
+            sep=conf.data.lag_sources.sep,
+            encoding=conf.data.lag_sources.encoding,
+            index=True,
+        )
+        span.set_frame(lag_sources).set_file(conf.data.lag_sources.path)
+    bronze = dimensions.add_names(bronze, players, teams)
+    logger.info(
+        f'MVPs found in data : {bronze[bronze["MVP_WINNER"] == True]["SEASON"].nunique()}'
+    )
+    with tracing.span("bronze.write") as span:
+        bronze.to_csv(
+            conf.data.bronze.path,
+            sep=conf.data.bronze.sep,
+            encoding=conf.data.bronze.encoding,
+            compression=conf.data.bronze.compression,
+            index=True,
+        )
+        span.set_frame(bronze).set_file(conf.data.bronze.path)
+
+
+def merge_raw_data(
+    player_stats: pandas.DataFrame,
+    mvp_votes: pandas.DataFrame,
+    team_standings: pandas.DataFrame,
+    players: pandas.DataFrame,
+    teams: pandas.DataFrame,
+) -> pandas.DataFrame:
+    """Join MVP votes and team standings to player stats.
+
+    Args:
+        player_stats (pandas.DataFrame): Raw player stats
+        mvp_votes (pandas.DataFrame): Raw MVP votes
+        team_standings (pandas.DataFrame): Raw team standings
+        players (pandas.DataFrame): Player dimension
+        teams (pandas.DataFrame): Team dimension
+
+    Returns:
+        pandas.DataFrame: One row per player, season and team, keyed on integers
+    """
+    # Join on compact integer keys, readable names are joined back before writing
+    player_stats = dimensions.add_keys(player_stats, players, teams)
+    mvp_votes = dimensions.add_keys(mvp_votes, players, teams)
+    team_standings = dimensions.add_keys(team_standings, teams=teams)
+    if mvp_votes.duplicated(subset=["PLAYER_ID", "TEAM_ID", "SEASON"]).sum() > 0:
         logger.warning("Duplicated rows in MVP votes!")
-    bronze = (
+    data = (
         player_stats.reset_index(drop=False)
-        .merge(mvp_votes, how="left", on=["PLAYER", "TEAM", "SEASON"])
+        .merge(mvp_votes, how="left", on=["PLAYER_ID", "TEAM_ID", "SEASON"])
         .set_index(player_stats.index.name)
     )
-    if team_standings.duplicated(subset=["TEAM", "SEASON"]).sum() > 0:
+    if team_standings.duplicated(subset=["TEAM_ID", "SEASON"]).sum() > 0:
         logger.warning("Duplicated rows in team standings!")
-    bronze = (
-        bronze.reset_index(drop=False)
-        .merge(team_standings, how="inner", on=["TEAM", "SEASON"])
-        .set_index(bronze.index.name)
+    data = (
+        data.reset_index(drop=False)
+        .merge(team_standings, how="inner", on=["TEAM_ID", "SEASON"])
+        .set_index(data.index.name)
     )
-    # Add a feature: PREVIOUS_SEASON_MVP_WINNER
-    previous_season_winners = bronze[bronze["MVP_WINNER"] == True][
-        ["PLAYER", "TEAM", "SEASON"]
-    ]
-    previous_season_winners["SEASON"] = previous_season_winners["SEASON"] + 1
-    previous_season_winners["PREVIOUS_SEASON_MVP_WINNER"] = True
-    # Add a feature: PREVIOUS_SEASON_MVP_PODIUM_NOT_WINNER
-    previous_season_podium_not_winners = bronze[
-        (bronze["MVP_WINNER"] == False) & (bronze["MVP_PODIUM"] == True)
-    ][["PLAYER", "TEAM", "SEASON"]]
-    previous_season_podium_not_winners["SEASON"] = (
-        previous_season_podium_not_winners["SEASON"] + 1
-    )
-    previous_season_podium_not_winners["PREVIOUS_SEASON_MVP_PODIUM_NOT_WINNER"] = True
-    # Merge these two features
-    bronze = (
-        bronze.reset_index(drop=False)
-        .merge(
-            previous_season_podium_not_winners,
-            how="left",
-            on=["PLAYER", "TEAM", "SEASON"],
-        )
-        .set_index(bronze.index.name)
-        .reset_index(drop=False)
-        .merge(previous_season_winners, how="left", on=["PLAYER", "TEAM", "SEASON"])
-        .set_index(bronze.index.name)
-    )
-
-    for col in [
-        "MVP_WINNER",
-        "MVP_PODIUM",
-        "MVP_CANDIDATE",
-        "PREVIOUS_SEASON_MVP_WINNER",
-        "PREVIOUS_SEASON_MVP_PODIUM_NOT_WINNER",
-    ]:
-        bronze[col] = bronze[col].fillna(False).astype(bool)
+    for col in ["MVP_WINNER", "MVP_PODIUM", "MVP_CANDIDATE"]:
+        data[col] = data[col].fillna(False).astype(bool)
     for col in ["MVP_VOTES_SHARE"]:
-        bronze[col] = bronze[col].fillna(0.0)
-    logger.info(
-        f'MVPs found in data : {bronze[bronze["MVP_WINNER"] == True]["SEASON"].nunique()}'
-    )
-    bronze.to_csv(
-        conf.data.bronze.path,
-        sep=conf.data.bronze.sep,
-        encoding=conf.data.bronze.encoding,
-        compression=conf.data.bronze.compression,
-        index=True,
-    )
+        data[col] = data[col].fillna(0.0)
+    return data
 
 
+@tracing.traced("silver")
 def make_silver_data():
     """Make silver training data from bronze data."""
-    data = load.load_bronze_data()
+    with tracing.span("silver.read") as span:
+        data = load.load_bronze_data()
+        span.set_frame(data)
+    data = filter_players(data)
+    with tracing.span("silver.write") as span:
+        data.to_csv(
+            conf.data.silver.path,
+            sep=conf.data.silver.sep,
+            encoding=conf.data.silver.encoding,
+            compression=conf.data.silver.compression,
+            index=True,
+        )
+        span.set_frame(data).set_file(conf.data.silver.path)
+
+
+def filter_players(data: pandas.DataFrame) -> pandas.DataFrame:
+    """Keep the players who can realistically be MVP candidates.
+
+    Args:
+        data (pandas.DataFrame): Bronze data (one or many seasons)
+
+    Returns:
+        pandas.DataFrame: Silver data
+    """
     logger.debug(
         f"Before filters: {len(data)} players - {len(data[data.MVP_CANDIDATE])} MVP candidates - {len(data[data.MVP_WINNER])} winners"
     )
-    data_copy = data.copy()
+    data_copy = data
     # Apply filters
     # 60% games played
     # 28 minutes per game
     # 2 FG attemptes
     # Team ranked 8th in conference at least
-    for season in data.SEASON.unique():
-        max_g = data[data.SEASON == season]["G"].max()
-        treshold = 0.6 * max_g
-        data = data[
-            (data.SEASON != season) | ((data.SEASON == season) & (data.G >= treshold))
-        ]
+    treshold = 0.6 * data.groupby("SEASON")["G"].transform("max")
+    data = data[data.G >= treshold]
     data = data[data["FGA_per_game"] >= 2]
     data = data[data["CONF_RANK"] <= 8]
     data = data[data["MP"] >= 28.0]
@@ -128,25 +191,98 @@ def make_silver_data():
     logger.debug(
         f"After filters: {len(data)} players - {len(data[data.MVP_CANDIDATE])} MVP candidates - {len(data[data.MVP_WINNER])} winners"
     )
-    data.to_csv(
-        conf.data.silver.path,
-        sep=conf.data.silver.sep,
-        encoding=conf.data.silver.encoding,
-        compression=conf.data.silver.compression,
-        index=True,
-    )
+    return data
 
 
-def make_gold_data_and_train_model():
-    """Make gold training data from silver data"""
-    data = load.load_silver_data()
+@tracing.traced("refresh.season")
+def make_season_silver_data(season: int) -> pandas.DataFrame:
+    """Make the silver data of a single season from downloaded data only.
+
+    Stats and standings are read from the raw files, which only hold the downloaded
+    seasons, and lag features are computed from the lag sources saved with bronze
+    data. Seasons missing from the lag sources are taken from the raw files.
+    Neither bronze nor silver data is read or rewritten.
+
+    Args:
+        season (int): Season to refresh
+
+    Returns:
+        pandas.DataFrame: Silver data of the season
+    """
+    with tracing.span("refresh.season.read") as span:
+        player_stats = load.load_player_stats()
+        mvp_votes = load.load_mvp_votes()
+        team_standings = load.load_team_standings()
+        try:
+            lag_sources = load.load_lag_sources()
+        except FileNotFoundError:
+            logger.warning("No lag sources found: using downloaded seasons only")
+            lag_sources = None
+        span.set_frame(player_stats)
+    # Only seasons the lag sources do not hold yet are merged from raw data
+    stored_seasons = set()
+    if lag_sources is not None:
+        stored_seasons = set(lag_sources.index.get_level_values("SEASON"))
+        stored_seasons.discard(season)
+    raw_seasons = [
+        s for s in player_stats["SEASON"].unique() if s not in stored_seasons
+    ]
+    if season not in raw_seasons:
+        raise ValueError(f"Season {season} not found in downloaded player stats")
+    player_stats = player_stats[player_stats["SEASON"].isin(raw_seasons)]
+    mvp_votes = mvp_votes[mvp_votes["SEASON"].isin(raw_seasons)]
+    team_standings = team_standings[team_standings["SEASON"].isin(raw_seasons)]
+    with tracing.span("refresh.season.merge") as span:
+        players, teams = dimensions.update_dimensions(
+            [player_stats, mvp_votes, team_standings]
+        )
+        data = merge_raw_data(player_stats, mvp_votes, team_standings, players, teams)
+        span.set_frame(data)
+    with tracing.span("refresh.season.lags") as span:
+        raw_sources = lags.get_lag_sources(
+            data, lags.LAG_FEATURES, player_column="PLAYER_ID"
+        )
+        season_players = data.loc[data.SEASON == season, "PLAYER_ID"].unique()
+        sources = raw_sources
+        if lag_sources is not None:
+            history = lag_sources[
+                lag_sources.index.get_level_values("PLAYER_ID").isin(season_players)
+                & ~lag_sources.index.get_level_values("SEASON").isin(raw_seasons)
+            ]
+            sources = pandas.concat([history, raw_sources.astype(history.dtypes)])
+        sources = sources[
+            sources.index.get_level_values("PLAYER_ID").isin(season_players)
+        ].sort_index()
+        data = data[data.SEASON == season].join(
+            lags.compute_lag_features_from_sources(
+                sources, lags.LAG_FEATURES, player_column="PLAYER_ID"
+            ),
+            on=["PLAYER_ID", "SEASON"],
+        )
+        span.set_frame(sources)
+    data = dimensions.add_names(data, players, teams)
+    return filter_players(data)
+
+
+@tracing.traced("train.pruning")
+def prune_correlated_features(data: pandas.DataFrame):
+    """List the features of silver data, dropping numerical features correlated with another one.
+
+    Args:
+        data (pandas.DataFrame): Silver data
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: Numerical features, categorical features and other columns
+    """
     not_features = [
         "PLAYER",
+        "PLAYER_ID",
         "MVP_VOTES_SHARE",
         "MVP_WINNER",
         "MVP_PODIUM",
         "MVP_CANDIDATE",
         "TEAM",
+        "TEAM_ID",
         "SEASON",
     ]  # Conf and season maybe should be used
     features = [col for col in data.columns if col not in not_features]
@@ -169,16 +305,34 @@ def make_gold_data_and_train_model():
             data[num_features], corr_treshold
         )
     )
+    return num_features, cat_features, not_features
+
+
+@tracing.traced("train.gold")
+def make_gold_data(
+    data: pandas.DataFrame,
+    num_features: list[str],
+    cat_features: list[str],
+    not_features: list[str],
+):
+    """Make gold training data from silver data, through the feature store, and write it.
+
+    Args:
+        data (pandas.DataFrame): Silver data
+        num_features (list[str]): Numerical features
+        cat_features (list[str]): Categorical features
+        not_features (list[str]): Other columns to keep
+
+    Returns:
+        tuple[pandas.DataFrame, dict, str, list[str]]: Gold data, feature specification, feature version and one-hot encoded categorical features
+    """
     data = data[num_features + cat_features + not_features]
     # Add MVP rank
     for season in data.SEASON.unique():
         data.loc[data.SEASON == season, "MVP_RANK"] = data[data.SEASON == season][
             "MVP_VOTES_SHARE"
         ].rank(ascending=False, method="min")
-    ranks_reference = data.MVP_RANK.copy()
-    not_features.append("MVP_RANK")
-
-    target = "MVP_VOTES_SHARE"
+    not_features = not_features + ["MVP_RANK"]
 
     selected_num_features = list(num_features)
     selected_cat_features = list(cat_features)
@@ -189,13 +343,16 @@ def make_gold_data_and_train_model():
     else:
         standardized_type = "std"
 
-    data_processed_features_only, data_raw = preprocess.scale_per_value_of(
+    feature_spec = feature_store.get_feature_spec(
         data,
         selected_cat_features,
         selected_num_features,
-        data["SEASON"],
-        min_max_scaler=min_max_scaling,
+        min_max_scaling=min_max_scaling,
     )
+    feature_version = feature_store.update_feature_store(data, feature_spec)
+    data_processed_features_only = feature_store.load_features(
+        feature_version, seasons=sorted(data.SEASON.unique())
+    ).loc[data.index]
     selected_cat_features_numerized = [
         f
         for f in data_processed_features_only.columns
@@ -207,43 +364,50 @@ def make_gold_data_and_train_model():
         [data_processed_features_only, data_not_features], axis=1
     )
 
-    data_processed.to_csv(
-        conf.data.gold.path,
-        sep=conf.data.gold.sep,
-        encoding=conf.data.gold.encoding,
-        compression=conf.data.gold.compression,
-        index=True,
+    with tracing.span("train.gold.write") as span:
+        data_processed.to_csv(
+            conf.data.gold.path,
+            sep=conf.data.gold.sep,
+            encoding=conf.data.gold.encoding,
+            compression=conf.data.gold.compression,
+            index=True,
+        )
+        span.set_frame(data_processed).set_file(conf.data.gold.path)
+
+    return (
+        data_processed,
+        feature_spec,
+        feature_version,
+        selected_cat_features_numerized,
     )
 
-    data = load.load_gold_data()
 
-    current_season = (
-        datetime.now().year + 1 if datetime.now().month > 9 else datetime.now().year
-    )
-    logger.debug(f"Current season : {current_season}")
-    data = data[data.SEASON < current_season]
-    percent_test_seasons = 0.2
-    num_test_seasons = int(data.SEASON.nunique() * percent_test_seasons)
-    test_seasons = sorted(data.SEASON.unique())[-num_test_seasons:]
-    trainval_seasons = sorted(data.SEASON.unique())[:-num_test_seasons]
-    logger.debug(f"Test seasons : {test_seasons[0]} to {test_seasons[-1]}")
-    logger.debug(f"Trainval seasons : {trainval_seasons[0]} to {trainval_seasons[-1]}")
-    data_test = data[data.SEASON.isin(test_seasons)]
-    data_trainval = data[data.SEASON.isin(trainval_seasons)]
-    data_all = data.copy()
+@tracing.traced("train.selection")
+def select_features(
+    data: pandas.DataFrame, num_features: list[str], target: str
+) -> list[str]:
+    """Select the numerical features correlated with the target, by Pearson, Kendall or Spearman correlation.
 
+    Args:
+        data (pandas.DataFrame): Training data
+        num_features (list[str]): Numerical features
+        target (str): Target column
+
+    Returns:
+        list[str]: Selected features, without missing values
+    """
     # n_features = 50
     # treshold = None
     n_features = None
     treshold = _MIN_TARGET_CORRELATION
 
-    data_for_corr_analysis = data_trainval[
-        selected_num_features
+    data_for_corr_analysis = data[
+        num_features
     ]  # we make the choice of not looking into numerized cat features
 
     method = "pearson"
     top_corr_pearson = filter_by_correlation_with_target(
-        pandas.concat([data_for_corr_analysis, data_trainval[target]], axis=1),
+        pandas.concat([data_for_corr_analysis, data[target]], axis=1),
         target,
         method=method,
         n_features=n_features,
@@ -251,7 +415,7 @@ def make_gold_data_and_train_model():
     )
     method = "kendall"
     top_corr_kendall = filter_by_correlation_with_target(
-        pandas.concat([data_for_corr_analysis, data_trainval[target]], axis=1),
+        pandas.concat([data_for_corr_analysis, data[target]], axis=1),
         target,
         method=method,
         n_features=n_features,
@@ -259,7 +423,7 @@ def make_gold_data_and_train_model():
     )
     method = "spearman"
     top_corr_spearman = filter_by_correlation_with_target(
-        pandas.concat([data_for_corr_analysis, data_trainval[target]], axis=1),
+        pandas.concat([data_for_corr_analysis, data[target]], axis=1),
         target,
         method=method,
         n_features=n_features,
@@ -278,177 +442,158 @@ def make_gold_data_and_train_model():
     selected_features = list(set(selected_features))
     logger.debug(f"Selected features : {len(selected_features)}")
 
-    selected_features = [
-        f for f in selected_features if data_trainval[f].isna().sum() == 0
-    ]
+    selected_features = [f for f in selected_features if data[f].isna().sum() == 0]
+    return selected_features
 
-    X_trainval = data_trainval[selected_features + selected_cat_features_numerized]
-    y_trainval = data_trainval[target]
+
+@tracing.traced("train")
+def make_gold_data_and_train_model():
+    """Make gold training data from silver data"""
+    with tracing.span("train.read") as span:
+        data = load.load_silver_data()
+        span.set_frame(data)
+    num_features, cat_features, not_features = prune_correlated_features(data)
+    data, feature_spec, feature_version, selected_cat_features_numerized = (
+        make_gold_data(data, num_features, cat_features, not_features)
+    )
+    ranks_reference = data.MVP_RANK.copy()
+    target = "MVP_VOTES_SHARE"
+
+    current_season = utils.get_current_season()
+    logger.debug(f"Current season : {current_season}")
+    data = data[data.SEASON < current_season]
+    percent_test_seasons = 0.2
+    num_test_seasons = int(data.SEASON.nunique() * percent_test_seasons)
+    test_seasons = sorted(data.SEASON.unique())[-num_test_seasons:]
+    trainval_seasons = sorted(data.SEASON.unique())[:-num_test_seasons]
+    logger.debug(f"Test seasons : {test_seasons[0]} to {test_seasons[-1]}")
+    logger.debug(f"Trainval seasons : {trainval_seasons[0]} to {trainval_seasons[-1]}")
+    data_test = data[data.SEASON.isin(test_seasons)]
+    data_trainval = data[data.SEASON.isin(trainval_seasons)]
+    data_all = data.copy()
+
+    selected_features = select_features(data_trainval, num_features, target)
 
     X_test = data_test[selected_features + selected_cat_features_numerized]
     y_test = data_test[target]
 
     X_all = data_all[selected_features + selected_cat_features_numerized]
     y_all = data_all[target]
+    # Folds and seasons select rows of one contiguous matrix, shared by all workers
+    training_arrays = build_training_arrays(
+        data_all, selected_features + selected_cat_features_numerized, target
+    )
+    trainval_rows = numpy.flatnonzero(
+        numpy.isin(training_arrays["seasons"], trainval_seasons)
+    )
 
     features_dict = {
-        "cat": selected_cat_features,
-        "num": selected_num_features,
+        **feature_spec,
+        "version": feature_version,
         "model": selected_features + selected_cat_features_numerized,
     }
-    with open("data/features.json", "w") as outfile:
-        json.dump(features_dict, outfile, indent=2)
-
-    regressors = [model.get_model()]
-
-    splits = 3
-    repeats = 2
-    splitter = model_selection.RepeatedKFold(
-        n_splits=splits, n_repeats=repeats, random_state=0
+    with open(
+        conf.data.features.path, "w", encoding=conf.data.features.encoding
+    ) as outfile:
+        json.dump(features_dict, outfile, indent=conf.data.features.indent)
+
+    tuned_params = (
+        load.load_tuned_params(conf.train.model)
+        if conf.train.use_tuned_params
+        else None
     )
+    if tuned_params is not None:
+        logger.info(f"Using tuned hyperparameters : {tuned_params}")
+    regressors = [model.get_model(tuned_params)]
 
     logger.debug("Fitting model...")
 
-    for step, regressor in enumerate(regressors):
-        regressor_name = str(regressor.__class__.__name__)
-        non_default_params = str(regressor).split("(")[1].split(")")[0]
-
-        logger.debug(
-            f"Model {step + 1} of {len(regressors)}: {regressor_name} {non_default_params}"
-        )
-
-        train_MAEs = []
-        train_MSEs = []
-        train_MAXs = []
-        val_MAEs = []
-        val_MSEs = []
-        val_MSLEs = []
-        val_MAXs = []
-
-        # End run if ened abnormally
-        # try:
-        #     mlflow.end_run()
-        # except Exception as e:
-        #     pass
-
-        # mlflow.start_run(experiment_id=1)
-
-        # mlflow.log_param("model", regressor_name)
-        # mlflow.log_param("non_default_params", non_default_params)
-        # mlflow.log_param("standardized_type", standardized_type)
-        # mlflow.log_param("num_features", len(selected_num_features))
-        # mlflow.log_param("cat_features", len(selected_cat_features))
-        # SMOGN (SMOTE for regression) ?
-
-        for step, (train_index, val_index) in enumerate(
-            splitter.split(X_trainval, y_trainval)
-        ):
-            logger.debug(f"Step {step + 1} of {splits * repeats}")
-            X_train = X_trainval.iloc[train_index, :]
-            X_val = X_trainval.iloc[val_index, :]
-            y_train = y_trainval.iloc[train_index]
-            y_val = y_trainval.iloc[val_index]
-            regressor.fit(X_train, y_train)
-            y_pred = regressor.predict(X_val)
-            y_pred_train = regressor.predict(X_train)
-            train_MAEs.append(metrics.mean_absolute_error(y_train, y_pred_train))
-            train_MSEs.append(metrics.mean_squared_error(y_train, y_pred_train))
-            train_MAXs.append(metrics.max_error(y_train, y_pred_train))
-            val_MAEs.append(metrics.mean_absolute_error(y_val, y_pred))
-            val_MSEs.append(metrics.mean_squared_error(y_val, y_pred))
-            # val_MSLEs.append(metrics.mean_squared_log_error(y_val, y_pred))
-            val_MAXs.append(metrics.max_error(y_val, y_pred))
-            # mlflow.log_metric(key="val_MAE", value=metrics.mean_absolute_error(y_val, y_pred), step=step)
-            # mlflow.log_metric(key="val_MSE", value=metrics.mean_squared_error(y_val, y_pred), step=step)
-            # #mlflow.log_metric(key="val_MSLE", value=metrics.mean_squared_log_error(y_val, y_pred), step=step)
-            # mlflow.log_metric(key="train_MAE", value=metrics.mean_absolute_error(y_train, y_pred_train), step=step)
-            # mlflow.log_metric(key="train_MSE", value=metrics.mean_squared_error(y_train, y_pred_train), step=step)
-            # Add a MSE/MAE on MVP candidates
-            # Add a metrics on MVP or MVP top 3
-            # Clip predictions between 0.0 and 1.0 !
-
-        logger.debug("Training MAE: %f", numpy.mean(train_MAEs))
-        logger.debug("Training MSE: %f", numpy.mean(train_MSEs))
-        logger.debug("Training MaxAE: %f", numpy.mean(train_MAXs))
-        logger.debug("Validation MAE: %f", numpy.mean(val_MAEs))
-        logger.debug("Validation MSE: %f", numpy.mean(val_MSEs))
-        logger.debug("Validation MaxAE: %f", numpy.mean(val_MAXs))
-
-        # mlflow.end_run()
-
-    logger.debug("Performing test seasons analysis...")
-
-    """
-    regressor.fit(X_trainval, y_trainval)
-    y_pred_test = regressor.predict(X_test)
-    results = y_test.rename("TRUTH").to_frame()
-    results.loc[:, "PRED"] = y_pred_test
-    results.loc[:, "AE"] = (results["TRUTH"] - results["PRED"]).abs()
-    results = results.merge(data_test[["SEASON"]], left_index=True, right_index=True)
-    real_winners = data_test.sort_values(by=target, ascending=False).drop_duplicates(
-        subset=["SEASON"], keep="first"
-    )[["SEASON"]]
-    real_winners["True MVP"] = real_winners.index
-    real_winners = real_winners.set_index("SEASON", drop=True)
-    winners = results.sort_values(by="PRED", ascending=False).drop_duplicates(
-        subset=["SEASON"], keep="first"
-    )
-    winners["Pred. MVP"] = winners.index
-    winners = winners.set_index("SEASON", drop=True)
-    winners = winners.merge(real_winners, left_index=True, right_index=True)
-    winners.loc[:, "REAL_RANK"] = winners["Pred. MVP"].map(ranks_reference)
-    winners = winners.sort_index(ascending=True)
-    print(winners)
-    print(numpy.mean(results.AE))
-    print(results.AE.max())
-    print(numpy.mean(results.AE ** 2))
-    winners["Real MVP rank"] = 1
-    print("Pourcentage de MVP bien trouvé sur le jeu de test :")
-    print((winners["Pred. MVP"] == winners["True MVP"]).sum() / len(winners))
-    print("Rang réel moyen du MVP prédit:")
-    print((winners["REAL_RANK"]).mean())
-    """
-
-    logger.debug("Performing all season analysis...")
-    all_winners = pandas.DataFrame()
-    for season in data_all.SEASON.unique():
-        season_regressor = base.clone(regressor)
-        logger.debug(f"Season {season}")
-        data_all_train = data_all[data_all.SEASON != season]
-        data_all_test = data_all[data_all.SEASON == season]
-        X_all_train = data_all_train[
-            selected_features + selected_cat_features_numerized
-        ]
-        y_all_train = data_all_train[target]
-        X_all_test = data_all_test[selected_features + selected_cat_features_numerized]
-        y_all_test = data_all_test[target]
-        season_regressor.fit(X_all_train, y_all_train)
-        y_pred_all_test = season_regressor.predict(X_all_test)
-
-        results = y_all_test.rename("TRUTH").to_frame()
-        results.loc[:, "PRED"] = y_pred_all_test
+    with parallel.shared_arrays(**training_arrays) as arrays:
+        for step, regressor in enumerate(regressors):
+            regressor_name = str(regressor.__class__.__name__)
+            non_default_params = str(regressor).split("(")[1].split(")")[0]
+
+            logger.debug(
+                f"Model {step + 1} of {len(regressors)}: {regressor_name} {non_default_params}"
+            )
+
+            # End run if ened abnormally
+            # try:
+            #     mlflow.end_run()
+            # except Exception as e:
+            #     pass
+
+            # mlflow.start_run(experiment_id=1)
+
+            # mlflow.log_param("model", regressor_name)
+            # mlflow.log_param("non_default_params", non_default_params)
+            # mlflow.log_param("standardized_type", standardized_type)
+            # mlflow.log_param("num_features", len(selected_num_features))
+            # mlflow.log_param("cat_features", len(selected_cat_features))
+            # SMOGN (SMOTE for regression) ?
+
+            fold_scores = cross_validate(regressor, arrays, trainval_rows)
+            train_MAEs = fold_scores["train_MAE"]
+            train_MSEs = fold_scores["train_MSE"]
+            train_MAXs = fold_scores["train_MAX"]
+            val_MAEs = fold_scores["val_MAE"]
+            val_MSEs = fold_scores["val_MSE"]
+            val_MAXs = fold_scores["val_MAX"]
+
+            logger.debug("Training MAE: %f", numpy.mean(train_MAEs))
+            logger.debug("Training MSE: %f", numpy.mean(train_MSEs))
+            logger.debug("Training MaxAE: %f", numpy.mean(train_MAXs))
+            logger.debug("Validation MAE: %f", numpy.mean(val_MAEs))
+            logger.debug("Validation MSE: %f", numpy.mean(val_MSEs))
+            logger.debug("Validation MaxAE: %f", numpy.mean(val_MAXs))
+
+            # mlflow.end_run()
+
+        logger.debug("Performing test seasons analysis...")
+
+        """
+        regressor.fit(X_trainval, y_trainval)
+        y_pred_test = regressor.predict(X_test)
+        results = y_test.rename("TRUTH").to_frame()
+        results.loc[:, "PRED"] = y_pred_test
         results.loc[:, "AE"] = (results["TRUTH"] - results["PRED"]).abs()
-        results = results.merge(
-            data_all_test[["SEASON"]], left_index=True, right_index=True
-        )
-        # Export detailed results
-        # results.sort_values(by="PRED", ascending=False).head(10).to_csv("./data/temp/"+str(season)+"_results.csv")
-        real_winners = data_all_test.sort_values(
-            by=target, ascending=False
-        ).drop_duplicates(subset=["SEASON"], keep="first")[["SEASON"]]
+        results = results.merge(data_test[["SEASON"]], left_index=True, right_index=True)
+        real_winners = data_test.sort_values(by=target, ascending=False).drop_duplicates(
+            subset=["SEASON"], keep="first"
+        )[["SEASON"]]
         real_winners["True MVP"] = real_winners.index
         real_winners = real_winners.set_index("SEASON", drop=True)
         winners = results.sort_values(by="PRED", ascending=False).drop_duplicates(
             subset=["SEASON"], keep="first"
         )
-        predicted_ranks_reference = results.PRED.rank(ascending=False, method="min")
         winners["Pred. MVP"] = winners.index
         winners = winners.set_index("SEASON", drop=True)
         winners = winners.merge(real_winners, left_index=True, right_index=True)
         winners.loc[:, "REAL_RANK"] = winners["Pred. MVP"].map(ranks_reference)
-        winners.loc[:, "PRED_RANK"] = winners["True MVP"].map(predicted_ranks_reference)
         winners = winners.sort_index(ascending=True)
-        all_winners = pandas.concat([all_winners, winners])
+        print(winners)
+        print(numpy.mean(results.AE))
+        print(results.AE.max())
+        print(numpy.mean(results.AE ** 2))
+        winners["Real MVP rank"] = 1
+        print("Pourcentage de MVP bien trouvé sur le jeu de test :")
+        print((winners["Pred. MVP"] == winners["True MVP"]).sum() / len(winners))
+        print("Rang réel moyen du MVP prédit:")
+        print((winners["REAL_RANK"]).mean())
+        """
+
+        logger.debug("Performing all season analysis...")
+        with tracing.span("train.loso", warm_start=conf.train.warm_start) as span:
+            all_winners, results, full_regressor = evaluate_all_seasons(
+                regressor,
+                data_all,
+                selected_features + selected_cat_features_numerized,
+                target,
+                ranks_reference,
+                warm_start=conf.train.warm_start,
+                arrays=arrays,
+            )
+            span.set(seasons=len(all_winners))
 
     logger.debug("Mean absolute error: %f", numpy.mean(results.AE))
     logger.debug("Max absolute error: %f", results.AE.max())
@@ -457,26 +602,290 @@ def make_gold_data_and_train_model():
     # To avoid extremely high values and skewed means, limit rank to 10
     all_winners["PRED_RANK"] = all_winners["PRED_RANK"].clip(upper=10)
     all_winners["REAL_RANK"] = all_winners["REAL_RANK"].clip(upper=10)
+    rank_metrics = get_rank_metrics(all_winners)
     logger.info(
         "Share of MVP correctly identified in test dataset : %f",
-        (all_winners["Pred. MVP"] == all_winners["True MVP"]).sum() / len(all_winners),
+        rank_metrics["mvp_share"],
     )
     logger.info(
-        "Average real rank of predicted MVPs: %f", (all_winners["REAL_RANK"]).mean()
+        "Average real rank of predicted MVPs: %f", rank_metrics["average_real_rank"]
     )
     all_winners["Pred. MVP"] = all_winners["Pred. MVP"].map(data_all["PLAYER"])
     all_winners["True MVP"] = all_winners["True MVP"].map(data_all["PLAYER"])
-    all_winners.to_csv(
-        conf.data.performances.path,
-        sep=conf.data.performances.sep,
-        encoding=conf.data.performances.encoding,
-        compression=conf.data.performances.compression,
-        index=True,
+    if conf.train.warm_start == "full":
+        logger.warning(
+            "Seasons were evaluated by fine-tuning a model fitted on them (warm "
+            "start full): metrics are optimistic, performances are not written"
+        )
+        if os.path.exists(conf.data.performances.path):
+            # Performances of another model
+            os.remove(conf.data.performances.path)
+    else:
+        all_winners.to_csv(
+            conf.data.performances.path,
+            sep=conf.data.performances.sep,
+            encoding=conf.data.performances.encoding,
+            compression=conf.data.performances.compression,
+            index=True,
+        )
+
+    # Fitted on the data frame, so that the model knows the names of its features
+    with tracing.span("train.fit") as span:
+        if full_regressor is not None:
+            # Already fitted on all seasons by the evaluation
+            final_regressor = full_regressor
+        else:
+            final_regressor = base.clone(regressor)
+            model.fit_model(final_regressor, X_all, y_all, groups=data_all["SEASON"])
+        joblib.dump(final_regressor, conf.data.model.path)
+        span.set_frame(X_all).set_file(conf.data.model.path)
+    with tracing.span("train.export"):
+        mlp.export_model(
+            final_regressor,
+            conf.data.model_weights.path,
+            conf.data.model.path,
+            X=X_all,
+        )
+
+
+@tracing.traced("train.cv")
+def cross_validate(regressor, arrays: dict, rows: numpy.ndarray) -> pandas.DataFrame:
+    """Score a model by repeated k-fold cross-validation on rows of the shared training matrix.
+
+    Args:
+        regressor (sklearn.base.BaseEstimator): Unfitted model
+        arrays (dict[str, str]): Paths of the shared X, y and seasons arrays
+        rows (numpy.ndarray): Rows to split into folds
+
+    Returns:
+        pandas.DataFrame: Training and validation errors of each fold
+    """
+    splits = 3
+    repeats = 2
+    splitter = model_selection.RepeatedKFold(
+        n_splits=splits, n_repeats=repeats, random_state=0
+    )
+    # Folds only receive row indices of the shared training matrix
+    folds = [
+        (step, (rows[train_index], rows[val_index]))
+        for step, (train_index, val_index) in enumerate(splitter.split(rows))
+    ]
+    fold_scores = parallel.run_tasks(
+        evaluate_fold,
+        folds,
+        shared={"regressor": regressor, "arrays": arrays, "n_folds": len(folds)},
+    )
+    return pandas.DataFrame(fold_scores)
+
+
+def evaluate_fold(fold: tuple, shared: dict) -> dict:
+    """Fit a model on the training rows of a cross-validation fold and score it.
+
+    Args:
+        fold (tuple): Step number, and training and validation row indices
+        shared (dict): Data shared by all folds: unfitted regressor, paths of the shared X, y and seasons arrays, and n_folds
+
+    Returns:
+        dict: Training and validation errors (MAE, MSE and MaxAE)
+    """
+    step, (train_index, val_index) = fold
+    logger.debug(f"Step {step + 1} of {shared['n_folds']}")
+    X = parallel.load_shared_array(shared["arrays"]["X"])
+    y = parallel.load_shared_array(shared["arrays"]["y"])
+    seasons = parallel.load_shared_array(shared["arrays"]["seasons"])
+    X_train, y_train = X[train_index], y[train_index]
+    X_val, y_val = X[val_index], y[val_index]
+    regressor = base.clone(shared["regressor"])
+    model.fit_model(regressor, X_train, y_train, groups=seasons[train_index])
+    y_pred = regressor.predict(X_val)
+    y_pred_train = regressor.predict(X_train)
+    # Add a MSE/MAE on MVP candidates
+    # Add a metrics on MVP or MVP top 3
+    # Clip predictions between 0.0 and 1.0 !
+    return {
+        "train_MAE": metrics.mean_absolute_error(y_train, y_pred_train),
+        "train_MSE": metrics.mean_squared_error(y_train, y_pred_train),
+        "train_MAX": metrics.max_error(y_train, y_pred_train),
+        "val_MAE": metrics.mean_absolute_error(y_val, y_pred),
+        "val_MSE": metrics.mean_squared_error(y_val, y_pred),
+        # "val_MSLE": metrics.mean_squared_log_error(y_val, y_pred),
+        "val_MAX": metrics.max_error(y_val, y_pred),
+    }
+
+
+def build_training_arrays(
+    data: pandas.DataFrame, features: list[str], target: str
+) -> dict:
+    """Build the training matrix once, for all folds and seasons to select rows from.
+
+    Args:
+        data (pandas.DataFrame): Gold data
+        features (list[str]): Model features
+        target (str): Target column
+
+    Returns:
+        dict[str, numpy.ndarray]: C-contiguous float32 features (X), target (y) and season (seasons) of each row
+    """
+    return {
+        "X": numpy.ascontiguousarray(data[features].to_numpy(dtype="float32")),
+        "y": data[target].to_numpy(dtype="float64"),
+        "seasons": data["SEASON"].to_numpy(),
+    }
+
+
+def evaluate_all_seasons(
+    regressor,
+    data: pandas.DataFrame,
+    features: list[str],
+    target: str,
+    ranks_reference: pandas.Series,
+    warm_start: str = "cold",
+    arrays: dict | None = None,
+):
+    """Evaluate a model on each season, training it on all other seasons (leave-one-season-out).
+
+    Warm starts fine-tune an already fitted model with early stopping instead of
+    fitting each season from scratch. With "full", the starting model was fitted
+    on all seasons, including the held-out one: it leaks the evaluated season and
+    metrics are optimistic. With "previous", seasons are evaluated one after the
+    other, each one starting from the model of the previous season.
+
+    Args:
+        regressor: Unfitted model
+        data (pandas.DataFrame): Gold data of all seasons to evaluate
+        features (list[str]): Model features
+        target (str): Target column
+        ranks_reference (pandas.Series): True MVP rank of each player
+        warm_start (str, optional): "cold", "full" or "previous". Defaults to "cold".
+        arrays (dict, optional): Paths of the shared arrays of build_training_arrays for data. Defaults to building them.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame, object]: Predicted and true MVP of
+            each season, predictions of the last season, and the model fitted on all
+            seasons with "full" (None otherwise)
+    """
+    if arrays is None:
+        with parallel.shared_arrays(
+            **build_training_arrays(data, features, target)
+        ) as arrays:
+            return evaluate_all_seasons(
+                regressor, data, features, target, ranks_reference, warm_start, arrays
+            )
+    shared = {
+        "regressor": regressor,
+        "arrays": arrays,
+        "index": data.index.to_numpy(),
+        "index_name": data.index.name,
+        "ranks_reference": ranks_reference,
+    }
+    row_seasons = parallel.load_shared_array(arrays["seasons"])
+    seasons = [
+        (season, numpy.flatnonzero(row_seasons == season))
+        for season in data.SEASON.unique()
+    ]
+    full_regressor = None
+    if warm_start == "cold":
+        # Each season is evaluated by a model trained on all other seasons, in parallel
+        season_evaluations = parallel.run_tasks(evaluate_season, seasons, shared=shared)
+    elif warm_start == "full":
+        # Fitted like the final model, on the data frame, to be saved as it
+        full_regressor = model.fit_model(
+            base.clone(regressor), data[features], data[target], data["SEASON"]
+        )
+        season_evaluations = parallel.run_tasks(
+            evaluate_season, seasons, shared={**shared, "start": full_regressor}
+        )
+    elif warm_start == "previous":
+        # Sequential: each season starts from the model of the previous season
+        season_evaluations, start = [], None
+        for season in seasons:
+            season_evaluations.append(
+                evaluate_season(season, {**shared, "start": start})
+            )
+            start = season_evaluations[-1][2]
+    else:
+        raise ValueError(
+            f"Unknown warm start {warm_start}, choose from cold, full or previous"
+        )
+    all_winners = pandas.concat([winners for winners, _, _ in season_evaluations])
+    # Errors are reported on the last season evaluated
+    _, results, _ = season_evaluations[-1]
+    return all_winners, results, full_regressor
+
+
+def get_rank_metrics(all_winners: pandas.DataFrame) -> dict:
+    """Compute ranking metrics of season evaluations.
+
+    Args:
+        all_winners (pandas.DataFrame): Predicted and true MVP of each season, as returned by evaluate_all_seasons
+
+    Returns:
+        dict: Share of MVP correctly identified, average real rank of predicted MVPs and average predicted rank of true MVPs (limited to 10)
+    """
+    return {
+        "mvp_share": (all_winners["Pred. MVP"] == all_winners["True MVP"]).sum()
+        / len(all_winners),
+        "average_real_rank": all_winners["REAL_RANK"].clip(upper=10).mean(),
+        "average_pred_rank": all_winners["PRED_RANK"].clip(upper=10).mean(),
+    }
+
+
+def evaluate_season(season: tuple, shared: dict):
+    """Evaluate a model on a season, training it on all other seasons.
+
+    Args:
+        season (tuple): Held-out season, and its row indices
+        shared (dict): Data shared by all seasons: unfitted regressor, paths of the shared X, y and seasons arrays, index (and index_name) of rows, ranks_reference (true MVP rank of each player) and optional fitted model to start from
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame, object]: Predicted and true MVP of the season, predictions of all players of the season and fitted model
+    """
+    season, test_rows = season
+    if shared.get("start") is None:
+        season_regressor = base.clone(shared["regressor"])
+    else:
+        season_regressor = model.get_warm_started_model(shared["start"])
+    logger.debug(f"Season {season}")
+    X = parallel.load_shared_array(shared["arrays"]["X"])
+    y = parallel.load_shared_array(shared["arrays"]["y"])
+    seasons = parallel.load_shared_array(shared["arrays"]["seasons"])
+    train_rows = numpy.flatnonzero(seasons != season)
+    X_train, X_test = X[train_rows], X[test_rows]
+    if hasattr(shared.get("start"), "feature_names_in_"):
+        # The model fitted on all seasons knows the names of its features
+        names = shared["start"].feature_names_in_
+        X_train = pandas.DataFrame(X_train, columns=names)
+        X_test = pandas.DataFrame(X_test, columns=names)
+    model.fit_model(
+        season_regressor, X_train, y[train_rows], groups=seasons[train_rows]
     )
+    y_pred_all_test = season_regressor.predict(X_test)
 
-    final_regressor = base.clone(regressor)
-    final_regressor.fit(X_all, y_all)
-    joblib.dump(final_regressor, conf.data.model.path)
+    results = pandas.DataFrame(
+        {"TRUTH": y[test_rows]},
+        index=pandas.Index(shared["index"][test_rows], name=shared["index_name"]),
+    )
+    results.loc[:, "PRED"] = y_pred_all_test
+    results.loc[:, "AE"] = (results["TRUTH"] - results["PRED"]).abs()
+    results.loc[:, "SEASON"] = season
+    # Export detailed results
+    # results.sort_values(by="PRED", ascending=False).head(10).to_csv("./data/temp/"+str(season)+"_results.csv")
+    real_winners = results.sort_values(by="TRUTH", ascending=False).drop_duplicates(
+        subset=["SEASON"], keep="first"
+    )[["SEASON"]]
+    real_winners["True MVP"] = real_winners.index
+    real_winners = real_winners.set_index("SEASON", drop=True)
+    winners = results.sort_values(by="PRED", ascending=False).drop_duplicates(
+        subset=["SEASON"], keep="first"
+    )
+    predicted_ranks_reference = results.PRED.rank(ascending=False, method="min")
+    winners["Pred. MVP"] = winners.index
+    winners = winners.set_index("SEASON", drop=True)
+    winners = winners.merge(real_winners, left_index=True, right_index=True)
+    winners.loc[:, "REAL_RANK"] = winners["Pred. MVP"].map(shared["ranks_reference"])
+    winners.loc[:, "PRED_RANK"] = winners["True MVP"].map(predicted_ranks_reference)
+    winners = winners.sort_index(ascending=True)
+    return winners, results, season_regressor
 
 
 def filter_by_correlation_with_target(
@@ -0,0 +1,226 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+import warnings
+
+import numpy
+import pandas
+from sklearn import exceptions, metrics, model_selection
+
+from nba_mvp_predictor import SEED, conf, load, logger, model, parallel, utils
+
+_TARGET = "MVP_VOTES_SHARE"
+
+
+def tune_model(n_configs: int | None = None, restart: bool = False) -> dict:
+    """Search the hyperparameters of the model with successive halving.
+
+    Configurations are sampled from the search space of the configured model (see
+    model.SEARCH_SPACES) and scored by season-grouped
+    cross-validation on gold data. Each rung keeps the best 1/eta configurations for
+    the next one, trained on more seasons and for more epochs. Trials are saved as
+    soon as they complete: an interrupted search resumes without recomputing them.
+
+    Args:
+        n_configs (int, optional): Number of configurations of the first rung. Defaults to the configured value.
+        restart (bool, optional): Discard trials of previous searches. Defaults to False.
+
+    Returns:
+        dict: Best hyperparameters
+    """
+    tune_conf = conf.tune
+    model_name = conf.train.model
+    if n_configs is None:
+        n_configs = tune_conf.n_configs
+    data = load.load_gold_data()
+    data = data[data.SEASON < utils.get_current_season()]
+    features = load.load_features()["model"]
+    fingerprint = get_fingerprint(data, features, model_name)
+    state = load_state()
+    if restart or state.get("fingerprint") != fingerprint:
+        if len(state) > 0:
+            logger.info("Data or search settings changed: starting a new search")
+        state = {
+            "fingerprint": fingerprint,
+            "model": model_name,
+            "trials": {},
+            "best": None,
+        }
+
+    def save_trial(trial: dict, result: dict):
+        state["trials"][trial["key"]] = {
+            "rung": trial["rung"],
+            "params": trial["params"],
+            **result,
+        }
+        save_state(state)
+
+    configs = sample_configurations(model.SEARCH_SPACES[model_name], n_configs)
+    seasons = numpy.sort(data.SEASON.unique())
+    with parallel.shared_arrays(
+        X=data[features].to_numpy(dtype="float32"),
+        y=data[_TARGET].to_numpy(dtype="float32"),
+        seasons=data["SEASON"].to_numpy(),
+    ) as arrays:
+        for rung in range(tune_conf.n_rungs):
+            # Lower rungs train on the most recent seasons only, and for fewer epochs
+            budget = tune_conf.eta ** (rung - tune_conf.n_rungs + 1)
+            n_seasons = max(tune_conf.n_splits, math.ceil(budget * len(seasons)))
+            max_iter = max(1, math.ceil(budget * tune_conf.max_iter))
+            trials = [
+                {
+                    "key": get_trial_key(params, rung),
+                    "rung": rung,
+                    "params": params,
+                    "max_iter": max_iter,
+                    "seasons": seasons[-n_seasons:].tolist(),
+                }
+                for params in configs
+            ]
+            pending = [trial for trial in trials if trial["key"] not in state["trials"]]
+            logger.info(
+                f"Rung {rung + 1} of {tune_conf.n_rungs} : {len(configs)} configurations"
+                f" - {min(n_seasons, len(seasons))} seasons - {max_iter} epochs"
+                f" ({len(trials) - len(pending)} already done)"
+            )
+            parallel.run_tasks(
+                evaluate_trial,
+                pending,
+                shared={
+                    "arrays": arrays,
+                    "n_splits": tune_conf.n_splits,
+                    "model": model_name,
+                },
+                callback=save_trial,
+            )
+            ranked = sorted(trials, key=lambda t: state["trials"][t["key"]]["score"])
+            best_trial = state["trials"][ranked[0]["key"]]
+            logger.info(
+                f"Best of rung {rung + 1} : MSE {best_trial['score']:.6f}"
+                f" - MAE {best_trial['mae']:.6f} - {best_trial['params']}"
+            )
+            configs = [
+                trial["params"]
+                for trial in ranked[: max(1, len(ranked) // tune_conf.eta)]
+            ]
+    state["best"] = configs[0]
+    save_state(state)
+    logger.info(f"Best hyperparameters : {state['best']}")
+    return state["best"]
+
+
+def evaluate_trial(trial: dict, shared: dict) -> dict:
+    """Score a configuration by season-grouped cross-validation.
+
+    Args:
+        trial (dict): Hyperparameters, epochs and seasons to use
+        shared (dict): Paths of the shared X, y and seasons arrays, n_splits and model name
+
+    Returns:
+        dict: Mean validation MSE (score) and MAE, and duration in seconds
+    """
+    X = parallel.load_shared_array(shared["arrays"]["X"])
+    y = parallel.load_shared_array(shared["arrays"]["y"])
+    seasons = parallel.load_shared_array(shared["arrays"]["seasons"])
+    rows = numpy.flatnonzero(numpy.isin(seasons, trial["seasons"]))
+    regressor = model.get_model(
+        {**trial["params"], "max_iter": trial["max_iter"]}, name=shared["model"]
+    )
+    splitter = model_selection.GroupKFold(n_splits=shared["n_splits"])
+    val_MSEs, val_MAEs = [], []
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        # Low budget rungs stop before convergence on purpose
+        warnings.simplefilter("ignore", category=exceptions.ConvergenceWarning)
+        for train_index, val_index in splitter.split(rows, groups=seasons[rows]):
+            train_rows = rows[train_index]
+            model.fit_model(
+                regressor, X[train_rows], y[train_rows], groups=seasons[train_rows]
+            )
+            y_pred = regressor.predict(X[rows[val_index]])
+            val_MSEs.append(metrics.mean_squared_error(y[rows[val_index]], y_pred))
+            val_MAEs.append(metrics.mean_absolute_error(y[rows[val_index]], y_pred))
+    return {
+        "score": float(numpy.mean(val_MSEs)),
+        "mae": float(numpy.mean(val_MAEs)),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def sample_configurations(space: dict, n_configs: int) -> list[dict]:
+    """Sample distinct configurations from a search space.
+
+    The sample of n configurations starts with the sample of n-1 configurations, so
+    growing a search reuses its previous trials.
+
+    Args:
+        space (dict): Values of each hyperparameter
+        n_configs (int): Number of configurations
+
+    Returns:
+        list[dict]: Configurations
+    """
+    names = sorted(space)
+    configs = [
+        dict(zip(names, values))
+        for values in itertools.product(*[space[name] for name in names])
+    ]
+    random.Random(SEED).shuffle(configs)
+    return configs[:n_configs]
+
+
+def get_trial_key(params: dict, rung: int) -> str:
+    content = json.dumps({"params": params, "rung": rung}, sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+
+
+def get_fingerprint(
+    data: pandas.DataFrame, features: list[str], model_name: str
+) -> str:
+    """Fingerprint what trial scores depend on: data, features, model, search space and settings.
+
+    Args:
+        data (pandas.DataFrame): Gold data
+        features (list[str]): Model features
+        model_name (str): Model of the registry
+
+    Returns:
+        str: Fingerprint
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        pandas.util.hash_pandas_object(data[features + [_TARGET, "SEASON"]])
+        .to_numpy()
+        .tobytes()
+    )
+    settings = {
+        "features": features,
+        "model": model_name,
+        "space": model.SEARCH_SPACES[model_name],
+        "tune": {k: v for k, v in conf.tune.to_dict().items() if k != "n-configs"},
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_state() -> dict:
+    try:
+        with open(
+            conf.data.tuning.path, encoding=conf.data.tuning.encoding
+        ) as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state: dict):
+    # Written to a temporary file then renamed, so that an interrupted search
+    # never leaves a partial state to resume from
+    temporary_path = f"{conf.data.tuning.path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding=conf.data.tuning.encoding) as outfile:
+        json.dump(state, outfile, indent=conf.data.tuning.indent)
+    os.replace(temporary_path, conf.data.tuning.path)
@@ -1,4 +1,7 @@
+import contextvars
 import random
+from concurrent import futures
+from datetime import datetime
 
 import box
 import yaml
@@ -15,3 +18,69 @@ def sample_uniform_seconds(low: float = 0, high: float = 1) -> float:
     """Sample a uniformly random duration in ``[min(low, high), max(low, high)]`` (seconds)."""
     a, b = min(low, high), max(low, high)
     return random.uniform(a, b)
+
+
+def get_current_season() -> int:
+    """Get the current NBA season (named after the year it ends, starting in October).
+
+    Returns:
+        int: Current season
+    """
+    now = datetime.now()
+    return now.year + 1 if now.month > 9 else now.year
+
+
+class BackgroundWriter:
+    """Write files in a background thread, off the critical path, in submission order.
+
+    Used as a context manager: leaving it waits for all writes and raises the
+    error of the first one that failed.
+    """
+
+    def __init__(self):
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="writer"
+        )
+        self._futures = []
+
+    def submit(self, func, *args, **kwargs) -> futures.Future:
+        """Schedule a write.
+
+        Args:
+            func (Callable): Function writing the file
+            *args, **kwargs: Arguments of func, not to be modified until written
+
+        Returns:
+            concurrent.futures.Future: Result of func
+        """
+        # Spans of the write are children of the current span
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, func, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def close(self):
+        """Wait for all writes and raise the error of the first one that failed."""
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write(writer: BackgroundWriter | None, func, *args, **kwargs):
+    """Write a file right away, or in the background if a writer is given.
+
+    Args:
+        writer (BackgroundWriter, optional): Background writer
+        func (Callable): Function writing the file
+        *args, **kwargs: Arguments of func
+    """
+    if writer is None:
+        func(*args, **kwargs)
+    else:
+        writer.submit(func, *args, **kwargs)
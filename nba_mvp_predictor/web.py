@@ -14,6 +14,7 @@ PAGE_EXPLICABILITY = "Explain predictions"
 PAGE_PERFORMANCE = "Model performance"
 CONFIDENCE_MODE_SOFTMAX = "Softmax-based"
 CONFIDENCE_MODE_SHARE = "Share-based"
+CONFIDENCE_MODE_SIMULATION = "Simulation-based"
 SEASON_END_DATE = date(year=2026, month=4, day=12)
 
 pandas.set_option("display.precision", 2)
@@ -110,6 +111,29 @@ def download_predictions():
     )
 
 
+@st.cache_data(ttl=3600)  # 1h cache
+def download_simulations():
+    date, url = artifacts.get_last_artifact("simulations-2026.csv")
+    logger.debug(f"Downloading simulations from {url}")
+    download.download_data_from_url_to_file(
+        url, "./data/simulations-artifact.csv.zip", auth=artifacts.get_github_auth()
+    )
+
+
+def build_simulations():
+    download_simulations()
+    simulations = pandas.read_csv(
+        "./data/simulations-artifact.csv.zip",
+        sep=conf.data.simulations.sep,
+        encoding=conf.data.simulations.encoding,
+        compression="zip",
+        index_col=0,
+        dtype={},
+    )
+    simulations = simulations.set_index("PLAYER", drop=True)
+    return simulations
+
+
 @st.cache_data(ttl=3600)  # 1h cache
 def download_shap_values():
     date, url = artifacts.get_last_artifact("shap_values-2026.csv")
@@ -490,9 +514,20 @@ def run():
                 col1, col2 = st.columns(2)
                 col1.subheader("Predicted top 3")
                 col2.subheader("Prediction parameters")
+                try:
+                    simulations = build_simulations()
+                    confidence_modes = [
+                        CONFIDENCE_MODE_SIMULATION,
+                        CONFIDENCE_MODE_SHARE,
+                        CONFIDENCE_MODE_SOFTMAX,
+                    ]
+                except (OSError, Exception) as e:
+                    logger.error(f"Failed to build simulations {e}", exc_info=False)
+                    simulations = None
+                    confidence_modes = [CONFIDENCE_MODE_SHARE, CONFIDENCE_MODE_SOFTMAX]
                 confidence_mode = col2.radio(
                     "Method used to estimate MVP probability",
-                    [CONFIDENCE_MODE_SHARE, CONFIDENCE_MODE_SOFTMAX],
+                    confidence_modes,
                 )
                 compute_probs_based_on_top_n = col2.slider(
                     "Number of players used to estimate probability",
@@ -502,7 +537,18 @@ def run():
                     step=1,
                     format="%d players",
                 )
-                if confidence_mode == CONFIDENCE_MODE_SOFTMAX:
+                if confidence_mode == CONFIDENCE_MODE_SIMULATION:
+                    # Share of the simulated ends of season won by the player
+                    simulated = simulations.reindex(predictions.index).fillna(0.0)
+                    predictions["MVP probability"] = simulated["MVP_PROBABILITY"] * 100
+                    predictions["MVP probability 95% interval"] = [
+                        f"{low:.1%} - {high:.1%}"
+                        for low, high in zip(
+                            simulated["MVP_PROBABILITY_LOW"],
+                            simulated["MVP_PROBABILITY_HIGH"],
+                        )
+                    ]
+                elif confidence_mode == CONFIDENCE_MODE_SOFTMAX:
                     predictions.loc[
                         predictions.PRED_RANK <= compute_probs_based_on_top_n,
                         "MVP probability",
@@ -526,15 +572,18 @@ def run():
                         )
                         * 100
                     )
-                predictions.loc[
-                    predictions.PRED_RANK > compute_probs_based_on_top_n,
-                    "MVP probability",
-                ] = 0.0
+                if confidence_mode != CONFIDENCE_MODE_SIMULATION:
+                    predictions.loc[
+                        predictions.PRED_RANK > compute_probs_based_on_top_n,
+                        "MVP probability",
+                    ] = 0.0
                 predictions["MVP probability"] = predictions["MVP probability"].map(
                     "{:,.2f}%".format
                 )
                 predictions["MVP rank"] = predictions["PRED_RANK"]
                 show_columns = ["MVP probability", "MVP rank"] + initial_columns[:]
+                if confidence_mode == CONFIDENCE_MODE_SIMULATION:
+                    show_columns.insert(1, "MVP probability 95% interval")
                 predictions = predictions[show_columns]
 
                 top_3 = predictions["MVP probability"].head(3).to_dict()
@@ -892,7 +941,11 @@ def run():
                     "To understand which stats have an impact on the model prediction for the MVP share of the top-10 players."
                 )
 
-                vals_abs = numpy.abs(shap_values.values).mean(0)
+                # Explanations cover the players of the predictions, not only the top 10
+                top10_shap_values = (
+                    shap_values.loc[top10_players] if top10_players else shap_values
+                )
+                vals_abs = numpy.abs(top10_shap_values.values).mean(0)
                 shap_importance = pandas.DataFrame(
                     {
                         "col_name": shap_values.columns,
@@ -0,0 +1,142 @@
+import dataclasses
+import itertools
+import re
+
+import numpy
+import pandas
+
+from nba_mvp_predictor import logger
+
+ADD = "add"
+MULTIPLY = "multiply"
+SET = "set"
+
+_OPERATORS = {"+": ADD, "-": ADD, "*": MULTIPLY, "=": SET}
+_PERTURBATION_PATTERN = re.compile(
+    r"^(?P<feature>[^+\-*=]+)(?P<operator>[+\-*=])(?P<values>.+)$"
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Perturbation:
+    """Change of a feature, with one scenario per value.
+
+    Args:
+        feature (str): Model feature to change, in raw units (e.g. "FG_per_game")
+        values (tuple[float]): Values of the scenarios
+        operation (str, optional): One of "add", "multiply" or "set". Defaults to "add".
+    """
+
+    feature: str
+    values: tuple[float, ...]
+    operation: str = ADD
+
+
+def parse_perturbation(text: str) -> Perturbation:
+    """Parse a perturbation written as FEATURE, an operator (+, -, * or =) and values.
+
+    For instance "FG_per_game+1,2" adds 1 then 2 field goals per game, and
+    "CONF_RANK=1,3" sets the conference rank to 1 then 3.
+
+    Args:
+        text (str): Perturbation
+
+    Returns:
+        Perturbation: Parsed perturbation
+    """
+    match = _PERTURBATION_PATTERN.match(text.replace(" ", ""))
+    if match is None:
+        raise ValueError(
+            f"Invalid perturbation {text!r} : expected FEATURE, +, -, * or = and values"
+        )
+    values = tuple(float(value) for value in match["values"].split(","))
+    if match["operator"] == "-":
+        values = tuple(-value for value in values)
+    return Perturbation(match["feature"], values, _OPERATORS[match["operator"]])
+
+
+def make_scenarios(state, players: list[str], perturbations: list[Perturbation]):
+    """Build the model input of every scenario: each player with each combination of values.
+
+    Perturbations are applied to raw values, recovered from the model input with the
+    scaling of the season, and scaled back the same way. The scaling is not fitted
+    again: other players of the season are not affected by the scenarios.
+
+    Args:
+        state (serve.ModelState): Model and model input of the season
+        players (list[str]): Players
+        perturbations (list[Perturbation]): Perturbations, combined as a grid
+
+    Returns:
+        tuple[numpy.ndarray, pandas.DataFrame]: Model input and description of the scenarios
+    """
+    columns = {column: position for position, column in enumerate(state.columns)}
+    unknown = [p.feature for p in perturbations if p.feature not in columns]
+    if unknown:
+        raise ValueError(
+            f"Not model features : {unknown}. Model features are {state.columns}"
+        )
+    rows = numpy.array([state.get_row(player) for player in players], dtype=int)
+    grid = numpy.array(
+        list(itertools.product(*[p.values for p in perturbations])), dtype="float64"
+    ).reshape(-1, len(perturbations))
+    # Scenarios are ordered by player, then by combination of values
+    scenario_rows = numpy.repeat(rows, len(grid))
+    scenario_values = numpy.tile(grid, (len(rows), 1))
+    matrix = state.matrix[scenario_rows]
+    for position, perturbation in enumerate(perturbations):
+        column = columns[perturbation.feature]
+        offset, scale = state.offset[column], state.scale[column]
+        raw = matrix[:, column].astype("float64") * scale + offset
+        values = scenario_values[:, position]
+        if perturbation.operation == ADD:
+            raw = raw + values
+        elif perturbation.operation == MULTIPLY:
+            raw = raw * values
+        elif perturbation.operation == SET:
+            raw = values
+        else:
+            raise ValueError(f"Unknown operation : {perturbation.operation}")
+        matrix[:, column] = (raw - offset) / scale
+    scenarios = pandas.DataFrame(
+        {
+            "PLAYER": state.players[scenario_rows],
+            "TEAM": state.teams[scenario_rows],
+            **{
+                f"{p.feature} ({p.operation})": scenario_values[:, position]
+                for position, p in enumerate(perturbations)
+            },
+        }
+    )
+    return matrix, scenarios
+
+
+def score_scenarios(
+    state, players: list[str], perturbations: list[Perturbation]
+) -> pandas.DataFrame:
+    """Score every scenario of a grid of perturbations in one predict call.
+
+    Args:
+        state (serve.ModelState): Model and model input of the season
+        players (list[str]): Players
+        perturbations (list[Perturbation]): Perturbations, combined as a grid
+
+    Returns:
+        pandas.DataFrame: Scenarios with their predicted share (PRED), the share
+            predicted without perturbation (BASE_PRED) and the rank the player would
+            have in the season, other players unchanged (PRED_RANK)
+    """
+    matrix, scenarios = make_scenarios(state, players, perturbations)
+    predictions = state.predict(matrix)
+    rows = numpy.array([state.get_row(player) for player in players], dtype=int)
+    base = state.predictions[numpy.repeat(rows, len(scenarios) // len(rows))]
+    # Players of the season predicted above the scenario, not counting the player
+    others = numpy.sort(state.predictions)
+    above = len(others) - numpy.searchsorted(others, predictions, side="right")
+    above -= base > predictions
+    scenarios["PRED"] = predictions
+    scenarios["BASE_PRED"] = base
+    scenarios["DELTA"] = predictions - base
+    scenarios["PRED_RANK"] = above + 1
+    logger.debug(f"{len(scenarios)} scenarios scored")
+    return scenarios
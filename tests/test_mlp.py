@@ -0,0 +1,71 @@
+import joblib
+import numpy
+import pandas
+import pytest
+
+from nba_mvp_predictor import conf, load, mlp, model
+
+
+@pytest.fixture
+def model_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(conf.data.model, "path", str(tmp_path / "model.joblib"))
+    monkeypatch.setattr(conf.data.model_weights, "path", str(tmp_path / "model.npz"))
+    return conf.data.model.path, conf.data.model_weights.path
+
+
+@pytest.fixture
+def training_data():
+    rng = numpy.random.default_rng(0)
+    X = pandas.DataFrame(
+        rng.normal(size=(200, 5)).astype("float32"),
+        columns=[f"FEATURE_{i}" for i in range(5)],
+    )
+    y = numpy.clip(X["FEATURE_0"] * 0.3 - X["FEATURE_1"] * 0.1, 0.0, None)
+    return X, y
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.parametrize(
+    "name, activation",
+    [
+        ("mlp", "relu"),
+        ("mlp", "tanh"),
+        ("mlp", "logistic"),
+        ("mlp", "identity"),
+        ("mlp-relu", "relu"),
+        ("mlp-relu", "tanh"),
+    ],
+)
+def test_exported_weights_predict_like_the_model(
+    name, activation, model_paths, training_data
+):
+    model_path, weights_path = model_paths
+    X, y = training_data
+    params = {"activation": activation, "hidden_layer_sizes": [8, 4], "max_iter": 50}
+    fitted = model.fit_model(model.get_model(params=params, name=name), X, y)
+    joblib.dump(fitted, model_path)
+    assert mlp.export_model(fitted, weights_path, model_path, X=X)
+
+    scorer = load.load_scorer()
+
+    assert isinstance(scorer, mlp.MLPScorer)
+    # Columns in another order are scored like the model scores them in its order
+    for model_input, reference in [
+        (X, X),
+        (X.astype("float64"), X.astype("float64")),
+        (X[scorer.features[::-1]], X),
+    ]:
+        difference = scorer.predict(model_input) - fitted.predict(reference)
+        assert numpy.abs(difference).max() <= mlp.PARITY_TOLERANCE
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+def test_weights_of_another_model_are_not_used(model_paths, training_data):
+    model_path, weights_path = model_paths
+    X, y = training_data
+    fitted = model.fit_model(model.get_model(name="mlp"), X, y)
+    joblib.dump(fitted, model_path)
+    mlp.export_model(fitted, weights_path, model_path)
+    joblib.dump(model.fit_model(model.get_model(name="ridge"), X, y), model_path)
+
+    assert not isinstance(load.load_scorer(), mlp.MLPScorer)